@@ -0,0 +1,52 @@
+# 测量启动时 init_db 的耗时：首次（建库/迁移）与 schema_version 已是最新时的快速路径
+# 用法：python TestingCode/dbtest/bench_startup.py [--chapters 2000] [--size-kb 32] [--runs 5]
+import os
+import sys
+import time
+import uuid
+import sqlite3
+import argparse
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, BACKEND_DIR)
+
+
+def fill(db_file: str, chapters: int, size_kb: int) -> None:
+    body = "字" * (size_kb * 1024 // 3)
+    conn = sqlite3.connect(db_file)
+    novel_uid = str(uuid.uuid4())
+    conn.execute("INSERT INTO NovelConfig (uid, title, genre, description) VALUES (?, 't', 'g', 'd')", (novel_uid,))
+    rows = [(str(uuid.uuid4()), novel_uid, i, f"t{i}") for i in range(chapters)]
+    conn.executemany("INSERT INTO Chapters (uid, novel_uid, chapter_idx, title) VALUES (?, ?, ?, ?)", rows)
+    conn.executemany("INSERT INTO ChapterContent (chapter_uid, content) VALUES (?, ?)", [(r[0], body) for r in rows])
+    conn.commit()
+    conn.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="init_db startup benchmark")
+    parser.add_argument("--chapters", type=int, default=2000)
+    parser.add_argument("--size-kb", type=int, default=32)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["DB_FILE"] = os.path.join(tmp, "novel.db")
+        from db.sqlite import init_db, last_init_stats, DB_FILE  # noqa: E402
+
+        init_db()
+        print(f"create: {last_init_stats['elapsed_ms']:.1f} ms")
+        fill(DB_FILE, args.chapters, args.size_kb)
+        print(f"db size: {os.path.getsize(DB_FILE) / 1024 / 1024:.1f} MB ({args.chapters} chapters x {args.size_kb}KB)")
+
+        timings = []
+        for _ in range(args.runs):
+            started = time.perf_counter()
+            init_db()
+            timings.append((time.perf_counter() - started) * 1000)
+        print(f"fast path: min {min(timings):.2f} ms  max {max(timings):.2f} ms  applied={last_init_stats['applied']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+# 对比“触发器维护时间戳”与“语句内写入时间戳”两种方式下大章节的写入吞吐
+# 用法：python TestingCode/dbtest/bench_timestamp_triggers.py [--chapters 200] [--updates 5] [--size-kb 64]
+import os
+import sys
+import time
+import uuid
+import sqlite3
+import argparse
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, BACKEND_DIR)
+
+from db.sqlite import NOW_SQL, STORAGE_PROFILES  # noqa: E402
+
+SCHEMA = """
+CREATE TABLE Chapters (
+    uid TEXT PRIMARY KEY,
+    novel_uid TEXT,
+    chapter_idx INTEGER,
+    title TEXT,
+    content TEXT,
+    synopsis TEXT DEFAULT '',
+    created_at TEXT,
+    updated_at TEXT
+)
+"""
+
+# 与旧版 db/sqlite.py 中的触发器一致
+TRIGGERS = f"""
+CREATE TRIGGER trg_Chapters_ts_after_insert
+AFTER INSERT ON Chapters
+FOR EACH ROW
+WHEN NEW.created_at IS NULL OR NEW.updated_at IS NULL
+BEGIN
+    UPDATE Chapters
+    SET created_at = COALESCE(NEW.created_at, {NOW_SQL}),
+        updated_at = COALESCE(NEW.updated_at, {NOW_SQL})
+    WHERE uid = NEW.uid;
+END;
+CREATE TRIGGER trg_Chapters_ts_after_update
+AFTER UPDATE ON Chapters
+FOR EACH ROW
+BEGIN
+    UPDATE Chapters
+    SET updated_at = {NOW_SQL}
+    WHERE uid = NEW.uid;
+END;
+"""
+
+
+def open_db(path: str, profile: str, with_triggers: bool) -> sqlite3.Connection:
+    conn = sqlite3.connect(path)
+    for key, value in STORAGE_PROFILES[profile].items():
+        conn.execute(f"PRAGMA {key} = {value}")
+    conn.execute(SCHEMA)
+    if with_triggers:
+        conn.executescript(TRIGGERS)
+    conn.commit()
+    return conn
+
+
+def run(with_triggers: bool, chapters: int, updates: int, size_kb: int, profile: str) -> dict:
+    body = "字" * (size_kb * 1024 // 3)  # UTF-8 下每个汉字 3 字节
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        conn = open_db(path, profile, with_triggers)
+        uids = [str(uuid.uuid4()) for _ in range(chapters)]
+
+        started = time.perf_counter()
+        for i, uid in enumerate(uids):
+            if with_triggers:
+                conn.execute(
+                    "INSERT INTO Chapters (uid, novel_uid, chapter_idx, title, content) VALUES (?, ?, ?, ?, ?)",
+                    (uid, "n", i, f"t{i}", body),
+                )
+            else:
+                conn.execute(
+                    f"INSERT INTO Chapters (uid, novel_uid, chapter_idx, title, content, created_at, updated_at) "
+                    f"VALUES (?, ?, ?, ?, ?, {NOW_SQL}, {NOW_SQL})",
+                    (uid, "n", i, f"t{i}", body),
+                )
+            conn.commit()
+        insert_sec = time.perf_counter() - started
+
+        # 模拟流式自动保存：反复以完整正文 UPDATE
+        started = time.perf_counter()
+        for n in range(updates):
+            for uid in uids:
+                if with_triggers:
+                    conn.execute("UPDATE Chapters SET content=? WHERE uid=?", (body + str(n), uid))
+                else:
+                    conn.execute(f"UPDATE Chapters SET content=?, updated_at={NOW_SQL} WHERE uid=?", (body + str(n), uid))
+                conn.commit()
+        update_sec = time.perf_counter() - started
+
+        total_changes = conn.total_changes
+        conn.close()
+        return {
+            "insert_per_sec": chapters / insert_sec,
+            "update_per_sec": chapters * updates / update_sec,
+            "mb_per_sec": chapters * (updates + 1) * size_kb / 1024 / (insert_sec + update_sec),
+            "row_writes": total_changes,
+        }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="timestamp trigger write benchmark")
+    parser.add_argument("--chapters", type=int, default=200)
+    parser.add_argument("--updates", type=int, default=5)
+    parser.add_argument("--size-kb", type=int, default=64)
+    parser.add_argument("--profile", type=str, choices=list(STORAGE_PROFILES), default="balanced")
+    args = parser.parse_args()
+
+    print(f"chapters={args.chapters} updates={args.updates} size={args.size_kb}KB profile={args.profile}")
+    before = run(True, args.chapters, args.updates, args.size_kb, args.profile)
+    after = run(False, args.chapters, args.updates, args.size_kb, args.profile)
+    for label, r in (("triggers (before)", before), ("in-statement (after)", after)):
+        print(
+            f"{label:22s} insert {r['insert_per_sec']:8.1f}/s  update {r['update_per_sec']:8.1f}/s  "
+            f"{r['mb_per_sec']:7.1f} MB/s  row writes {r['row_writes']}"
+        )
+    print(f"update speedup: x{after['update_per_sec'] / before['update_per_sec']:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+# 生成链路压测：对运行中的后端（provider=mock，需先启动 python -m tools.mock.server）依次生成角色、目录，
+# 再以给定并发反复生成章节正文，统计 SSE 首个 token 事件耗时、总耗时与事件数。
+# 用法：python TestingCode/llmtest/bench_sse.py [--base-url http://127.0.0.1:8890] [--chapters 10] [--concurrency 8] [--rounds 3]
+import json
+import time
+import asyncio
+import argparse
+import statistics
+from typing import Any, AsyncIterator, Dict, List
+
+import httpx
+
+
+async def sse_events(client: httpx.AsyncClient, path: str, payload: Dict[str, Any]) -> AsyncIterator[Dict[str, Any]]:
+    async with client.stream("POST", path, json=payload) as resp:
+        resp.raise_for_status()
+        async for line in resp.aiter_lines():
+            if line.startswith("data: "):
+                yield json.loads(line[len("data: "):])
+
+
+async def prepare(client: httpx.AsyncClient, provider: str, chapters: int) -> List[str]:
+    resp = await client.post("/api/novel/create", json={"title": "压测", "genre": "奇幻", "description": "mock benchmark"})
+    novel_uid = resp.json()["data"]["uid"]
+    started = time.perf_counter()
+    async for ev in sse_events(client, "/api/working_flow/create_characters", {"novel_uid": novel_uid, "provider": provider}):
+        if ev["type"] == "done":
+            print(f"characters: {len(ev['character_uids'])} in {time.perf_counter() - started:.2f}s")
+    started = time.perf_counter()
+    chapter_uids: List[str] = []
+    payload = {"novel_uid": novel_uid, "provider": provider, "target_chapters": chapters}
+    async for ev in sse_events(client, "/api/working_flow/create_chapter_outline", payload):
+        if ev["type"] == "done":
+            chapter_uids = ev["chapter_uids"]
+    print(f"outline: {len(chapter_uids)} chapters in {time.perf_counter() - started:.2f}s")
+    return chapter_uids
+
+
+async def generate(client: httpx.AsyncClient, provider: str, chapter_uid: str) -> Dict[str, Any]:
+    started = time.perf_counter()
+    ttft = None
+    events = 0
+    final_length = 0
+    async for ev in sse_events(client, "/api/working_flow/create_chapter_content", {"chapter_uid": chapter_uid, "provider": provider}):
+        events += 1
+        if ev.get("type") == "token" and ttft is None:
+            ttft = time.perf_counter() - started
+        elif ev.get("type") == "done":
+            final_length = ev["final_length"]
+        elif ev.get("type") == "error":
+            raise RuntimeError(ev["message"])
+    return {"ttft": ttft or 0.0, "total": time.perf_counter() - started, "events": events, "chars": final_length}
+
+
+def pct(values: List[float], p: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="SSE generation benchmark against the mock provider")
+    parser.add_argument("--base-url", type=str, default="http://127.0.0.1:8890")
+    parser.add_argument("--provider", type=str, default="mock")
+    parser.add_argument("--chapters", type=int, default=10)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    limits = httpx.Limits(max_connections=args.concurrency + 2)
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=None, limits=limits) as client:
+        chapter_uids = await prepare(client, args.provider, args.chapters)
+        jobs = [uid for _ in range(args.rounds) for uid in chapter_uids]
+        sem = asyncio.Semaphore(args.concurrency)
+        failures = 0
+
+        async def run(uid: str) -> Any:
+            nonlocal failures
+            async with sem:
+                try:
+                    return await generate(client, args.provider, uid)
+                except Exception as exc:
+                    failures += 1
+                    print(f"chapter {uid} failed: {exc!r}")
+                    return None
+
+        started = time.perf_counter()
+        results = [r for r in await asyncio.gather(*(run(uid) for uid in jobs)) if r]
+        wall = time.perf_counter() - started
+
+        if results:
+            ttfts = [r["ttft"] * 1000 for r in results]
+            totals = [r["total"] * 1000 for r in results]
+            chars = sum(r["chars"] for r in results)
+            print(f"content: {len(results)} ok / {failures} failed, concurrency {args.concurrency}, wall {wall:.2f}s")
+            print(f"  first token ms  p50 {statistics.median(ttfts):7.1f}  p95 {pct(ttfts, 95):7.1f}  max {max(ttfts):7.1f}")
+            print(f"  stream total ms p50 {statistics.median(totals):7.1f}  p95 {pct(totals, 95):7.1f}  max {max(totals):7.1f}")
+            print(f"  {chars / wall:.0f} chars/s, {sum(r['events'] for r in results) / len(results):.1f} SSE events per stream")
+
+        metrics = (await client.post("/api/health/metrics")).json()["data"]
+        print("admission:", json.dumps(metrics.get("admission", {}).get(args.provider), ensure_ascii=False))
+        print("http_transport:", json.dumps(metrics.get("http_transport", {}).get("origins"), ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,14 +1,23 @@
 import asyncio
 import json
+import time
 import inspect
+import logging
 from dataclasses import dataclass
-from typing import List, Optional, Callable, Awaitable, Union, Any, Set, Dict
+from typing import List, Optional, Callable, Awaitable, Union, Any, Set, Dict, Tuple
 
 from db.models.character import Character
 # from db.models.chapter import Chapter
 
 from tools.deepseek.create_model_response import DeepSeekClient
-from tools.openai.create_model_response import GPTClient
+from tools.provider_registry import CLIENT_FACTORIES, get_client
+from tools.admission import BATCH, ProviderLimiter, admit, estimate_tokens, get_limiter, limit_settings
+from tools.resilience import continuation_messages, provider_chain, retry_or_failover
+from tools.hedging import hedge_partner, hedge_threshold_ms, record_ttft
+from utils.config import Hedge_Policy
+from utils import metrics
+
+logger = logging.getLogger("chapter_agent")
 
 
 @dataclass
@@ -25,12 +34,42 @@ class ProviderAdapter:
         - text：非流式返回结果
     支持传入多轮 messages（list of {role, content}）
     """
-    def __init__(self, provider: str = "openai", openai_config: Optional[str] = None, deepseek_config: Optional[str] = None):
+    def __init__(self, provider: str = "openai", openai_config: Optional[str] = None, deepseek_config: Optional[str] = None, priority: int = BATCH):
         self.provider = provider.lower()
-        if self.provider == "deepseek":
-            self.client = DeepSeekClient(config_path=deepseek_config or "config/deepseek/config.yaml")
-        else:
-            self.client = GPTClient(config_path=openai_config or "config/openai/config.yaml")
+        # 未注册的供应商名按 openai 处理
+        self._primary = self.provider if self.provider in CLIENT_FACTORIES else "openai"
+        # 客户端由注册表复用（配置文件变化后自动重建），不在每次请求时重新读取配置、新建连接池
+        config_path = {"deepseek": deepseek_config, "openai": openai_config}.get(self._primary)
+        self.client = get_client(self._primary, config_path)
+        # 准入控制：同一 provider 的请求共享并发/rpm/tpm 限制（config.yaml 的 limits 段），priority 决定排队先后
+        self.priority = priority
+        self.limiter = get_limiter(self._primary, limit_settings(self.client.config_info))
+        # 最近一次 stream_text 的用量：prompt/cached/completion tokens、首 token 耗时、排队耗时、实际供应商与尝试次数
+        self.last_usage: Optional[Dict[str, Any]] = None
+
+    def _resolve(self, provider: str) -> Tuple[Any, ProviderLimiter]:
+        """主供应商沿用构造时的客户端（可能是自定义配置路径），备用供应商使用默认配置。"""
+        if provider == self._primary:
+            return self.client, self.limiter
+        client = get_client(provider)
+        return client, get_limiter(provider, limit_settings(client.config_info))
+
+    @staticmethod
+    def _usage_summary(usage: Any, ttft_ms: Optional[float]) -> Dict[str, Any]:
+        """
+        统一两家的用量字段：OpenAI 为 prompt_tokens_details.cached_tokens，
+        DeepSeek 为 prompt_cache_hit_tokens；供应商未返回用量时各项为 None。
+        """
+        prompt_tokens = getattr(usage, "prompt_tokens", None)
+        cached_tokens = getattr(getattr(usage, "prompt_tokens_details", None), "cached_tokens", None)
+        if cached_tokens is None:
+            cached_tokens = getattr(usage, "prompt_cache_hit_tokens", None)
+        return {
+            "prompt_tokens": prompt_tokens,
+            "cached_tokens": cached_tokens,
+            "completion_tokens": getattr(usage, "completion_tokens", None),
+            "ttft_ms": round(ttft_ms, 1) if ttft_ms is not None else None,
+        }
 
     async def _emit(self, on_token: Optional[Callable[[str], Union[None, Awaitable[None]]]], piece: str):
         """
@@ -42,54 +81,226 @@ class ProviderAdapter:
             if inspect.isawaitable(res):
                 await res
 
+    async def _stream_once(
+        self,
+        provider: str,
+        messages: List[Dict[str, str]],
+        on_token: Optional[Callable[[str], Union[None, Awaitable[None]]]],
+        buffer: List[str],
+        timing: Dict[str, float],
+    ) -> Any:
+        """发起一次流式请求：片段追加到 buffer 并回调 on_token，排队/首 token 耗时记入 timing，返回用量（可能为 None）。"""
+        client, limiter = self._resolve(provider)
+        usage: Any = None
+        first_piece = True
+        async with admit(limiter, self.priority, estimate_tokens(messages)) as ticket:
+            timing["queue_wait_ms"] = timing.get("queue_wait_ms", 0.0) + ticket.wait_ms
+            started = time.perf_counter()
+            if isinstance(client, DeepSeekClient):
+                stream = client.async_stream_response(is_structured=False, messages=messages)
+            else:
+                stream = client.async_stream_response(text_format=None, messages=messages)
+            try:
+                async for evt in stream:
+                    # 用量在最后一个 chunk 中返回（需 stream_options.include_usage）
+                    chunk_usage = getattr(getattr(evt, "chunk", None), "usage", None)
+                    if chunk_usage is not None:
+                        usage = chunk_usage
+                    piece = ""
+                    if hasattr(evt, "delta") and evt.delta:
+                        piece = evt.delta if isinstance(evt.delta, str) else str(evt.delta)
+                    elif hasattr(evt, "choices") and evt.choices:
+                        delta = evt.choices[0].delta if hasattr(evt.choices[0], "delta") else None
+                        if delta:
+                            piece = delta if isinstance(delta, str) else str(delta)
+                    if piece:
+                        if first_piece:
+                            first_piece = False
+                            ttft_ms = (time.perf_counter() - started) * 1000
+                            record_ttft(provider, ttft_ms)
+                            timing.setdefault("ttft_ms", ttft_ms)
+                        buffer.append(piece)
+                        await self._emit(on_token, piece)
+            finally:
+                # 任务被取消（如客户端断开）或出错时立即关闭上游流，释放 HTTP 连接，不再继续拉取 token
+                await stream.aclose()
+            if usage is not None:
+                ticket.tokens_used = (getattr(usage, "prompt_tokens", 0) or 0) + (getattr(usage, "completion_tokens", 0) or 0)
+        return usage
+
+    async def _hedged_stream(
+        self,
+        primary: str,
+        secondary: str,
+        messages: List[Dict[str, str]],
+        on_token: Optional[Callable[[str], Union[None, Awaitable[None]]]],
+        buffer: List[str],
+        timing: Dict[str, float],
+    ) -> Tuple[str, Any]:
+        """
+        首 token 对冲：先请求 primary，超过 TTFT 阈值仍无首个 token 时用相同 messages 再请求 secondary；
+        先产出 token 的一方胜出并继续推送，另一方立即取消（关闭上游流、归还准入名额）。
+        返回 (胜出的 provider, 用量)。胜出方中途失败时其已输出部分留在 buffer 中，由调用方按续写策略处理。
+        """
+        tasks: Dict[str, asyncio.Task] = {}
+        state: Dict[str, Optional[str]] = {"winner": None}
+        first_token = asyncio.Event()
+
+        async def race(provider: str) -> Any:
+            local: List[str] = []
+            local_timing: Dict[str, float] = {}
+            started = time.perf_counter()
+
+            async def gate(piece: str) -> None:
+                if state["winner"] is None:
+                    state["winner"] = provider
+                    first_token.set()
+                    for other, task in tasks.items():
+                        if other != provider:
+                            task.cancel()
+                    if provider != primary:
+                        logger.info("Hedged request won by %s", provider)
+                        metrics.incr(f"llm_hedge_wins.{provider}")
+                if state["winner"] == provider:
+                    await self._emit(on_token, piece)
+
+            try:
+                return await self._stream_once(provider, messages, gate, local, local_timing)
+            except asyncio.CancelledError:
+                # 落败方在首个 token 前被取消：记一个删失样本（已等待的时长，是其 TTFT 的下界），
+                # 否则慢请求永远不进统计窗口，分位数偏低，阈值会被一路压到 min_threshold_ms
+                if (state["winner"] not in (None, provider) and "ttft_ms" not in local_timing
+                        and "queue_wait_ms" in local_timing):
+                    waited_ms = (time.perf_counter() - started) * 1000 - local_timing["queue_wait_ms"]
+                    record_ttft(provider, waited_ms)
+                raise
+            finally:
+                if state["winner"] == provider:
+                    buffer.extend(local)
+                    timing.update(local_timing)
+
+        threshold_ms = hedge_threshold_ms(primary)
+        tasks[primary] = asyncio.create_task(race(primary))
+        waiter = asyncio.create_task(first_token.wait())
+        try:
+            await asyncio.wait({tasks[primary], waiter}, timeout=threshold_ms / 1000, return_when=asyncio.FIRST_COMPLETED)
+            if not first_token.is_set() and not tasks[primary].done():
+                logger.info("No first token from %s after %.0f ms, hedging with %s", primary, threshold_ms, secondary)
+                metrics.incr(f"llm_hedges.{primary}")
+                tasks[secondary] = asyncio.create_task(race(secondary))
+
+            errors: Dict[str, BaseException] = {}
+            pending = set(tasks.values())
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    provider = next(p for p, t in tasks.items() if t is task)
+                    if task.cancelled():
+                        continue  # 对冲中落败的一方
+                    exc = task.exception()
+                    if exc is None and state["winner"] in (None, provider):
+                        return provider, task.result()
+                    if exc is not None:
+                        if state["winner"] == provider:
+                            raise exc
+                        # 出首个 token 前失败：另一方（若有）继续竞争
+                        errors[provider] = exc
+            raise errors.get(primary) or next(iter(errors.values()))
+        finally:
+            waiter.cancel()
+            for task in tasks.values():
+                if not task.done():
+                    task.cancel()
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
+
     async def stream_text(
         self,
         prompt: Optional[str] = None,
         instructions: Optional[str] = None,
         on_token: Optional[Callable[[str], Union[None, Awaitable[None]]]] = None,
-        messages: Optional[List[Dict[str, str]]] = None
+        messages: Optional[List[Dict[str, str]]] = None,
+        hedge: Optional[bool] = None
     ) -> str:
         """
         支持通过 messages 发起多轮对话流式请求；若 messages=None 则按 instructions+prompt 构造单轮。
+        失败处理：429/5xx/连接中断等可重试错误按抖动退避重试；已输出部分内容时以续写请求接着生成，
+        已推送的 token 不会重复；重试用尽或不可重试时按 Provider_Fallbacks 切换到备用供应商（同样续写）。
+        hedge=True（None 时取 Hedge_Policy.enabled）时首次请求启用首 token 对冲，见 _hedged_stream。
         """
+        base_messages = messages or [
+            {"role": "system", "content": instructions or ""},
+            {"role": "user", "content": prompt or ""},
+        ]
         buffer: List[str] = []
-        if isinstance(self.client, DeepSeekClient):
-            async for evt in self.client.async_stream_response(prompt=prompt, instructions=instructions, is_structured=False, messages=messages):
-                piece = ""
-                if hasattr(evt, "delta") and evt.delta:
-                    piece = evt.delta if isinstance(evt.delta, str) else str(evt.delta)
-                elif hasattr(evt, "choices") and evt.choices:
-                    delta = evt.choices[0].delta if hasattr(evt.choices[0], "delta") else None
-                    if delta:
-                        piece = delta if isinstance(delta, str) else str(delta)
-                if piece:
-                    buffer.append(piece)
-                    await self._emit(on_token, piece)
-        else:
-            async for evt in self.client.async_stream_response(prompt=prompt, instructions=instructions, text_format=None, messages=messages):
-                piece = ""
-                if hasattr(evt, "delta") and evt.delta:
-                    piece = evt.delta if isinstance(evt.delta, str) else str(evt.delta)
-                elif hasattr(evt, "choices") and evt.choices:
-                    delta = evt.choices[0].delta if hasattr(evt.choices[0], "delta") else None
-                    if delta:
-                        piece = delta if isinstance(delta, str) else str(delta)
-                if piece:
-                    buffer.append(piece)
-                    await self._emit(on_token, piece)
-
-        return "".join(buffer)
-
-    async def text(self, prompt: Optional[str] = None, instructions: Optional[str] = None, messages: Optional[List[Dict[str, str]]] = None) -> str:
-        if isinstance(self.client, DeepSeekClient):
-            return await self.client.async_non_stream_response(prompt=prompt, instructions=instructions, is_structured=False, messages=messages)
-        else:
-            return await self.client.async_non_stream_response(prompt=prompt, instructions=instructions, text_format=None, messages=messages)
+        timing: Dict[str, float] = {}
+        attempts = 0
+        first_error: Optional[Exception] = None
+        hedge_to = hedge_partner(self._primary) if (Hedge_Policy["enabled"] if hedge is None else hedge) else None
+        chain = provider_chain(self._primary)
+        for i, provider in enumerate(chain):
+            next_provider = chain[i + 1] if i + 1 < len(chain) else None
+            retries = 0
+            while True:
+                attempts += 1
+                served_by = provider
+                try:
+                    request_messages = continuation_messages(base_messages, "".join(buffer))
+                    if hedge_to and attempts == 1:
+                        served_by, usage = await self._hedged_stream(
+                            provider, hedge_to, request_messages, on_token, buffer, timing,
+                        )
+                    else:
+                        usage = await self._stream_once(provider, request_messages, on_token, buffer, timing)
+                except Exception as exc:
+                    first_error = first_error or exc
+                    if await retry_or_failover(exc, provider, next_provider, retries, sum(len(p) for p in buffer)):
+                        retries += 1
+                        continue
+                    break
 
+                self.last_usage = self._usage_summary(usage, timing.get("ttft_ms"))
+                self.last_usage.update({
+                    "queue_wait_ms": round(timing.get("queue_wait_ms", 0.0), 1),
+                    "provider": served_by,
+                    "attempts": attempts,
+                })
+                for key in ("prompt_tokens", "cached_tokens", "completion_tokens"):
+                    if self.last_usage[key]:
+                        metrics.incr(f"llm_{key}", self.last_usage[key])
+                logger.info("Stream usage (%s): %s", served_by, self.last_usage)
+                return "".join(buffer)
+        raise first_error
+
+    async def text(self, prompt: Optional[str] = None, instructions: Optional[str] = None, messages: Optional[List[Dict[str, str]]] = None, use_cache: bool = True) -> str:
+        """非流式调用，失败时与 stream_text 相同的重试 / 切换供应商策略。"""
+        base_messages = messages or [
+            {"role": "system", "content": instructions or ""},
+            {"role": "user", "content": prompt or ""},
+        ]
+        first_error: Optional[Exception] = None
+        chain = provider_chain(self._primary)
+        for i, provider in enumerate(chain):
+            next_provider = chain[i + 1] if i + 1 < len(chain) else None
+            retries = 0
+            while True:
+                try:
+                    client, limiter = self._resolve(provider)
+                    async with admit(limiter, self.priority, estimate_tokens(base_messages)):
+                        if isinstance(client, DeepSeekClient):
+                            return await client.async_non_stream_response(is_structured=False, messages=base_messages, use_cache=use_cache)
+                        else:
+                            return await client.async_non_stream_response(text_format=None, messages=base_messages, use_cache=use_cache)
+                except Exception as exc:
+                    first_error = first_error or exc
+                    if await retry_or_failover(exc, provider, next_provider, retries, 0):
+                        retries += 1
+                        continue
+                    break
+        raise first_error
 
 class ChapterAgent:
-    def __init__(self, provider: str = "openai", openai_config: Optional[str] = None, deepseek_config: Optional[str] = None):
-        self.adapter = ProviderAdapter(provider=provider, openai_config=openai_config, deepseek_config=deepseek_config)
+    def __init__(self, provider: str = "openai", openai_config: Optional[str] = None, deepseek_config: Optional[str] = None, priority: int = BATCH):
+        self.adapter = ProviderAdapter(provider=provider, openai_config=openai_config, deepseek_config=deepseek_config, priority=priority)
 
     @staticmethod
     def _detect_lang_from_characters(characters: List[Character]) -> str:
@@ -127,6 +338,29 @@ class ChapterAgent:
             })
         return out
 
+    @classmethod
+    def _content_system_prefix(cls, characters: List[Character], lang_label: str) -> str:
+        """正文生成的稳定前缀：只依赖人物列表与语言，JSON 固定键顺序，保证多次调用逐字节一致。"""
+        instructions = (
+            "你是一名专业小说写作代笔作者。请根据给定的章节标题、该章概述、所有人物信息，以及前后章节的概括（若有）创作本章正文内容。\n"
+            "要求：\n"
+            "1) 采用叙事文本，不要输出标题、小节标题、或任何额外标记；\n"
+            "2) 内容要具体生动，描写人物行为、心理和对话，避免空泛总结；\n"
+            "3) 与前后章衔接自然，不要剧透下一章但可合理埋伏笔；\n"
+            "4) 文笔统一、角色人设稳定；\n"
+            f"5) 最终输出语言：{lang_label}；\n"
+            "6) 只输出正文内容。"
+        )
+        shared = {
+            "characters": cls._characters_to_compact_dicts(characters),
+            "style": {
+                "language": lang_label,
+                "tone": "叙事流畅、细节充实、情感丰沛",
+                "avoid": ["重复概述", "流水账", "突兀转场", "过度说明"]
+            }
+        }
+        return instructions + "\n\n" + json.dumps(shared, ensure_ascii=False, sort_keys=True)
+
     @staticmethod
     def _clean_llm_text(txt: str) -> str:
         # 如有常见的格式标记（如代码块围栏），则将其移除。
@@ -337,11 +571,13 @@ class ChapterAgent:
         next_synopsis: Optional[str],
         language: Optional[str] = None,
         on_token: Optional[Callable[[str], Union[None, Awaitable[None]]]] = None,
-        conversation_messages: Optional[List[Dict[str, str]]] = None
+        conversation_messages: Optional[List[Dict[str, str]]] = None,
+        hedge: Optional[bool] = None
     ) -> str:
         """
         流式生成单章正文。支持多轮对话：若传入 conversation_messages（严格的 messages 列表），
-        则使用该 messages 发起请求并流式接收回复；否则按旧方式构造 system+user 单轮消息。
+        则在稳定前缀与本章信息之间原样插入该 messages 发起请求并流式接收回复；否则按旧方式构造 system+user 单轮消息。
+        hedge：是否启用首 token 对冲（None 时取 Hedge_Policy.enabled）。
         """
         index_map = {item.index: item for item in outline_items}
         item = index_map.get(chapter_index)
@@ -351,19 +587,10 @@ class ChapterAgent:
         lang_code = (language or self._detect_lang_from_characters(all_characters)).lower()
         lang_label = self._lang_label(lang_code)
 
-        char_info = self._characters_to_compact_dicts(all_characters)
-        instructions = (
-            "你是一名专业小说写作代笔作者。请根据给定的章节标题、该章概述、所有人物信息，以及前后章节的概括（若有）创作本章正文内容。\n"
-            "要求：\n"
-            "1) 采用叙事文本，不要输出标题、小节标题、或任何额外标记；\n"
-            "2) 内容要具体生动，描写人物行为、心理和对话，避免空泛总结；\n"
-            "3) 与前后章衔接自然，不要剧透下一章但可合理埋伏笔；\n"
-            "4) 文笔统一、角色人设稳定；\n"
-            f"5) 最终输出语言：{lang_label}；\n"
-            "6) 只输出正文内容。"
-        )
-
-        user_payload = {
+        # 提示布局：稳定前缀（指令 + 整部小说的人物设定 + 文风要求）在前，逐章变化的部分在后。
+        # 同一小说、同一语言下前缀逐字节相同，供应商的自动前缀缓存（prompt caching）才能命中。
+        system_prefix = self._content_system_prefix(all_characters, lang_label)
+        chapter_payload = {
             "chapter": {
                 "index": item.index,
                 "title": item.title,
@@ -373,44 +600,36 @@ class ChapterAgent:
                 "previous_synopsis": prev_synopsis or "",
                 "next_synopsis": next_synopsis or ""
             },
-            "characters": char_info,
-            "style": {
-                "language": lang_label,
-                "tone": "叙事流畅、细节充实、情感丰沛",
-                "avoid": ["重复概述", "流水账", "突兀转场", "过度说明"]
-            }
         }
-        prompt = json.dumps(user_payload, ensure_ascii=False)
+        chapter_context = json.dumps(chapter_payload, ensure_ascii=False, sort_keys=True)
 
-        # 如果传入 conversation_messages（多轮），则直接使用它，否则构造 system+user 单轮
         if conversation_messages:
-            if conversation_messages:
-                # 将messages里第一个元素的content替换为instructions+user_payload里的信息拼接而成的新content，保持role不变
-                # 复制以避免修改调用方数据；构造合并后的 system 内容并确保位于首位
-                messages = list(conversation_messages)
-                system_content = instructions + "\n\n" + json.dumps(user_payload, ensure_ascii=False)
-                if messages and messages[0].get("role") == "system":
-                    messages[0] = {"role": "system", "content": system_content}
-                else:
-                    messages.insert(0, {"role": "system", "content": system_content})
-            else:
-                messages = [
-                    {"role": "system", "content": instructions},
-                    {"role": "user", "content": prompt}
+            # 多轮：稳定前缀 + 调用方的对话历史（原样保留，包括其中的 system 消息）+ 本章信息（放在最后一条 user）。
+            # 逐章变化的本章信息放在历史之后，前几轮已发送过的历史才能继续作为公共前缀命中缓存。
+            messages = [
+                {"role": "system", "content": system_prefix},
+                *conversation_messages,
+                {"role": "user", "content": chapter_context},
+            ]
+        else:
+            messages = [
+                {"role": "system", "content": system_prefix},
+                {"role": "user", "content": chapter_context}
             ]
-        # print("流式入参 messages:", json.dumps(messages, ensure_ascii=False))
         # 使用 adapter 的流式接口，传入 messages
-        content = await self.adapter.stream_text(on_token=on_token, messages=messages)
+        content = await self.adapter.stream_text(on_token=on_token, messages=messages, hedge=hedge)
         return content.strip()
 
     async def summarize_content(
         self,
         content: str,
         target_length: int = 200,
-        language: Optional[str] = None
+        language: Optional[str] = None,
+        use_cache: bool = True
     ) -> str:
         """
         将章节内容压缩为指定长度摘要（非流式）。
+        章节内容未变化时直接返回缓存的摘要；use_cache=False 强制重新生成。
         """
         lang_code = (language or self._detect_lang_from_text(content)).lower()
         lang_label = self._lang_label(lang_code)
@@ -423,7 +642,7 @@ class ChapterAgent:
             "不要输出任何前后缀、标题、引号或JSON，仅输出摘要正文。"
         )
         prompt = content
-        summary = await self.adapter.text(prompt=prompt, instructions=instructions)
+        summary = await self.adapter.text(prompt=prompt, instructions=instructions, use_cache=use_cache)
         return (summary or "").strip()
 
 
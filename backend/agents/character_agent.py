@@ -7,8 +7,10 @@ from typing import List, Optional, Dict, Any, AsyncIterable, AsyncGenerator
 from pydantic import BaseModel, Field, ValidationError
 from db.models.character import Character
 
-from tools.deepseek.create_model_response import DeepSeekClient
+from tools.provider_registry import CLIENT_FACTORIES, get_client
 from tools.openai.create_model_response import GPTClient
+from tools.admission import BATCH, admit, estimate_tokens, get_limiter, limit_settings
+from tools.resilience import provider_chain, retry_or_failover
 
 
 class CharacterItem(BaseModel):
@@ -26,16 +28,16 @@ class CharacterAgent:
     - 流式结构化（新增）：每解析出一个角色就 yield 给前端
     """
 
-    def __init__(self, provider: str = "deepseek", config_path: Optional[str] = None):
+    def __init__(self, provider: str = "deepseek", config_path: Optional[str] = None, priority: int = BATCH):
         self.provider = provider.lower()
-        if self.provider == "deepseek":
-            self.client = DeepSeekClient(config_path or "config/deepseek/config.yaml")
-            self._use_pydantic_format = False
-        elif self.provider == "openai":
-            self.client = GPTClient(config_path or "config/openai/config.yaml")
-            self._use_pydantic_format = True
-        else:
-            raise ValueError("Unsupported provider. Use 'deepseek' or 'openai'.")
+        if self.provider not in CLIENT_FACTORIES:
+            raise ValueError(f"Unsupported provider. Use one of: {', '.join(CLIENT_FACTORIES)}.")
+        self.client = get_client(self.provider, config_path)
+        # GPTClient 以 pydantic 模型约束输出；DeepSeek 及其他 OpenAI 兼容客户端使用 json_object
+        self._use_pydantic_format = isinstance(self.client, GPTClient)
+        # 准入控制：与 ChapterAgent 共享同一 provider 的限流器
+        self.priority = priority
+        self.limiter = get_limiter(self.provider, limit_settings(self.client.config_info))
 
     def _build_instructions(self) -> str:
         # 要求严格 JSON，便于流式解析
@@ -70,20 +72,24 @@ class CharacterAgent:
             "请依据上述信息产出角色列表。"
         )
 
-    async def generate_characters(self, novel: Novel) -> List[Character]:
+    async def generate_characters(self, novel: Novel, use_cache: bool = True) -> List[Character]:
         """
         兼容保留：非流式一次性返回。
+        小说信息未变化时直接返回缓存的结果；use_cache=False 强制重新生成。
         """
         instructions = self._build_instructions()
         prompt = self._build_prompt(novel)
+        estimated = estimate_tokens([{"content": instructions}, {"content": prompt}])
 
         raw: Any
-        if self.provider == "openai":
-            raw = await self.client.async_non_stream_response(
-                prompt=prompt,
-                instructions=instructions,
-                text_format=CharacterGenerationResult,
-            )
+        if self._use_pydantic_format:
+            async with admit(self.limiter, self.priority, estimated):
+                raw = await self.client.async_non_stream_response(
+                    prompt=prompt,
+                    instructions=instructions,
+                    text_format=CharacterGenerationResult,
+                    use_cache=use_cache,
+                )
             if isinstance(raw, BaseModel):
                 data = raw.model_dump()
             else:
@@ -92,43 +98,92 @@ class CharacterAgent:
                 except ValidationError as e:
                     raise RuntimeError(f"OpenAI 响应结构化解析失败: {e}") from e
         else:
-            raw = await self.client.async_non_stream_response(
-                prompt=prompt,
-                instructions=instructions,
-                is_structured=True,
-            )
+            async with admit(self.limiter, self.priority, estimated):
+                raw = await self.client.async_non_stream_response(
+                    prompt=prompt,
+                    instructions=instructions,
+                    is_structured=True,
+                    use_cache=use_cache,
+                )
             try:
                 data = CharacterGenerationResult.model_validate(raw).model_dump()  # type: ignore[arg-type]
             except ValidationError as e:
-                raise RuntimeError(f"DeepSeek 响应结构化解析失败: {e}") from e
+                raise RuntimeError(f"{self.provider} 响应结构化解析失败: {e}") from e
 
         return self._to_characters(data, novel_uid=getattr(novel, "uid", "") or "")
 
     async def generate_characters_stream(self, novel: Novel) -> AsyncGenerator[Character, None]:
         """
         流式结构化：模型以 JSON 形式流式输出，解析到一个角色对象就 yield 一个 Character。
+        在输出第一个角色之前失败时按重试策略重试，并可切换到 Provider_Fallbacks 中的备用供应商；
+        已输出部分角色后失败则直接抛出（JSON 数组无法可靠续写）。
         """
         instructions = self._build_instructions()
         prompt = self._build_prompt(novel)
         novel_uid = getattr(novel, "uid", "") or ""
 
-        # 启动模型流
-        if self.provider == "openai":
-            stream = self.client.async_stream_response(
-                prompt=prompt,
-                instructions=instructions,
-                text_format=CharacterGenerationResult,  # 提示结构化
-            )
+        yielded = 0
+        first_error: Optional[Exception] = None
+        chain = provider_chain(self.provider)
+        for i, provider in enumerate(chain):
+            next_provider = chain[i + 1] if i + 1 < len(chain) else None
+            retries = 0
+            while True:
+                attempt = self._stream_characters(provider, instructions, prompt, novel_uid)
+                try:
+                    async for character in attempt:
+                        yielded += 1
+                        yield character
+                    return
+                except Exception as exc:
+                    if yielded:
+                        raise
+                    first_error = first_error or exc
+                    if await retry_or_failover(exc, provider, next_provider, retries, 0):
+                        retries += 1
+                        continue
+                    break
+                finally:
+                    # 调用方提前关闭本生成器时，同样关闭本次尝试（释放准入名额并关闭上游流）
+                    await attempt.aclose()
+        raise first_error
+
+    async def _stream_characters(
+        self, provider: str, instructions: str, prompt: str, novel_uid: str
+    ) -> AsyncGenerator[Character, None]:
+        """对单个供应商发起一次流式请求并增量解析角色（主供应商沿用构造时的客户端）。"""
+        if provider == self.provider:
+            client, limiter = self.client, self.limiter
         else:
-            stream = self.client.async_stream_response(
-                prompt=prompt,
-                instructions=instructions,
-                is_structured=True,  # JSON Object
-            )
+            client = get_client(provider)
+            limiter = get_limiter(provider, limit_settings(client.config_info))
+        estimated = estimate_tokens([{"content": instructions}, {"content": prompt}])
+
+        # 排队直到放行，整个流结束（或被关闭）时归还名额
+        async with admit(limiter, self.priority, estimated):
+            # 启动模型流
+            if isinstance(client, GPTClient):
+                stream = client.async_stream_response(
+                    prompt=prompt,
+                    instructions=instructions,
+                    text_format=CharacterGenerationResult,  # 提示结构化
+                )
+            else:
+                stream = client.async_stream_response(
+                    prompt=prompt,
+                    instructions=instructions,
+                    is_structured=True,  # JSON Object
+                )
 
-        # 增量解析器：锁定 "characters": [ ... ]，逐个对象输出
-        async for character in self._parse_characters_from_stream(stream, novel_uid=novel_uid):
-            yield character
+            # 增量解析器：锁定 "characters": [ ... ]，逐个对象输出
+            parser = self._parse_characters_from_stream(stream, novel_uid=novel_uid)
+            try:
+                async for character in parser:
+                    yield character
+            finally:
+                # 调用方提前关闭（如客户端断开后取消任务）时，同时关闭解析器与上游模型流
+                await parser.aclose()
+                await stream.aclose()
 
     @staticmethod
     def _to_characters(payload: Dict[str, Any], novel_uid: str) -> List[Character]:
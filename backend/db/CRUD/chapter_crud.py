@@ -1,81 +1,218 @@
 import uuid
-import sqlite3
-from typing import List, Optional
+from typing import Dict, List, Optional, Sequence, Union, Any
 
-import aiosqlite
-from db.sqlite import DB_FILE
-from db.models.chapter import Chapter
+from db.pool import get_pool
+from db.sqlite import NOW_SQL
+from db.query import select_columns, chunked
+from db.cache import get_cache, read_through, CHAPTER
+from db.models.chapter import Chapter, ChapterMeta, CHAPTER_COLUMNS, CHAPTER_META_COLUMNS
 
+# 正文存放在 ChapterContent 表中，按 chapter_uid 与 Chapters 一对一
+_UPSERT_CONTENT_SQL = (
+    "INSERT INTO ChapterContent (chapter_uid, content) VALUES (?, ?) "
+    "ON CONFLICT(chapter_uid) DO UPDATE SET content=excluded.content"
+)
 
-async def _connect() -> aiosqlite.Connection:
-    conn = await aiosqlite.connect(DB_FILE)
-    conn.row_factory = sqlite3.Row
-    await conn.execute("PRAGMA foreign_keys = ON")
-    return conn
+# 流式生成中（或中断后尚未合并）的正文以 ChapterContentChunk 中按 id 拼接的片段为准
+_CONTENT_EXPR = (
+    "COALESCE((SELECT group_concat(text, '') FROM "
+    "(SELECT text FROM ChapterContentChunk k WHERE k.chapter_uid = c.uid ORDER BY k.id)), "
+    "cc.content, '') AS content"
+)
+
+
+def _chapter_select(fields: Optional[Sequence[str]], required: Sequence[str] = ("uid",)) -> str:
+    """
+    生成 "SELECT ... FROM ..." 片段（Chapters 别名为 c）：
+    只有请求了 content 时才 LEFT JOIN ChapterContent（并合并未压缩的流式片段），元数据查询不会触及正文页。
+    """
+    cols = select_columns(fields, CHAPTER_COLUMNS, required=required).split(", ")
+    exprs = [_CONTENT_EXPR if c == "content" else f"c.{c}" for c in cols]
+    if "content" in cols:
+        return f"SELECT {', '.join(exprs)} FROM Chapters c LEFT JOIN ChapterContent cc ON cc.chapter_uid = c.uid"
+    return f"SELECT {', '.join(exprs)} FROM Chapters c"
 
 
 async def create_chapter(novel_uid: str, chapter_idx: int, title: str, content: str = "", synopsis: str = "") -> str:
     uid = str(uuid.uuid4())
-    conn = await _connect()
-    try:
+    async with get_pool().writer() as conn:
         await conn.execute(
-            "INSERT INTO Chapters (uid, novel_uid, chapter_idx, title, content, synopsis) VALUES (?, ?, ?, ?, ?, ?)",
-            (uid, novel_uid, chapter_idx, title, content, synopsis),
+            f"INSERT INTO Chapters (uid, novel_uid, chapter_idx, title, synopsis, created_at, updated_at) VALUES (?, ?, ?, ?, ?, {NOW_SQL}, {NOW_SQL})",
+            (uid, novel_uid, chapter_idx, title, synopsis),
         )
+        await conn.execute("INSERT INTO ChapterContent (chapter_uid, content) VALUES (?, ?)", (uid, content or ""))
         await conn.commit()
         return uid
-    finally:
-        await conn.close()
 
 
-async def get_chapter(ch_uid: str) -> Optional[Chapter]:
-    conn = await _connect()
-    try:
-        cur = await conn.execute("SELECT * FROM Chapters WHERE uid=?", (ch_uid,))
-        row = await cur.fetchone()
-        return Chapter(**row) if row else None
-    finally:
-        await conn.close()
-
-
-async def list_chapters(novel_uid: str) -> List[Chapter]:
-    conn = await _connect()
-    try:
-        # Order chapters by creation time ascending (earlier first)
-        cur = await conn.execute(
-            "SELECT * FROM Chapters WHERE novel_uid=? ORDER BY created_at ASC",
-            (novel_uid,),
+async def create_chapters_bulk(novel_uid: str, items: Sequence[Dict[str, Any]]) -> List[str]:
+    """
+    在同一个事务内批量写入章节（executemany），返回与 items 顺序一致的 uid 列表。
+    items 元素字段：chapter_idx、title、synopsis、content（可选）、uid（可选）。
+    若传入的 uid 已存在则按 upsert 处理：只更新 chapter_idx/title/synopsis，不覆盖已有正文。
+    """
+    uids: List[str] = []
+    rows = []
+    contents = []
+    for it in items:
+        uid = it.get("uid") or str(uuid.uuid4())
+        uids.append(uid)
+        rows.append((uid, novel_uid, it.get("chapter_idx", 0), it.get("title", ""), it.get("synopsis", "")))
+        contents.append((uid, it.get("content") or ""))
+    if not rows:
+        return uids
+    async with get_pool().writer() as conn:
+        await conn.executemany(
+            f"INSERT INTO Chapters (uid, novel_uid, chapter_idx, title, synopsis, created_at, updated_at) VALUES (?, ?, ?, ?, ?, {NOW_SQL}, {NOW_SQL}) "
+            f"ON CONFLICT(uid) DO UPDATE SET chapter_idx=excluded.chapter_idx, title=excluded.title, synopsis=excluded.synopsis, updated_at={NOW_SQL}",
+            rows,
+        )
+        await conn.executemany(
+            "INSERT INTO ChapterContent (chapter_uid, content) VALUES (?, ?) ON CONFLICT(chapter_uid) DO NOTHING",
+            contents,
         )
+        await conn.commit()
+        get_cache().invalidate(CHAPTER, *uids)
+        return uids
+
+
+async def get_chapter(ch_uid: str, fields: Optional[Sequence[str]] = None) -> Optional[Chapter]:
+    """fields 为需要读取的列（None 表示全部）；不含 content 时不会读取正文。结果经实体缓存读穿透。"""
+    select = _chapter_select(fields)
+
+    async def load() -> Optional[Chapter]:
+        async with get_pool().reader() as conn:
+            cur = await conn.execute(f"{select} WHERE c.uid=?", (ch_uid,))
+            row = await cur.fetchone()
+            return Chapter(**row) if row else None
+
+    return await read_through(CHAPTER, ch_uid, tuple(fields) if fields else None, load)
+
+
+async def list_chapters(
+    novel_uid: str,
+    limit: Optional[int] = None,
+    offset: int = 0,
+    after: Optional[Sequence] = None,
+    fields: Optional[Sequence[str]] = None,
+) -> List[Union[ChapterMeta, Chapter]]:
+    """
+    按 (chapter_idx, uid) 升序分页读取章节。
+    - limit/offset：传统分页（limit=None 表示不限）；
+    - after：keyset 游标 (chapter_idx, uid)，只返回排在其后的章节，深翻页也只读取 limit 行；
+    - fields：需要的列，默认只读元数据并返回 ChapterMeta；包含 content 时返回 Chapter。
+    """
+    if fields is None:
+        fields = CHAPTER_META_COLUMNS
+    row_type = Chapter if "content" in fields else ChapterMeta
+    select = _chapter_select(fields, required=("uid", "chapter_idx"))
+    sql = f"{select} WHERE c.novel_uid=?"
+    params: list = [novel_uid]
+    if after is not None:
+        sql += " AND (c.chapter_idx, c.uid) > (?, ?)"
+        params.extend(after)
+    sql += " ORDER BY c.chapter_idx ASC, c.uid ASC LIMIT ? OFFSET ?"
+    params.extend([limit if limit is not None else -1, offset])
+    async with get_pool().reader() as conn:
+        cur = await conn.execute(sql, params)
         rows = await cur.fetchall()
-        return [Chapter(**r) for r in rows]
-    finally:
-        await conn.close()
+        return [row_type(**r) for r in rows]
+
+
+async def count_chapters(novel_uid: str) -> int:
+    async with get_pool().reader() as conn:
+        cur = await conn.execute("SELECT COUNT(*) FROM Chapters WHERE novel_uid=?", (novel_uid,))
+        row = await cur.fetchone()
+        return row[0]
 
 
 async def update_chapter(uid: str, title: str, content: str, synopsis: Optional[str] = None) -> bool:
-    conn = await _connect()
-    try:
+    async with get_pool().writer() as conn:
         if synopsis is None:
             cur = await conn.execute(
-                "UPDATE Chapters SET title=?, content=? WHERE uid=?",
-                (title, content, uid),
+                f"UPDATE Chapters SET title=?, updated_at={NOW_SQL} WHERE uid=?",
+                (title, uid),
             )
         else:
             cur = await conn.execute(
-                "UPDATE Chapters SET title=?, content=?, synopsis=? WHERE uid=?",
-                (title, content, synopsis, uid),
+                f"UPDATE Chapters SET title=?, synopsis=?, updated_at={NOW_SQL} WHERE uid=?",
+                (title, synopsis, uid),
             )
+        updated = cur.rowcount > 0
+        if updated:
+            await conn.execute(_UPSERT_CONTENT_SQL, (uid, content or ""))
+            await conn.execute("DELETE FROM ChapterContentChunk WHERE chapter_uid=?", (uid,))
         await conn.commit()
-        return cur.rowcount > 0
-    finally:
-        await conn.close()
+        get_cache().invalidate(CHAPTER, uid)
+        return updated
+
+
+async def reset_chapter_content_chunks(uid: str) -> None:
+    """开始新一轮流式生成前清掉上一次中断遗留的片段。"""
+    async with get_pool().writer() as conn:
+        await conn.execute("DELETE FROM ChapterContentChunk WHERE chapter_uid=?", (uid,))
+        await conn.commit()
+    get_cache().invalidate(CHAPTER, uid)
+
+
+async def append_chapter_content(uid: str, text: str) -> None:
+    """
+    流式写入：只追加本次新增的片段（写入量与片段长度成正比），不重写整段正文；
+    读取时 get_chapter 会把片段拼接在一起，生成结束后由 compact_chapter_content 合并。
+    """
+    if not text:
+        return
+    async with get_pool().writer() as conn:
+        await conn.execute("INSERT INTO ChapterContentChunk (chapter_uid, text) VALUES (?, ?)", (uid, text))
+        await conn.commit()
+    get_cache().invalidate(CHAPTER, uid)
+
+
+async def compact_chapter_content(uid: str, content: Optional[str] = None) -> bool:
+    """
+    生成结束：在一个事务内把正文写入 ChapterContent 并删除片段。
+    content 为 None 时使用已追加片段的拼接结果。
+    """
+    async with get_pool().writer() as conn:
+        if content is None:
+            cur = await conn.execute("SELECT text FROM ChapterContentChunk WHERE chapter_uid=? ORDER BY id", (uid,))
+            content = "".join(r[0] for r in await cur.fetchall())
+        cur = await conn.execute(f"UPDATE Chapters SET updated_at={NOW_SQL} WHERE uid=?", (uid,))
+        updated = cur.rowcount > 0
+        if updated:
+            await conn.execute(_UPSERT_CONTENT_SQL, (uid, content))
+        await conn.execute("DELETE FROM ChapterContentChunk WHERE chapter_uid=?", (uid,))
+        await conn.commit()
+        get_cache().invalidate(CHAPTER, uid)
+        return updated
 
 
 async def delete_chapter(uid: str) -> bool:
-    conn = await _connect()
-    try:
+    async with get_pool().writer() as conn:
         cur = await conn.execute("DELETE FROM Chapters WHERE uid=?", (uid,))
         await conn.commit()
+        get_cache().invalidate(CHAPTER, uid)
         return cur.rowcount > 0
-    finally:
-        await conn.close()
\ No newline at end of file
+
+
+async def delete_chapters(uids: Sequence[str]) -> Dict[str, bool]:
+    """
+    在同一个事务内批量删除，返回 {uid: 是否删除}（不存在的 uid 为 False）。
+    uid 列表按 MAX_SQL_PARAMS 分块生成 IN (...)，成千上万条也只提交一次。
+    """
+    unique = list(dict.fromkeys(uids))
+    results = {uid: False for uid in unique}
+    if not unique:
+        return results
+    async with get_pool().writer() as conn:
+        for chunk in chunked(unique):
+            marks = ", ".join("?" * len(chunk))
+            cur = await conn.execute(f"SELECT uid FROM Chapters WHERE uid IN ({marks})", chunk)
+            for row in await cur.fetchall():
+                results[row[0]] = True
+        for chunk in chunked([uid for uid, found in results.items() if found]):
+            marks = ", ".join("?" * len(chunk))
+            await conn.execute(f"DELETE FROM Chapters WHERE uid IN ({marks})", chunk)
+        await conn.commit()
+        get_cache().invalidate(CHAPTER, *unique)
+        return results
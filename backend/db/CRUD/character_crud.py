@@ -1,73 +1,161 @@
 # db/CRUD/character_crud.py
 import uuid
-import sqlite3
-from typing import Optional, List
+from typing import Optional, List, Sequence, Dict, Any, Tuple
 
-import aiosqlite
-from db.sqlite import DB_FILE
-from db.models.character import Character
-
-
-async def _connect() -> aiosqlite.Connection:
-    conn = await aiosqlite.connect(DB_FILE)
-    conn.row_factory = sqlite3.Row
-    await conn.execute("PRAGMA foreign_keys = ON")
-    return conn
+from db.pool import get_pool
+from db.sqlite import NOW_SQL
+from db.query import select_columns, chunked
+from db.cache import get_cache, read_through, CHARACTERS
+from db.models.character import Character, CHARACTER_COLUMNS
 
 
 async def create_character(novel_uid: str, name: str, desc: str, is_main: bool) -> str:
     uid = str(uuid.uuid4())
-    conn = await _connect()
-    try:
+    async with get_pool().writer() as conn:
         await conn.execute(
-            "INSERT INTO Characters (uid, novel_uid, name, description, is_main) VALUES (?, ?, ?, ?, ?)",
+            f"INSERT INTO Characters (uid, novel_uid, name, description, is_main, created_at, updated_at) VALUES (?, ?, ?, ?, ?, {NOW_SQL}, {NOW_SQL})",
             (uid, novel_uid, name, desc, 1 if is_main else 0),
         )
         await conn.commit()
+        get_cache().invalidate(CHARACTERS, novel_uid)
         return uid
-    finally:
-        await conn.close()
 
 
-async def get_character(char_uid: str) -> Optional[Character]:
-    conn = await _connect()
-    try:
-        cur = await conn.execute("SELECT * FROM Characters WHERE uid=?", (char_uid,))
+async def create_characters_bulk(novel_uid: str, items: Sequence[Dict[str, Any]]) -> List[str]:
+    """
+    在同一个事务内批量写入角色（executemany），返回与 items 顺序一致的 uid 列表。
+    items 元素字段：name、description、is_main、uid（可选，已存在时按 upsert 更新）。
+    """
+    uids: List[str] = []
+    rows = []
+    for it in items:
+        uid = it.get("uid") or str(uuid.uuid4())
+        uids.append(uid)
+        rows.append((uid, novel_uid, it.get("name", ""), it.get("description", ""), 1 if it.get("is_main") else 0))
+    if not rows:
+        return uids
+    async with get_pool().writer() as conn:
+        await conn.executemany(
+            f"INSERT INTO Characters (uid, novel_uid, name, description, is_main, created_at, updated_at) VALUES (?, ?, ?, ?, ?, {NOW_SQL}, {NOW_SQL}) "
+            f"ON CONFLICT(uid) DO UPDATE SET name=excluded.name, description=excluded.description, is_main=excluded.is_main, updated_at={NOW_SQL}",
+            rows,
+        )
+        await conn.commit()
+        get_cache().invalidate(CHARACTERS, novel_uid)
+        return uids
+
+
+async def get_character(char_uid: str, fields: Optional[Sequence[str]] = None) -> Optional[Character]:
+    cols = select_columns(fields, CHARACTER_COLUMNS)
+    async with get_pool().reader() as conn:
+        cur = await conn.execute(f"SELECT {cols} FROM Characters WHERE uid=?", (char_uid,))
         row = await cur.fetchone()
         return Character(**row) if row else None
-    finally:
-        await conn.close()
 
 
-async def list_characters(novel_uid: str) -> List[Character]:
-    conn = await _connect()
-    try:
-        # Order characters by creation time ascending (earlier first)
-        cur = await conn.execute("SELECT * FROM Characters WHERE novel_uid=? ORDER BY created_at ASC", (novel_uid,))
+async def _select_characters(
+    novel_uid: str,
+    limit: Optional[int],
+    offset: int,
+    after: Optional[int],
+    fields: Optional[Sequence[str]],
+) -> List[Tuple[int, Character]]:
+    """
+    按写入顺序（rowid 升序）读取角色，返回 (seq, Character)，seq 即 rowid。
+    created_at 只精确到秒、uid 是随机 uuid，都不能区分同一批写入的角色；rowid 单调递增，
+    create_characters_bulk 写入的一批角色按 LLM 给出的顺序（主角在前）返回。
+    """
+    cols = select_columns(fields, CHARACTER_COLUMNS)
+    sql = f"SELECT rowid AS seq, {cols} FROM Characters WHERE novel_uid=?"
+    params: list = [novel_uid]
+    if after is not None:
+        sql += " AND rowid > ?"
+        params.append(after)
+    sql += " ORDER BY rowid ASC LIMIT ? OFFSET ?"
+    params.extend([limit if limit is not None else -1, offset])
+    async with get_pool().reader() as conn:
+        cur = await conn.execute(sql, params)
         rows = await cur.fetchall()
-        return [Character(**r) for r in rows]
-    finally:
-        await conn.close()
+        return [(r["seq"], Character(**{k: r[k] for k in r.keys() if k != "seq"})) for r in rows]
+
+
+async def list_characters(novel_uid: str, fields: Optional[Sequence[str]] = None) -> List[Character]:
+    """
+    按写入顺序读取某小说的全部角色（生成提示词时），经实体缓存读穿透，角色写入后失效。
+    fields 为需要的列（None 表示全部）。
+    """
+    async def load() -> List[Character]:
+        return [c for _, c in await _select_characters(novel_uid, None, 0, None, fields)]
+
+    return await read_through(CHARACTERS, novel_uid, tuple(fields) if fields else None, load)
+
+
+async def list_characters_page(
+    novel_uid: str,
+    limit: int,
+    offset: int = 0,
+    after: Optional[int] = None,
+    fields: Optional[Sequence[str]] = None,
+) -> List[Tuple[int, Character]]:
+    """
+    分页读取角色，返回 (seq, Character)。
+    after 为 keyset 游标（上一页最后一行的 seq）；fields 为需要的列（None 表示全部）。
+    """
+    return await _select_characters(novel_uid, limit, offset, after, fields)
+
+
+async def count_characters(novel_uid: str) -> int:
+    async with get_pool().reader() as conn:
+        cur = await conn.execute("SELECT COUNT(*) FROM Characters WHERE novel_uid=?", (novel_uid,))
+        row = await cur.fetchone()
+        return row[0]
+
+
+async def _novel_uids_of(conn, uids: Sequence[str]) -> Dict[str, str]:
+    """{角色 uid: 所属 novel_uid}，用于写入后失效对应小说的角色列表缓存。"""
+    found: Dict[str, str] = {}
+    for chunk in chunked(list(uids)):
+        marks = ", ".join("?" * len(chunk))
+        cur = await conn.execute(f"SELECT uid, novel_uid FROM Characters WHERE uid IN ({marks})", chunk)
+        for row in await cur.fetchall():
+            found[row[0]] = row[1]
+    return found
 
 
 async def update_character(uid: str, name: str, desc: str, is_main: bool) -> bool:
-    conn = await _connect()
-    try:
+    async with get_pool().writer() as conn:
+        owners = await _novel_uids_of(conn, [uid])
         cur = await conn.execute(
-            "UPDATE Characters SET name=?, description=?, is_main=? WHERE uid=?",
+            f"UPDATE Characters SET name=?, description=?, is_main=?, updated_at={NOW_SQL} WHERE uid=?",
             (name, desc, 1 if is_main else 0, uid),
         )
         await conn.commit()
+        get_cache().invalidate(CHARACTERS, *set(owners.values()))
         return cur.rowcount > 0
-    finally:
-        await conn.close()
 
 
 async def delete_character(uid: str) -> bool:
-    conn = await _connect()
-    try:
+    async with get_pool().writer() as conn:
+        owners = await _novel_uids_of(conn, [uid])
         cur = await conn.execute("DELETE FROM Characters WHERE uid=?", (uid,))
         await conn.commit()
+        get_cache().invalidate(CHARACTERS, *set(owners.values()))
         return cur.rowcount > 0
-    finally:
-        await conn.close()
\ No newline at end of file
+
+
+async def delete_characters(uids: Sequence[str]) -> Dict[str, bool]:
+    """单事务批量删除角色（IN 列表分块），返回每个 uid 是否被删除。"""
+    unique = list(dict.fromkeys(uids))
+    results = {uid: False for uid in unique}
+    if not unique:
+        return results
+    async with get_pool().writer() as conn:
+        owners = await _novel_uids_of(conn, unique)
+        for uid in owners:
+            results[uid] = True
+        for chunk in chunked(list(owners)):
+            marks = ", ".join("?" * len(chunk))
+            await conn.execute(f"DELETE FROM Characters WHERE uid IN ({marks})", chunk)
+        await conn.commit()
+        get_cache().invalidate(CHARACTERS, *set(owners.values()))
+        return results
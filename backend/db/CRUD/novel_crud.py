@@ -1,78 +1,114 @@
 import uuid
-import sqlite3
-from typing import Optional, List
+from typing import Dict, Optional, List, Sequence
 
-import aiosqlite
-from db.sqlite import DB_FILE
-from db.models.novel import Novel
-
-async def _connect() -> aiosqlite.Connection:
-    conn = await aiosqlite.connect(DB_FILE)
-    conn.row_factory = sqlite3.Row
-    await conn.execute("PRAGMA foreign_keys = ON")
-    return conn
+from db.pool import get_pool
+from db.sqlite import NOW_SQL
+from db.query import select_columns, chunked
+from db.cache import get_cache, read_through, NOVEL, CHAPTER, CHARACTERS
+from db.models.novel import Novel, NOVEL_COLUMNS
 
 async def create_novel(title: str, genre: str, description: str, latest_chapter_uid: Optional[str] = None) -> str:
     uid = str(uuid.uuid4())
-    conn = await _connect()
-    try:
+    async with get_pool().writer() as conn:
         await conn.execute(
-            "INSERT INTO NovelConfig (uid, title, genre, description, latest_chapter_uid) VALUES (?, ?, ?, ?, ?)",
+            f"INSERT INTO NovelConfig (uid, title, genre, description, latest_chapter_uid, created_at, updated_at) VALUES (?, ?, ?, ?, ?, {NOW_SQL}, {NOW_SQL})",
             (uid, title, genre, description, latest_chapter_uid),
         )
         await conn.commit()
         return uid
-    finally:
-        await conn.close()
 
-async def get_novel(novel_uid: str) -> Optional[Novel]:
-    conn = await _connect()
-    try:
-        cur = await conn.execute("SELECT * FROM NovelConfig WHERE uid=?", (novel_uid,))
-        row = await cur.fetchone()
-        return Novel(**row) if row else None
-    finally:
-        await conn.close()
+async def get_novel(novel_uid: str, fields: Optional[Sequence[str]] = None) -> Optional[Novel]:
+    """读穿透 db/cache.py 的实体缓存，写入接口提交后会使其失效。"""
+    cols = select_columns(fields, NOVEL_COLUMNS)
+
+    async def load() -> Optional[Novel]:
+        async with get_pool().reader() as conn:
+            cur = await conn.execute(f"SELECT {cols} FROM NovelConfig WHERE uid=?", (novel_uid,))
+            row = await cur.fetchone()
+            return Novel(**row) if row else None
 
-async def list_novels() -> List[Novel]:
-    conn = await _connect()
-    try:
-        # Order novels by updated_at descending (most recently updated first)
-        cur = await conn.execute("SELECT * FROM NovelConfig ORDER BY updated_at DESC")
+    return await read_through(NOVEL, novel_uid, tuple(fields) if fields else None, load)
+
+async def list_novels(
+    limit: Optional[int] = None,
+    offset: int = 0,
+    after: Optional[Sequence] = None,
+    fields: Optional[Sequence[str]] = None,
+) -> List[Novel]:
+    """
+    按 (updated_at, uid) 降序分页读取小说（最近更新的在前）。
+    after 为 keyset 游标 (updated_at, uid)；limit=None 表示不限；fields 为需要的列（None 表示全部）。
+    """
+    cols = select_columns(fields, NOVEL_COLUMNS, required=("uid", "updated_at"))
+    sql = f"SELECT {cols} FROM NovelConfig"
+    params: list = []
+    if after is not None:
+        sql += " WHERE (updated_at, uid) < (?, ?)"
+        params.extend(after)
+    sql += " ORDER BY updated_at DESC, uid DESC LIMIT ? OFFSET ?"
+    params.extend([limit if limit is not None else -1, offset])
+    async with get_pool().reader() as conn:
+        cur = await conn.execute(sql, params)
         rows = await cur.fetchall()
         return [Novel(**r) for r in rows]
-    finally:
-        await conn.close()
+
+async def count_novels() -> int:
+    async with get_pool().reader() as conn:
+        cur = await conn.execute("SELECT COUNT(*) FROM NovelConfig")
+        row = await cur.fetchone()
+        return row[0]
 
 async def update_novel(novel_uid: str, title: str, genre: str, description: str, latest_chapter_uid: Optional[str] = None) -> bool:
-    conn = await _connect()
-    try:
+    async with get_pool().writer() as conn:
         cur = await conn.execute(
-            "UPDATE NovelConfig SET title=?, genre=?, description=?, latest_chapter_uid=? WHERE uid=?",
+            f"UPDATE NovelConfig SET title=?, genre=?, description=?, latest_chapter_uid=?, updated_at={NOW_SQL} WHERE uid=?",
             (title, genre, description, latest_chapter_uid, novel_uid),
         )
         await conn.commit()
+        get_cache().invalidate(NOVEL, novel_uid)
         return cur.rowcount > 0
-    finally:
-        await conn.close()
 
 async def update_latest_chapter_uid(novel_uid: str, latest_chapter_uid: str) -> bool:
-    conn = await _connect()
-    try:
+    async with get_pool().writer() as conn:
         cur = await conn.execute(
-            "UPDATE NovelConfig SET latest_chapter_uid=? WHERE uid=?",
+            f"UPDATE NovelConfig SET latest_chapter_uid=?, updated_at={NOW_SQL} WHERE uid=?",
             (latest_chapter_uid, novel_uid),
         )
         await conn.commit()
+        get_cache().invalidate(NOVEL, novel_uid)
         return cur.rowcount > 0
-    finally:
-        await conn.close()
+
+def _invalidate_deleted(uids: Sequence[str]) -> None:
+    """小说删除会级联删除章节与角色：章节缓存按 uid 记录，无法逐个定位，整体失效。"""
+    if not uids:
+        return
+    cache = get_cache()
+    cache.invalidate(NOVEL, *uids)
+    cache.invalidate(CHARACTERS, *uids)
+    cache.invalidate_kind(CHAPTER)
 
 async def delete_novel(novel_uid: str) -> bool:
-    conn = await _connect()
-    try:
+    async with get_pool().writer() as conn:
         cur = await conn.execute("DELETE FROM NovelConfig WHERE uid=?", (novel_uid,))
         await conn.commit()
-        return cur.rowcount > 0        
-    finally:
-        await conn.close()
\ No newline at end of file
+        _invalidate_deleted([novel_uid])
+        return cur.rowcount > 0
+
+async def delete_novels(uids: Sequence[str]) -> Dict[str, bool]:
+    """单事务批量删除小说，其章节与角色随 ON DELETE CASCADE 一并删除；返回每个 uid 是否被删除。"""
+    unique = list(dict.fromkeys(uids))
+    results = {uid: False for uid in unique}
+    if not unique:
+        return results
+    async with get_pool().writer() as conn:
+        for chunk in chunked(unique):
+            marks = ", ".join("?" * len(chunk))
+            cur = await conn.execute(f"SELECT uid FROM NovelConfig WHERE uid IN ({marks})", chunk)
+            for row in await cur.fetchall():
+                results[row[0]] = True
+        for chunk in chunked([uid for uid, found in results.items() if found]):
+            marks = ", ".join("?" * len(chunk))
+            await conn.execute(f"DELETE FROM NovelConfig WHERE uid IN ({marks})", chunk)
+        await conn.commit()
+        _invalidate_deleted([uid for uid, found in results.items() if found])
+        return results
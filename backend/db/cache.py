@@ -0,0 +1,183 @@
+import os
+import sys
+import logging
+import dataclasses
+from collections import OrderedDict
+from dataclasses import dataclass, asdict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Set, Tuple
+
+logger = logging.getLogger("db_cache")
+
+DEFAULT_CACHE_MAX_ENTRIES = 2048
+DEFAULT_CACHE_MAX_BYTES = 64 * 1024 * 1024  # 64MB
+
+# 缓存的实体种类：ident 分别为 novel uid / chapter uid / novel uid（该小说的完整角色列表）
+NOVEL = "novel"
+CHAPTER = "chapter"
+CHARACTERS = "characters"
+
+# get() 未命中时的哨兵（None 本身不会被缓存）
+MISS = object()
+
+
+def estimate_size(value: Any) -> int:
+    """粗略估算对象占用的字节数（dataclass / list / dict 递归累加，字符串按 sys.getsizeof）。"""
+    if dataclasses.is_dataclass(value):
+        return sys.getsizeof(value) + sum(estimate_size(getattr(value, f.name)) for f in dataclasses.fields(value))
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(estimate_size(v) for v in value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimate_size(k) + estimate_size(v) for k, v in value.items())
+    return sys.getsizeof(value)
+
+
+def clone(value: Any) -> Any:
+    """浅拷贝 dataclass 行（字段都是不可变值），调用方修改返回值不会污染缓存。"""
+    if dataclasses.is_dataclass(value):
+        return dataclasses.replace(value)
+    if isinstance(value, list):
+        return [clone(v) for v in value]
+    return value
+
+
+@dataclass
+class CacheMetrics:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    invalidations: int = 0
+    skipped_stale: int = 0
+    skipped_oversize: int = 0
+
+
+class EntityCache:
+    """
+    进程内的读穿透实体缓存（LRU）：
+        - 同时按条目数与估算字节数限容，超出时淘汰最久未使用的条目；
+        - 键为 (kind, ident, variant)，variant 区分同一实体的不同列投影；
+        - invalidate(kind, ident) 删除该实体的全部 variant，CRUD 在每次写入提交后调用；
+        - 读库前取 token()，期间若发生过失效则 put() 放弃写入，避免并发写入后缓存旧值。
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_CACHE_MAX_ENTRIES, max_bytes: int = DEFAULT_CACHE_MAX_BYTES):
+        self.max_entries = max(0, int(max_entries))
+        self.max_bytes = max(0, int(max_bytes))
+        self.metrics = CacheMetrics()
+        self._entries: "OrderedDict[Tuple[str, str, Hashable], Tuple[Any, int]]" = OrderedDict()
+        self._variants: Dict[Tuple[str, str], Set[Hashable]] = {}
+        self._bytes = 0
+        self._epoch = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 and self.max_bytes > 0
+
+    def token(self) -> int:
+        return self._epoch
+
+    def get(self, kind: str, ident: str, variant: Hashable = None) -> Any:
+        key = (kind, ident, variant)
+        entry = self._entries.get(key)
+        if entry is None:
+            self.metrics.misses += 1
+            return MISS
+        self._entries.move_to_end(key)
+        self.metrics.hits += 1
+        return clone(entry[0])
+
+    def put(self, kind: str, ident: str, variant: Hashable, value: Any, token: int) -> None:
+        if not self.enabled:
+            return
+        if token != self._epoch:
+            self.metrics.skipped_stale += 1
+            return
+        size = estimate_size(value)
+        if size > self.max_bytes:
+            self.metrics.skipped_oversize += 1
+            return
+        key = (kind, ident, variant)
+        self._remove(key)
+        self._entries[key] = (clone(value), size)
+        self._variants.setdefault((kind, ident), set()).add(variant)
+        self._bytes += size
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.metrics.evictions += 1
+
+    def invalidate(self, kind: str, *idents: str) -> None:
+        self._epoch += 1
+        for ident in idents:
+            for variant in list(self._variants.get((kind, ident), ())):
+                self._remove((kind, ident, variant))
+                self.metrics.invalidations += 1
+
+    def invalidate_kind(self, kind: str) -> None:
+        """删除某一类的全部条目（如删除小说后级联删除的章节，无法逐个列出 uid）。"""
+        self._epoch += 1
+        for key in [k for k in self._entries if k[0] == kind]:
+            self._remove(key)
+            self.metrics.invalidations += 1
+
+    def clear(self) -> None:
+        self._epoch += 1
+        self._entries.clear()
+        self._variants.clear()
+        self._bytes = 0
+
+    def _remove(self, key: Tuple[str, str, Hashable]) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        self._bytes -= entry[1]
+        variants = self._variants.get(key[:2])
+        if variants is not None:
+            variants.discard(key[2])
+            if not variants:
+                del self._variants[key[:2]]
+
+    def stats(self) -> Dict:
+        data = asdict(self.metrics)
+        lookups = self.metrics.hits + self.metrics.misses
+        data.update({
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "hit_rate": round(self.metrics.hits / lookups, 4) if lookups else 0.0,
+        })
+        return data
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+_cache: Optional[EntityCache] = None
+
+
+def get_cache() -> EntityCache:
+    """进程内单例；ENTITY_CACHE_MAX_ENTRIES / ENTITY_CACHE_MAX_BYTES 控制容量（任一为 0 即关闭缓存）。"""
+    global _cache
+    if _cache is None:
+        _cache = EntityCache(
+            max_entries=_env_int("ENTITY_CACHE_MAX_ENTRIES", DEFAULT_CACHE_MAX_ENTRIES),
+            max_bytes=_env_int("ENTITY_CACHE_MAX_BYTES", DEFAULT_CACHE_MAX_BYTES),
+        )
+    return _cache
+
+
+async def read_through(kind: str, ident: str, variant: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+    """先查缓存，未命中时调用 loader() 读库并回填（结果为 None 时不缓存）。"""
+    cache = get_cache()
+    value = cache.get(kind, ident, variant)
+    if value is not MISS:
+        return value
+    token = cache.token()
+    value = await loader()
+    if value is not None:
+        cache.put(kind, ident, variant, value, token)
+    return value
@@ -0,0 +1,93 @@
+import os
+import sqlite3
+import logging
+import importlib.util
+from typing import List, Set
+
+logger = logging.getLogger("db")
+
+# 迁移脚本目录：文件名即版本号（yyyymmdd 或 yyyymmddHHMM），每个脚本提供 upgrade(conn)
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+
+SCHEMA_VERSION_TABLE = "schema_version"
+
+
+def version_key(version: str) -> str:
+    """8 位与 12 位版本号混用，右侧补零后按字符串即可得到时间顺序。"""
+    return version.ljust(12, "0")
+
+
+def list_migrations() -> List[str]:
+    """按时间顺序返回 db/migrations 下的全部版本号。"""
+    names = [
+        f[:-3] for f in os.listdir(MIGRATIONS_DIR)
+        if f.endswith(".py") and f[:-3].isdigit()
+    ]
+    return sorted(names, key=version_key)
+
+
+def load_migration(version: str):
+    """按版本号加载 db/migrations/<version>.py（文件名以数字开头，无法直接 import）。"""
+    path = os.path.join(MIGRATIONS_DIR, f"{version}.py")
+    spec = importlib.util.spec_from_file_location(f"migration_{version}", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def has_table(conn: sqlite3.Connection, table: str) -> bool:
+    row = conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (table,)).fetchone()
+    return row is not None
+
+
+def applied_versions(conn: sqlite3.Connection) -> Set[str]:
+    """只读查询已应用的版本；schema_version 表不存在时返回空集合（不触发写锁）。"""
+    if not has_table(conn, SCHEMA_VERSION_TABLE):
+        return set()
+    return {r[0] for r in conn.execute(f"SELECT version FROM {SCHEMA_VERSION_TABLE}").fetchall()}
+
+
+def ensure_version_table(conn: sqlite3.Connection, now_sql: str) -> None:
+    conn.execute(f"""
+    CREATE TABLE IF NOT EXISTS {SCHEMA_VERSION_TABLE} (
+        version TEXT PRIMARY KEY,
+        applied_at TEXT DEFAULT ({now_sql})
+    )
+    """)
+
+
+def record_versions(conn: sqlite3.Connection, versions: List[str], now_sql: str) -> None:
+    conn.executemany(
+        f"INSERT OR IGNORE INTO {SCHEMA_VERSION_TABLE} (version, applied_at) VALUES (?, {now_sql})",
+        [(v,) for v in versions],
+    )
+
+
+def apply_migrations(conn: sqlite3.Connection, versions: List[str], now_sql: str) -> None:
+    """
+    依次执行待应用的迁移，每个版本一个事务，成功后写入 schema_version。
+    迁移期间关闭外键（重建表时 DROP TABLE 不能触发级联删除），结束后恢复并做一致性检查；
+    同时开启 legacy_alter_table，避免 "RENAME TO xxx_old" 时子表的 REFERENCES 被改写到旧表名。
+    """
+    conn.commit()
+    conn.execute("PRAGMA foreign_keys = OFF")
+    conn.execute("PRAGMA legacy_alter_table = ON")
+    try:
+        for version in versions:
+            logger.info("Applying migration %s", version)
+            module = load_migration(version)
+            try:
+                conn.execute("BEGIN")
+                module.upgrade(conn)
+                record_versions(conn, [version], now_sql)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                logger.exception("Migration %s failed", version)
+                raise
+    finally:
+        conn.execute("PRAGMA legacy_alter_table = OFF")
+        conn.execute("PRAGMA foreign_keys = ON")
+    broken = conn.execute("PRAGMA foreign_key_check").fetchall()
+    if broken:
+        logger.warning("foreign_key_check reported %d orphan rows after migration", len(broken))
@@ -28,13 +28,17 @@ def has_cascade(conn: sqlite3.Connection, table: str, ref_table: str = "NovelCon
             return True
     return False
 
+def has_column(conn: sqlite3.Connection, table: str, column: str) -> bool:
+    rows = conn.execute(f"PRAGMA table_info({table})").fetchall()
+    return any(r["name"] == column for r in rows)
+
 def drop_trigger_if_exists(conn: sqlite3.Connection, name: str) -> None:
     conn.execute(f"DROP TRIGGER IF EXISTS {name}")
 
 def recreate_insert_trigger(conn: sqlite3.Connection, table: str, now_sql: str) -> None:
     trg_name = f"trg_{table}_ts_after_insert"
     drop_trigger_if_exists(conn, trg_name)
-    conn.executescript(f"""
+    conn.execute(f"""
     CREATE TRIGGER {trg_name}
     AFTER INSERT ON {table}
     FOR EACH ROW
@@ -50,7 +54,7 @@ def recreate_insert_trigger(conn: sqlite3.Connection, table: str, now_sql: str)
 def recreate_update_trigger(conn: sqlite3.Connection, table: str, now_sql: str) -> None:
     trg_name = f"trg_{table}_ts_after_update"
     drop_trigger_if_exists(conn, trg_name)
-    conn.executescript(f"""
+    conn.execute(f"""
     CREATE TRIGGER {trg_name}
     AFTER UPDATE ON {table}
     FOR EACH ROW
@@ -98,49 +102,56 @@ def rebuild_table_with_cascade(conn: sqlite3.Connection, table: str) -> None:
     else:
         raise RuntimeError("unsupported table")
 
-    cols_str = ", ".join(cols)
+    # copy only the columns the old table actually has (older schemas may lack created_at/updated_at/synopsis)
+    existing = {r["name"] for r in conn.execute(f"PRAGMA table_info({table})").fetchall()}
+    cols_str = ", ".join(c for c in cols if c in existing)
 
     # create tmp table
     conn.execute(create_sql)
-    # copy existing data (ignore missing columns by selecting declared cols; if older schema lacks a col, NULL will be inserted)
     conn.execute(f"INSERT INTO tmp_{table} ({cols_str}) SELECT {cols_str} FROM {table}")
     # drop old table and rename tmp
     conn.execute(f"DROP TABLE {table}")
     conn.execute(f"ALTER TABLE tmp_{table} RENAME TO {table}")
 
-def main() -> None:
-    print(f"Applying migration to DB: {DB_FILE}")
-    conn = get_connection()
-    try:
-        # quick check whether migration required
-        need = False
-        for t in ("Chapters", "Characters"):
-            if not has_cascade(conn, t):
-                need = True
-                break
-        if not need:
-            print("No changes required: child tables already have ON DELETE CASCADE.")
-            return
+def needs_upgrade(conn: sqlite3.Connection) -> bool:
+    return any(not has_cascade(conn, t) for t in ("Chapters", "Characters"))
 
-        conn.execute("PRAGMA foreign_keys = OFF")
-        conn.execute("BEGIN")
+def upgrade(conn: sqlite3.Connection) -> None:
+    """
+    Must run with PRAGMA foreign_keys = OFF (DROP TABLE would otherwise cascade).
+    Called by db/migrate.py in version order; no-op when both child tables already cascade.
+    """
+    if not needs_upgrade(conn):
+        return
 
-        # drop existing triggers for those tables (they will be recreated)
-        for t in ("Chapters", "Characters"):
-            drop_trigger_if_exists(conn, f"trg_{t}_ts_after_insert")
-            drop_trigger_if_exists(conn, f"trg_{t}_ts_after_update")
+    # drop existing triggers for those tables before rebuilding
+    for t in ("Chapters", "Characters"):
+        drop_trigger_if_exists(conn, f"trg_{t}_ts_after_insert")
+        drop_trigger_if_exists(conn, f"trg_{t}_ts_after_update")
 
-        # rebuild each table
-        for t in ("Chapters", "Characters"):
-            print(f"Rebuilding table {t} with ON DELETE CASCADE...")
-            rebuild_table_with_cascade(conn, t)
+    # rebuild each table
+    for t in ("Chapters", "Characters"):
+        print(f"Rebuilding table {t} with ON DELETE CASCADE...")
+        rebuild_table_with_cascade(conn, t)
 
-        # recreate triggers (use same logic as sqlite.py)
+    # recreate triggers only if the timestamp columns already exist (otherwise migration 20260215 adds both)
+    if all(has_column(conn, t, "updated_at") for t in ("NovelConfig", "Chapters", "Characters")):
         now_sql = get_now_sql_expr()
         for t in ("NovelConfig", "Chapters", "Characters"):
             recreate_insert_trigger(conn, t, now_sql)
             recreate_update_trigger(conn, t, now_sql)
 
+def main() -> None:
+    print(f"Applying migration to DB: {DB_FILE}")
+    conn = get_connection()
+    try:
+        if not needs_upgrade(conn):
+            print("No changes required: child tables already have ON DELETE CASCADE.")
+            return
+
+        conn.execute("PRAGMA foreign_keys = OFF")
+        conn.execute("BEGIN")
+        upgrade(conn)
         conn.execute("PRAGMA foreign_keys = ON")
         conn.commit()
         print("Migration applied successfully: child tables now use ON DELETE CASCADE.")
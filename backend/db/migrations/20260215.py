@@ -42,7 +42,7 @@ def get_now_sql_expr() -> str:
 def recreate_insert_trigger(conn: sqlite3.Connection, table: str, now_sql: str) -> None:
     trg_name = f"trg_{table}_ts_after_insert"
     drop_trigger_if_exists(conn, trg_name)
-    conn.executescript(f"""
+    conn.execute(f"""
     CREATE TRIGGER {trg_name}
     AFTER INSERT ON {table}
     FOR EACH ROW
@@ -58,7 +58,7 @@ def recreate_insert_trigger(conn: sqlite3.Connection, table: str, now_sql: str)
 def recreate_update_trigger(conn: sqlite3.Connection, table: str, now_sql: str) -> None:
     trg_name = f"trg_{table}_ts_after_update"
     drop_trigger_if_exists(conn, trg_name)
-    conn.executescript(f"""
+    conn.execute(f"""
     CREATE TRIGGER {trg_name}
     AFTER UPDATE ON {table}
     FOR EACH ROW
@@ -0,0 +1,75 @@
+# migration: add secondary indexes for per-novel chapter/character lookups and novel listing
+import os
+import sqlite3
+from typing import List, Tuple
+
+DB_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DB_FILE = os.path.join(DB_DIR, "novel.db")
+
+# (索引名, 表名, 列) —— 列顺序与 CRUD 中的 WHERE / ORDER BY 保持一致，uid 作为排序的最终决胜列
+INDEXES: List[Tuple[str, str, str]] = [
+    ("idx_Chapters_novel_idx", "Chapters", "novel_uid, chapter_idx, uid"),
+    ("idx_Chapters_novel_created", "Chapters", "novel_uid, created_at"),
+    ("idx_Characters_novel_created", "Characters", "novel_uid, created_at, uid"),
+    ("idx_Characters_novel_main", "Characters", "novel_uid, is_main"),
+    ("idx_NovelConfig_updated", "NovelConfig", "updated_at, uid"),
+]
+
+# 需要验证执行计划的列表查询（与 db/CRUD 中的语句一致；角色列表见 202610181400.py）
+PLAN_CHECKS: List[Tuple[str, tuple]] = [
+    ("SELECT * FROM Chapters WHERE novel_uid=? ORDER BY chapter_idx ASC, uid ASC LIMIT ? OFFSET ?", ("", 100, 0)),
+    ("SELECT * FROM Chapters WHERE novel_uid=? AND (chapter_idx, uid) > (?, ?) ORDER BY chapter_idx ASC, uid ASC LIMIT ? OFFSET ?", ("", 0, "", 100, 0)),
+    ("SELECT COUNT(*) FROM Chapters WHERE novel_uid=?", ("",)),
+    ("SELECT * FROM NovelConfig ORDER BY updated_at DESC, uid DESC LIMIT ? OFFSET ?", (100, 0)),
+    ("SELECT * FROM NovelConfig WHERE (updated_at, uid) < (?, ?) ORDER BY updated_at DESC, uid DESC LIMIT ? OFFSET ?", ("", "", 100, 0)),
+]
+
+def get_connection() -> sqlite3.Connection:
+    conn = sqlite3.connect(DB_FILE)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA foreign_keys = ON")
+    return conn
+
+def upgrade(conn: sqlite3.Connection) -> None:
+    for name, table, cols in INDEXES:
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({cols})")
+    # 刷新统计信息，便于查询规划器选择新索引
+    conn.execute("ANALYZE")
+
+def check_query_plans(conn: sqlite3.Connection) -> bool:
+    """
+    打印列表查询的 EXPLAIN QUERY PLAN，并确认：
+    - 不再出现不带索引的全表扫描（SCAN <table> 而非 SEARCH/SCAN ... USING INDEX）；
+    - 不再需要临时 B 树排序（USE TEMP B-TREE FOR ORDER BY）。
+    """
+    ok = True
+    for sql, params in PLAN_CHECKS:
+        details = [r["detail"] for r in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()]
+        print(f"{sql}\n  -> " + "\n  -> ".join(details))
+        for d in details:
+            if "TEMP B-TREE" in d or (d.startswith("SCAN") and "USING" not in d):
+                ok = False
+    return ok
+
+def main() -> None:
+    print(f"Using DB: {DB_FILE}")
+    conn = get_connection()
+    try:
+        conn.execute("BEGIN")
+        upgrade(conn)
+        conn.commit()
+        print("Migration 202610181000 applied successfully.")
+    except Exception as e:
+        conn.rollback()
+        print(f"Migration 202610181000 failed: {e}")
+        raise
+    try:
+        if check_query_plans(conn):
+            print("Query plan check passed: list queries use the new indexes.")
+        else:
+            print("Query plan check FAILED: some list queries still scan or sort.")
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    main()
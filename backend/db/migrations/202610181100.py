@@ -0,0 +1,59 @@
+# migration: drop timestamp triggers; created_at / updated_at are now written by the CRUD statements themselves
+import os
+import sqlite3
+from typing import Iterable
+from datetime import datetime
+
+DB_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DB_FILE = os.path.join(DB_DIR, "novel.db")
+
+TABLES: Iterable[str] = ("NovelConfig", "Chapters", "Characters")
+
+def get_connection() -> sqlite3.Connection:
+    conn = sqlite3.connect(DB_FILE)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA foreign_keys = ON")
+    return conn
+
+def get_now_sql_expr() -> str:
+    try:
+        off = datetime.now().astimezone().utcoffset()
+        if off is None:
+            raise ValueError("no utcoffset")
+        return "datetime('now','localtime')"
+    except Exception:
+        return "datetime('now','+28800 seconds')"
+
+def upgrade(conn: sqlite3.Connection) -> None:
+    # 1) 删除 AFTER INSERT / AFTER UPDATE 触发器：它们会对每次写入再执行一次整行 UPDATE（含正文）
+    for table in TABLES:
+        conn.execute(f"DROP TRIGGER IF EXISTS trg_{table}_ts_after_insert")
+        conn.execute(f"DROP TRIGGER IF EXISTS trg_{table}_ts_after_update")
+
+    # 2) 补齐可能遗留的空时间戳（此前依赖触发器填充）
+    now_sql = get_now_sql_expr()
+    for table in TABLES:
+        conn.execute(f"""
+            UPDATE {table}
+            SET created_at = COALESCE(created_at, {now_sql}),
+                updated_at = COALESCE(updated_at, {now_sql})
+            WHERE created_at IS NULL OR updated_at IS NULL
+        """)
+
+def main() -> None:
+    print(f"Using DB: {DB_FILE}")
+    conn = get_connection()
+    try:
+        conn.execute("BEGIN")
+        upgrade(conn)
+        conn.commit()
+        print("Migration 202610181100 applied successfully.")
+    except Exception as e:
+        conn.rollback()
+        print(f"Migration 202610181100 failed: {e}")
+        raise
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    main()
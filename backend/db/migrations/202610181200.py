@@ -0,0 +1,94 @@
+# migration: move Chapters.content into a dedicated ChapterContent table so chapter metadata rows stay small
+import os
+import sqlite3
+from datetime import datetime
+
+DB_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DB_FILE = os.path.join(DB_DIR, "novel.db")
+
+# 迁移后 Chapters 保留的列（不含 content）
+CHAPTER_COLS = ["uid", "novel_uid", "chapter_idx", "title", "synopsis", "created_at", "updated_at"]
+
+def get_connection() -> sqlite3.Connection:
+    conn = sqlite3.connect(DB_FILE)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+def get_now_sql_expr() -> str:
+    try:
+        off = datetime.now().astimezone().utcoffset()
+        if off is None:
+            raise ValueError("no utcoffset")
+        return "datetime('now','localtime')"
+    except Exception:
+        return "datetime('now','+28800 seconds')"
+
+def has_column(conn: sqlite3.Connection, table: str, column: str) -> bool:
+    rows = conn.execute(f"PRAGMA table_info({table})").fetchall()
+    return any(r["name"] == column for r in rows)
+
+def upgrade(conn: sqlite3.Connection) -> None:
+    """
+    需在 PRAGMA foreign_keys = OFF 下执行（重建 Chapters 时 DROP TABLE 不能触发级联删除）。
+    """
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS ChapterContent (
+            chapter_uid TEXT PRIMARY KEY,
+            content TEXT NOT NULL DEFAULT '',
+            FOREIGN KEY (chapter_uid) REFERENCES Chapters(uid) ON DELETE CASCADE
+        )
+    """)
+    if not has_column(conn, "Chapters", "content"):
+        return
+
+    # 1) 拷贝正文（已存在的 ChapterContent 行以其为准）
+    conn.execute("""
+        INSERT OR IGNORE INTO ChapterContent (chapter_uid, content)
+        SELECT uid, COALESCE(content, '') FROM Chapters
+    """)
+
+    # 2) 重建 Chapters，去掉 content 列
+    now_sql = get_now_sql_expr()
+    conn.execute(f"""
+        CREATE TABLE tmp_Chapters (
+            uid TEXT PRIMARY KEY,
+            novel_uid TEXT,
+            chapter_idx INTEGER,
+            title TEXT,
+            synopsis TEXT DEFAULT '',
+            created_at TEXT DEFAULT ({now_sql}),
+            updated_at TEXT DEFAULT ({now_sql}),
+            FOREIGN KEY (novel_uid) REFERENCES NovelConfig(uid) ON DELETE CASCADE
+        )
+    """)
+    cols_str = ", ".join(CHAPTER_COLS)
+    conn.execute(f"INSERT INTO tmp_Chapters ({cols_str}) SELECT {cols_str} FROM Chapters")
+    conn.execute("DROP TABLE Chapters")
+    conn.execute("ALTER TABLE tmp_Chapters RENAME TO Chapters")
+
+    # 3) DROP TABLE 会连带删除索引，重新创建
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_Chapters_novel_idx ON Chapters (novel_uid, chapter_idx, uid)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_Chapters_novel_created ON Chapters (novel_uid, created_at)")
+
+def main() -> None:
+    print(f"Using DB: {DB_FILE}")
+    conn = get_connection()
+    try:
+        conn.execute("PRAGMA foreign_keys = OFF")
+        conn.execute("BEGIN")
+        upgrade(conn)
+        broken = conn.execute("PRAGMA foreign_key_check(ChapterContent)").fetchall()
+        if broken:
+            raise RuntimeError(f"foreign key check failed: {len(broken)} rows")
+        conn.commit()
+        conn.execute("PRAGMA foreign_keys = ON")
+        print("Migration 202610181200 applied successfully.")
+    except Exception as e:
+        conn.rollback()
+        print(f"Migration 202610181200 failed: {e}")
+        raise
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    main()
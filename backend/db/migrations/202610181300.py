@@ -0,0 +1,42 @@
+# migration: add ChapterContentChunk, an append-only staging table for streamed chapter content
+import os
+import sqlite3
+
+DB_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DB_FILE = os.path.join(DB_DIR, "novel.db")
+
+def get_connection() -> sqlite3.Connection:
+    conn = sqlite3.connect(DB_FILE)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA foreign_keys = ON")
+    return conn
+
+def upgrade(conn: sqlite3.Connection) -> None:
+    # 流式生成时每次只追加新增片段（id 自增即顺序），生成结束后合并写入 ChapterContent 并删除
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS ChapterContentChunk (
+            id INTEGER PRIMARY KEY,
+            chapter_uid TEXT NOT NULL,
+            text TEXT NOT NULL,
+            FOREIGN KEY (chapter_uid) REFERENCES Chapters(uid) ON DELETE CASCADE
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_ChapterContentChunk_chapter ON ChapterContentChunk (chapter_uid, id)")
+
+def main() -> None:
+    print(f"Using DB: {DB_FILE}")
+    conn = get_connection()
+    try:
+        conn.execute("BEGIN")
+        upgrade(conn)
+        conn.commit()
+        print("Migration 202610181300 applied successfully.")
+    except Exception as e:
+        conn.rollback()
+        print(f"Migration 202610181300 failed: {e}")
+        raise
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    main()
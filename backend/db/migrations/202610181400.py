@@ -0,0 +1,58 @@
+# migration: list characters in insertion order (rowid) instead of (created_at, uid)
+import os
+import sqlite3
+from typing import List, Tuple
+
+DB_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DB_FILE = os.path.join(DB_DIR, "novel.db")
+
+# 需要验证执行计划的角色列表查询（与 db/CRUD/character_crud.py 中的语句一致）
+PLAN_CHECKS: List[Tuple[str, tuple]] = [
+    ("SELECT rowid AS seq, * FROM Characters WHERE novel_uid=? ORDER BY rowid ASC LIMIT ? OFFSET ?", ("", 100, 0)),
+    ("SELECT rowid AS seq, * FROM Characters WHERE novel_uid=? AND rowid > ? ORDER BY rowid ASC LIMIT ? OFFSET ?", ("", 0, 100, 0)),
+]
+
+def get_connection() -> sqlite3.Connection:
+    conn = sqlite3.connect(DB_FILE)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA foreign_keys = ON")
+    return conn
+
+def upgrade(conn: sqlite3.Connection) -> None:
+    # 索引条目隐含 rowid，(novel_uid) 索引即可按 rowid 顺序返回同一小说的角色，无需再排序
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_Characters_novel ON Characters (novel_uid)")
+    conn.execute("DROP INDEX IF EXISTS idx_Characters_novel_created")
+
+def check_query_plans(conn: sqlite3.Connection) -> bool:
+    """打印角色列表查询的 EXPLAIN QUERY PLAN，确认走索引且没有临时 B 树排序。"""
+    ok = True
+    for sql, params in PLAN_CHECKS:
+        details = [r["detail"] for r in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()]
+        print(f"{sql}\n  -> " + "\n  -> ".join(details))
+        for d in details:
+            if "TEMP B-TREE" in d or (d.startswith("SCAN") and "USING" not in d):
+                ok = False
+    return ok
+
+def main() -> None:
+    print(f"Using DB: {DB_FILE}")
+    conn = get_connection()
+    try:
+        conn.execute("BEGIN")
+        upgrade(conn)
+        conn.commit()
+        print("Migration 202610181400 applied successfully.")
+    except Exception as e:
+        conn.rollback()
+        print(f"Migration 202610181400 failed: {e}")
+        raise
+    try:
+        if check_query_plans(conn):
+            print("Query plan check passed: character list queries use idx_Characters_novel.")
+        else:
+            print("Query plan check FAILED: some character list queries still scan or sort.")
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,5 @@
 # ...existing code...
-from dataclasses import dataclass
+from dataclasses import dataclass, fields
 from typing import Optional
 
 @dataclass
@@ -11,4 +11,20 @@ class Chapter:
     content: str = ""
     synopsis: str = ""  
     created_at: Optional[str] = None
-    updated_at: Optional[str] = None
\ No newline at end of file
+    updated_at: Optional[str] = None
+
+
+@dataclass
+class ChapterMeta:
+    """不含正文的轻量章节行，用于列表等只需元数据的场景。"""
+    uid: Optional[str] = None
+    novel_uid: str = ""
+    chapter_idx: int = 0
+    title: str = ""
+    synopsis: str = ""
+    created_at: Optional[str] = None
+    updated_at: Optional[str] = None
+
+
+CHAPTER_COLUMNS = tuple(f.name for f in fields(Chapter))
+CHAPTER_META_COLUMNS = tuple(f.name for f in fields(ChapterMeta))
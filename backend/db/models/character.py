@@ -1,5 +1,5 @@
 # db/models/character.py
-from dataclasses import dataclass
+from dataclasses import dataclass, fields
 from typing import Optional
 
 @dataclass
@@ -11,3 +11,6 @@ class Character:
     is_main: bool = False
     created_at: Optional[str] = None
     updated_at: Optional[str] = None
+
+
+CHARACTER_COLUMNS = tuple(f.name for f in fields(Character))
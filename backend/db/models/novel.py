@@ -1,4 +1,4 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, fields
 from typing import Optional
 
 @dataclass
@@ -9,4 +9,7 @@ class Novel:
     description: str = ""
     latest_chapter_uid: Optional[str] = None  # 用户最新编辑修改的章节uid
     created_at: Optional[str] = None
-    updated_at: Optional[str] = None
\ No newline at end of file
+    updated_at: Optional[str] = None
+
+
+NOVEL_COLUMNS = tuple(f.name for f in fields(Novel))
@@ -0,0 +1,141 @@
+import os
+import time
+import asyncio
+import logging
+import sqlite3
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, asdict
+from typing import AsyncIterator, Dict, List, Optional
+
+import aiosqlite
+from db.sqlite import DB_FILE, get_storage_profile, storage_pragmas
+
+logger = logging.getLogger("db_pool")
+
+DEFAULT_POOL_SIZE = 4
+
+
+@dataclass
+class PoolMetrics:
+    reader_checkouts: int = 0
+    writer_checkouts: int = 0
+    reader_wait_ms_total: float = 0.0
+    writer_wait_ms_total: float = 0.0
+    reader_wait_ms_max: float = 0.0
+    writer_wait_ms_max: float = 0.0
+
+    def record(self, kind: str, waited_ms: float) -> None:
+        setattr(self, f"{kind}_checkouts", getattr(self, f"{kind}_checkouts") + 1)
+        setattr(self, f"{kind}_wait_ms_total", getattr(self, f"{kind}_wait_ms_total") + waited_ms)
+        if waited_ms > getattr(self, f"{kind}_wait_ms_max"):
+            setattr(self, f"{kind}_wait_ms_max", waited_ms)
+
+
+class ConnectionPool:
+    """
+    进程内共享的 aiosqlite 连接池：
+        - reader()：从固定数量的只读连接中借出一个，用完归还；
+        - writer()：唯一的写连接，通过锁串行化所有写事务（SQLite 本身同一时刻只允许一个写者）。
+    连接在 open() 时一次性建立并执行 PRAGMA，避免每次查询都新建线程与打开文件。
+    """
+
+    def __init__(self, db_file: str = DB_FILE, size: int = DEFAULT_POOL_SIZE):
+        self.db_file = db_file
+        self.size = max(1, int(size))
+        self.profile = get_storage_profile()
+        self.metrics = PoolMetrics()
+        self._readers: "asyncio.Queue[aiosqlite.Connection]" = asyncio.Queue()
+        self._all_readers: List[aiosqlite.Connection] = []
+        self._writer: Optional[aiosqlite.Connection] = None
+        self._write_lock = asyncio.Lock()
+
+    async def _open_connection(self) -> aiosqlite.Connection:
+        conn = await aiosqlite.connect(self.db_file)
+        conn.row_factory = sqlite3.Row
+        for pragma in storage_pragmas(self.profile):
+            await conn.execute(pragma)
+        return conn
+
+    async def open(self) -> None:
+        self._writer = await self._open_connection()
+        for _ in range(self.size):
+            conn = await self._open_connection()
+            self._all_readers.append(conn)
+            self._readers.put_nowait(conn)
+        logger.info("DB pool opened: %s readers + 1 writer, profile=%s (%s)", self.size, self.profile, self.db_file)
+
+    async def close(self) -> None:
+        for conn in self._all_readers:
+            await conn.close()
+        self._all_readers.clear()
+        self._readers = asyncio.Queue()
+        if self._writer is not None:
+            await self._writer.close()
+            self._writer = None
+        logger.info("DB pool closed")
+
+    @asynccontextmanager
+    async def reader(self) -> AsyncIterator[aiosqlite.Connection]:
+        started = time.perf_counter()
+        conn = await self._readers.get()
+        self.metrics.record("reader", (time.perf_counter() - started) * 1000)
+        try:
+            yield conn
+        finally:
+            self._readers.put_nowait(conn)
+
+    @asynccontextmanager
+    async def writer(self) -> AsyncIterator[aiosqlite.Connection]:
+        if self._writer is None:
+            raise RuntimeError("DB pool is not opened")
+        started = time.perf_counter()
+        async with self._write_lock:
+            self.metrics.record("writer", (time.perf_counter() - started) * 1000)
+            try:
+                yield self._writer
+            except BaseException:
+                # 未提交的写入一律回滚，避免脏事务遗留到下一个使用者
+                await self._writer.rollback()
+                raise
+
+    def stats(self) -> Dict:
+        data = asdict(self.metrics)
+        data.update({
+            "size": self.size,
+            "storage_profile": self.profile,
+            "readers_idle": self._readers.qsize(),
+            "writer_busy": self._write_lock.locked(),
+        })
+        return data
+
+
+_pool: Optional[ConnectionPool] = None
+
+
+def get_pool_size() -> int:
+    try:
+        return int(os.getenv("DB_POOL_SIZE", DEFAULT_POOL_SIZE))
+    except ValueError:
+        return DEFAULT_POOL_SIZE
+
+
+async def open_pool(size: Optional[int] = None) -> ConnectionPool:
+    global _pool
+    if _pool is None:
+        pool = ConnectionPool(size=size or get_pool_size())
+        await pool.open()
+        _pool = pool
+    return _pool
+
+
+async def close_pool() -> None:
+    global _pool
+    if _pool is not None:
+        await _pool.close()
+        _pool = None
+
+
+def get_pool() -> ConnectionPool:
+    if _pool is None:
+        raise RuntimeError("DB pool is not opened; it is created in app_lifespan (get_app.py)")
+    return _pool
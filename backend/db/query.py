@@ -0,0 +1,60 @@
+import json
+import base64
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+# 单条语句的绑定参数上限：老版本 SQLite 默认 SQLITE_MAX_VARIABLE_NUMBER=999，留出余量
+MAX_SQL_PARAMS = 500
+
+
+def encode_cursor(*values: Any) -> str:
+    """把排序键（如 (chapter_idx, uid)）编码为不透明的 URL 安全游标。"""
+    raw = json.dumps(list(values), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, types: Sequence[type]) -> List[Any]:
+    """
+    解析 encode_cursor 生成的游标；types 为各位置排序键的类型（如 (int, str)）。
+    格式错误、长度或任一位置的类型不符时抛出 ValueError（游标来自客户端，不能原样绑定到 SQL）。
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")).decode("utf-8"))
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+    if not isinstance(values, list) or len(values) != len(types):
+        raise ValueError(f"Invalid cursor: {cursor}")
+    for value, expected in zip(values, types):
+        # bool 是 int 的子类，JSON 的 true/false 不能当作整数键
+        if isinstance(value, bool) or not isinstance(value, expected):
+            raise ValueError(f"Invalid cursor: {cursor}")
+    return values
+
+
+def select_columns(fields: Optional[Sequence[str]], columns: Sequence[str], required: Sequence[str] = ("uid",)) -> str:
+    """
+    把调用方请求的字段转换为显式的 SQL 列清单：
+    - fields=None 时返回全部 columns；
+    - 只允许 columns 中的列名（防止注入），未知字段抛出 ValueError；
+    - 始终包含 required（默认 uid；分页时还需排序键），便于定位行与生成游标。
+    """
+    if fields is None:
+        return ", ".join(columns)
+    unknown = [f for f in fields if f not in columns]
+    if unknown:
+        raise ValueError(f"Unknown fields: {unknown}")
+    wanted = set(fields) | set(required)
+    return ", ".join(c for c in columns if c in wanted)
+
+
+def project_fields(data: Dict[str, Any], fields: Optional[Sequence[str]]) -> Dict[str, Any]:
+    """按调用方请求的字段裁剪返回的字典（与 select_columns 对应），始终保留 uid；fields=None 时原样返回。"""
+    if fields is None:
+        return data
+    return {k: v for k, v in data.items() if k == "uid" or k in fields}
+
+
+def chunked(items: Sequence[Any], size: int = MAX_SQL_PARAMS) -> Iterator[Sequence[Any]]:
+    """按 size 切分序列，用于 IN (...) 查询不超过参数上限。"""
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
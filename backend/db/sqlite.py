@@ -1,7 +1,14 @@
 import sqlite3
 import os
 import sys
+import logging
+import time
 from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from db.migrate import list_migrations, has_table, applied_versions, ensure_version_table, record_versions, apply_migrations
+
+logger = logging.getLogger("db")
 
 # When bundled by PyInstaller, use the executable directory as base so the DB
 # can be placed next to the exe. Otherwise use the repository layout.
@@ -10,12 +17,60 @@ if getattr(sys, "frozen", False):
 else:
     BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
-DB_FILE = os.path.join(BASE_DIR, "db", "novel.db")
+# DB_FILE 环境变量可覆盖数据库位置（如 dist/init_db_for_dist.py 为打包目录预建库）
+DB_FILE = os.getenv("DB_FILE") or os.path.join(BASE_DIR, "db", "novel.db")
+
+# 存储性能档位：每个连接建立时都会执行对应的 PRAGMA
+#   durable    —— WAL + synchronous=FULL，掉电也不丢已提交事务
+#   balanced   —— WAL + synchronous=NORMAL，掉电可能丢最后几个事务但不会损坏库（默认）
+#   throughput —— WAL + synchronous=OFF，更大的缓存与 mmap，适合批量导入/压测
+STORAGE_PROFILES: Dict[str, Dict[str, object]] = {
+    "durable": {
+        "journal_mode": "WAL",
+        "synchronous": "FULL",
+        "cache_size": -16000,  # 负数单位为 KiB，约 16MB
+        "mmap_size": 0,
+        "temp_store": "DEFAULT",
+        "busy_timeout": 5000,
+    },
+    "balanced": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "cache_size": -64000,
+        "mmap_size": 268435456,  # 256MB
+        "temp_store": "MEMORY",
+        "busy_timeout": 5000,
+    },
+    "throughput": {
+        "journal_mode": "WAL",
+        "synchronous": "OFF",
+        "cache_size": -256000,
+        "mmap_size": 1073741824,  # 1GB
+        "temp_store": "MEMORY",
+        "busy_timeout": 10000,
+    },
+}
+DEFAULT_STORAGE_PROFILE = "balanced"
+
+def get_storage_profile() -> str:
+    name = (os.getenv("DB_STORAGE_PROFILE") or DEFAULT_STORAGE_PROFILE).strip().lower()
+    if name not in STORAGE_PROFILES:
+        logger.warning("Unknown DB_STORAGE_PROFILE=%s, falling back to %s", name, DEFAULT_STORAGE_PROFILE)
+        return DEFAULT_STORAGE_PROFILE
+    return name
+
+def storage_pragmas(profile: Optional[str] = None) -> List[str]:
+    """返回当前存储档位需要在每个连接上执行的 PRAGMA 语句（含 foreign_keys）。"""
+    settings = STORAGE_PROFILES[profile or get_storage_profile()]
+    pragmas = [f"PRAGMA {key} = {value}" for key, value in settings.items()]
+    pragmas.append("PRAGMA foreign_keys = ON")
+    return pragmas
 
 def get_connection():
     conn = sqlite3.connect(DB_FILE)
     conn.row_factory = sqlite3.Row
-    conn.execute("PRAGMA foreign_keys = ON")
+    for pragma in storage_pragmas():
+        conn.execute(pragma)
     return conn
 
 def get_now_sql_expr() -> str:
@@ -27,94 +82,130 @@ def get_now_sql_expr() -> str:
     except Exception:
         return "datetime('now','+28800 seconds')"
 
-def drop_trigger_if_exists(conn: sqlite3.Connection, name: str) -> None:
-    conn.execute(f"DROP TRIGGER IF EXISTS {name}")
-
-def recreate_insert_trigger(conn: sqlite3.Connection, table: str, now_sql: str) -> None:
-    trg_name = f"trg_{table}_ts_after_insert"
-    drop_trigger_if_exists(conn, trg_name)
-    conn.executescript(f"""
-    CREATE TRIGGER {trg_name}
-    AFTER INSERT ON {table}
-    FOR EACH ROW
-    WHEN NEW.created_at IS NULL OR NEW.updated_at IS NULL
-    BEGIN
-        UPDATE {table}
-        SET created_at = COALESCE(NEW.created_at, {now_sql}),
-            updated_at = COALESCE(NEW.updated_at, {now_sql})
-        WHERE uid = NEW.uid;
-    END;
-    """)
+# 当前时间的 SQL 表达式：CRUD 在 INSERT/UPDATE 语句内直接写入时间戳，不再依赖触发器二次 UPDATE
+NOW_SQL = get_now_sql_expr()
 
-def recreate_update_trigger(conn: sqlite3.Connection, table: str, now_sql: str) -> None:
-    trg_name = f"trg_{table}_ts_after_update"
-    drop_trigger_if_exists(conn, trg_name)
-    conn.executescript(f"""
-    CREATE TRIGGER {trg_name}
-    AFTER UPDATE ON {table}
-    FOR EACH ROW
-    BEGIN
-        UPDATE {table}
-        SET updated_at = {now_sql}
-        WHERE uid = NEW.uid;
-    END;
-    """)
+# 最近一次 init_db 的耗时与迁移情况，供 /api/health/metrics 查看
+last_init_stats: Dict[str, Any] = {}
 
-def init_db():
-    conn = get_connection()
+def create_schema(conn: sqlite3.Connection) -> None:
+    """新库：直接按最新结构建表与索引（已有库的结构变更走 db/migrations）。"""
     cur = conn.cursor()
 
     # NovelConfig 表
-    cur.execute("""
+    cur.execute(f"""
     CREATE TABLE IF NOT EXISTS NovelConfig (
         uid TEXT PRIMARY KEY,
         title TEXT,
         genre TEXT,
         description TEXT,
         latest_chapter_uid TEXT,
-        created_at TEXT,
-        updated_at TEXT
+        created_at TEXT DEFAULT ({NOW_SQL}),
+        updated_at TEXT DEFAULT ({NOW_SQL})
     )
     """)
 
     # Chapters 表
-    cur.execute("""
+    cur.execute(f"""
     CREATE TABLE IF NOT EXISTS Chapters (
         uid TEXT PRIMARY KEY,
         novel_uid TEXT,
         chapter_idx INTEGER,
         title TEXT,
-        content TEXT,
         synopsis TEXT DEFAULT '',
-        created_at TEXT,
-        updated_at TEXT,
+        created_at TEXT DEFAULT ({NOW_SQL}),
+        updated_at TEXT DEFAULT ({NOW_SQL}),
         FOREIGN KEY (novel_uid) REFERENCES NovelConfig(uid) ON DELETE CASCADE
     )
     """)
 
-    # Characters 表
+    # ChapterContent 表：章节正文单独存放，列表/元数据读写不再触及大段文本
     cur.execute("""
+    CREATE TABLE IF NOT EXISTS ChapterContent (
+        chapter_uid TEXT PRIMARY KEY,
+        content TEXT NOT NULL DEFAULT '',
+        FOREIGN KEY (chapter_uid) REFERENCES Chapters(uid) ON DELETE CASCADE
+    )
+    """)
+
+    # ChapterContentChunk 表：流式生成时只追加新增片段，结束后合并进 ChapterContent
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS ChapterContentChunk (
+        id INTEGER PRIMARY KEY,
+        chapter_uid TEXT NOT NULL,
+        text TEXT NOT NULL,
+        FOREIGN KEY (chapter_uid) REFERENCES Chapters(uid) ON DELETE CASCADE
+    )
+    """)
+
+    # Characters 表
+    cur.execute(f"""
     CREATE TABLE IF NOT EXISTS Characters (
         uid TEXT PRIMARY KEY,
         novel_uid TEXT,
         name TEXT NOT NULL,
         description TEXT,
         is_main INTEGER NOT NULL DEFAULT 0,
-        created_at TEXT,
-        updated_at TEXT,
+        created_at TEXT DEFAULT ({NOW_SQL}),
+        updated_at TEXT DEFAULT ({NOW_SQL}),
         FOREIGN KEY (novel_uid) REFERENCES NovelConfig(uid) ON DELETE CASCADE
     )
     """)
 
-    # 触发器：确保时间戳自动填充/更新
-    now_sql = get_now_sql_expr()
-    for table in ("NovelConfig", "Chapters", "Characters"):
-        recreate_insert_trigger(conn, table, now_sql)
-        recreate_update_trigger(conn, table, now_sql)
+    # 索引：按小说查询章节/角色、按更新时间列出小说（与 migrations/202610181000.py、202610181400.py 一致）
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_Chapters_novel_idx ON Chapters (novel_uid, chapter_idx, uid)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_Chapters_novel_created ON Chapters (novel_uid, created_at)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_Characters_novel ON Characters (novel_uid)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_Characters_novel_main ON Characters (novel_uid, is_main)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_NovelConfig_updated ON NovelConfig (updated_at, uid)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_ChapterContentChunk_chapter ON ChapterContentChunk (chapter_uid, id)")
+
+
+def init_db() -> str:
+    """
+    启动时的数据库初始化：
+    - schema_version 已包含全部迁移版本时只做一次只读查询（快速路径，不取写锁）；
+    - 新库：按最新结构建表并把所有迁移版本记为已应用；
+    - 已有库：按版本顺序执行尚未应用的迁移（无 schema_version 的旧库会全部执行一遍，各迁移均可重复执行）。
+    """
+    started = time.perf_counter()
+    profile = get_storage_profile()
+    conn = get_connection()
+    try:
+        versions = list_migrations()
+        applied = applied_versions(conn)
+        pending = [v for v in versions if v not in applied]
+        fresh = False
+        if pending:
+            fresh = not has_table(conn, "NovelConfig")
+            ensure_version_table(conn, NOW_SQL)
+            if fresh:
+                create_schema(conn)
+                record_versions(conn, versions, NOW_SQL)
+                conn.commit()
+            else:
+                apply_migrations(conn, pending, NOW_SQL)
+        journal_mode = conn.execute("PRAGMA journal_mode").fetchone()[0]
+    finally:
+        conn.close()
 
-    conn.commit()
-    conn.close()
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    last_init_stats.clear()
+    last_init_stats.update({
+        "elapsed_ms": round(elapsed_ms, 2),
+        "schema_version": versions[-1] if versions else None,
+        "applied": [] if fresh else pending,
+        "created": fresh,
+    })
+    if not pending:
+        logger.info("DB schema current (%s), init took %.1f ms", last_init_stats["schema_version"], elapsed_ms)
+    elif fresh:
+        logger.info("DB created at schema %s, init took %.1f ms", last_init_stats["schema_version"], elapsed_ms)
+    else:
+        logger.info("DB migrated %s, init took %.1f ms", ", ".join(pending), elapsed_ms)
+    logger.info("SQLite storage profile: %s (journal_mode=%s, %s)", profile, journal_mode, DB_FILE)
+    return profile
 
 if __name__ == "__main__":
-    init_db()
-    print("SQLite 数据库初始化完成 😊")
\ No newline at end of file
+    profile = init_db()
+    print(f"SQLite 数据库初始化完成 😊 (storage profile: {profile})")
\ No newline at end of file
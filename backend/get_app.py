@@ -2,8 +2,9 @@ import logging
 from contextlib import asynccontextmanager
 import sys
 import os
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from fastapi.staticfiles import StaticFiles
 
 def setup_logging() -> None:
@@ -17,14 +18,25 @@ def setup_logging() -> None:
     root.addHandler(handler)
 
 from db.sqlite import init_db
+from db.pool import open_pool, close_pool
+from tools.http_transport import close_http_clients
+from tools import provider_registry, llm_cache
+from utils.enum import ResponseCode
+from utils.error import ManuScriptValidationMsg
 
 @asynccontextmanager
 async def app_lifespan(app: FastAPI):
     # 应用启动前
-    init_db()  # 数据库初始化，例如建表
+    init_db()  # 数据库初始化：新库建表，旧库执行待应用的迁移；版本已是最新时直接跳过
+    await open_pool()  # 共享连接池（读连接 + 单写连接），大小由 DB_POOL_SIZE 控制
     yield
     # 应用关闭后
-    
+    await close_pool()
+    # 关闭模型调用的共享连接池；注册表中的客户端引用了这些连接池，一并丢弃
+    await close_http_clients()
+    provider_registry.invalidate()
+    await llm_cache.close()
+
 
 def create_app() -> FastAPI:
     """创建 FastAPI 实例并挂载中间件。"""
@@ -45,6 +57,13 @@ def create_app() -> FastAPI:
         allow_methods=["*"],
         allow_headers=["*"],
     )
+
+    # 路由中抛出的 ManuScriptValidationMsg 统一转换为 {code, msg, data} 响应，HTTP 状态码与 code 一致
+    @app.exception_handler(ManuScriptValidationMsg)
+    async def manuscript_validation_handler(request: Request, exc: ManuScriptValidationMsg) -> JSONResponse:
+        status = exc.code if exc.code >= ResponseCode.CLIENT_ERROR.value else ResponseCode.CLIENT_ERROR.value
+        return JSONResponse(status_code=status, content={"code": exc.code, "msg": exc.msg, "data": None})
+
     return app
 
 def register_routers(app: FastAPI) -> None:
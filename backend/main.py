@@ -10,11 +10,17 @@ if __name__ == "__main__":
     parser.add_argument("-H", "--host", type=str, default="127.0.0.1", help="绑定地址")
     parser.add_argument("--reload", action="store_true", help="开发模式热重载")
     parser.add_argument("--env", type=str, choices=["dev", "test", "release"], default="dev", help="运行环境")
+    parser.add_argument("--db-profile", type=str, choices=["durable", "balanced", "throughput"], default=None, help="SQLite 存储性能档位（也可用环境变量 DB_STORAGE_PROFILE）")
+    parser.add_argument("--db-pool-size", type=int, default=None, help="数据库读连接池大小（默认 4）")
     args = parser.parse_args()
 
     # 基础环境变量
     os.environ["APP_ENV"] = args.env
     os.environ["APP_PORT"] = str(args.port)
+    if args.db_profile:
+        os.environ["DB_STORAGE_PROFILE"] = args.db_profile
+    if args.db_pool_size:
+        os.environ["DB_POOL_SIZE"] = str(args.db_pool_size)
 
     setup_logging()
     logger = logging.getLogger("app")
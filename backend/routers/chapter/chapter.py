@@ -1,7 +1,7 @@
 # routers/chapter/chapter.py
 import logging
 from dataclasses import asdict
-from typing import Optional, Dict, List
+from typing import Optional, Dict, List, Literal
 
 from fastapi import APIRouter
 from pydantic import BaseModel, Field
@@ -10,15 +10,22 @@ from db.CRUD.chapter_crud import (
     create_chapter,
     get_chapter,
     update_chapter,
-    delete_chapter,
+    delete_chapters,
     list_chapters,
+    count_chapters,
 )
+from db.query import encode_cursor, decode_cursor, project_fields
+from db.models.chapter import CHAPTER_META_COLUMNS
 from utils.enum import ResponseCode
 from utils.error import ManuScriptValidationMsg
 
 router = APIRouter()
 logger = logging.getLogger("chapter_router")
 
+# 可通过 fields 选择返回的列；列表默认不含 content
+ChapterField = Literal["uid", "novel_uid", "chapter_idx", "title", "content", "synopsis", "created_at", "updated_at"]
+LIST_DEFAULT_FIELDS: List[str] = ["title", "synopsis", "chapter_idx", "created_at", "updated_at"]
+
 
 class ChapterResponse(BaseModel):
     code: int
@@ -48,17 +55,18 @@ async def create_chapter_endpoint(payload: ChapterCreateResponse):
 
 class GetChapterRequest(BaseModel):
     uid: str
+    fields: Optional[List[ChapterField]] = None  # 不传返回全部字段
 
 
 @router.post("/get", response_model=ChapterResponse)
 async def get_chapter_endpoint(payload: GetChapterRequest):
-    ch = await get_chapter(payload.uid)
+    ch = await get_chapter(payload.uid, fields=payload.fields)
     if not ch:
         raise ManuScriptValidationMsg(msg="Chapter not found", code=ResponseCode.CLIENT_ERROR.value)
     return ChapterResponse(
         code=ResponseCode.SUCCESS.value,
         msg="Get chapter successfully",
-        data=asdict(ch),
+        data=project_fields(asdict(ch), payload.fields),
     )
 
 
@@ -76,7 +84,9 @@ async def update_chapter_endpoint(payload: ChapterUpdateRequest):
             msg="Title 、content and synopsis cannot be empty at the same time",
             code=ResponseCode.CLIENT_ERROR.value,
         )
-    old_ch = await get_chapter(payload.uid)
+    # 只有未提供新正文时才需要读取旧正文
+    old_fields = None if not payload.content else CHAPTER_META_COLUMNS
+    old_ch = await get_chapter(payload.uid, fields=old_fields)
     if not old_ch:
         raise ManuScriptValidationMsg(msg="Chapter not found", code=ResponseCode.CLIENT_ERROR.value)
 
@@ -107,13 +117,16 @@ class DeleteChapterRequest(BaseModel):
     uids: List[str]
 @router.post("/delete", response_model=ChapterResponse)
 async def delete_chapter_endpoint(payload: DeleteChapterRequest):
-    for uid in payload.uids:
-        deleted = await delete_chapter(uid)
-        if not deleted:
-            raise ManuScriptValidationMsg(msg="Failed to delete chapter", code=ResponseCode.SERVER_ERROR.value)
+    # 单事务批量删除，返回每个 uid 的删除结果
+    results = await delete_chapters(payload.uids)
+    if results and not any(results.values()):
+        raise ManuScriptValidationMsg(msg="Chapter not found", code=ResponseCode.CLIENT_ERROR.value)
+    # 部分 uid 不存在时其余照常删除，以 PARTIAL_SUCCESS 区分，not_found 列出未找到的 uid
+    not_found = [uid for uid, ok in results.items() if not ok]
     return ChapterResponse(
-        code=ResponseCode.SUCCESS.value,
-        msg="Chapter deleted successfully",
+        code=ResponseCode.PARTIAL_SUCCESS.value if not_found else ResponseCode.SUCCESS.value,
+        msg="Some chapters were not found" if not_found else "Chapter deleted successfully",
+        data={"results": results, "deleted": sum(results.values()), "not_found": not_found},
     )
 
 
@@ -121,25 +134,28 @@ class ChapterListRequest(BaseModel):
     novel_uid: str
     page: int = Field(default=1, ge=1)
     size: int = Field(default=100, ge=1, le=1000)
+    cursor: Optional[str] = None  # 上一页返回的 next_cursor；传入时忽略 page，按 (chapter_idx, uid) 续读
+    fields: Optional[List[ChapterField]] = None  # 默认 title/synopsis/chapter_idx/时间戳，不读取正文
 
 
 @router.post("/list", response_model=ChapterResponse)
 async def list_chapter_endpoint(payload: ChapterListRequest):
-    items = await list_chapters(payload.novel_uid)  # 按 chapter_idx 排序
-    total = len(items)
-    start = (payload.page - 1) * payload.size
-    end = start + payload.size
-    paged = items[start:end]
+    after = None
+    if payload.cursor:
+        try:
+            after = decode_cursor(payload.cursor, (int, str))
+        except ValueError:
+            raise ManuScriptValidationMsg(msg="Invalid cursor", code=ResponseCode.CLIENT_ERROR.value)
+    offset = 0 if after is not None else (payload.page - 1) * payload.size
+    fields = payload.fields if payload.fields is not None else LIST_DEFAULT_FIELDS
+    # 多取一行用于判断是否还有下一页
+    items = await list_chapters(payload.novel_uid, limit=payload.size + 1, offset=offset, after=after, fields=fields)  # 按 chapter_idx 排序
+    paged = items[:payload.size]
+    next_cursor = encode_cursor(paged[-1].chapter_idx, paged[-1].uid) if len(items) > payload.size else None
+    total = await count_chapters(payload.novel_uid)
 
     simplified: List[Dict] = [
-        {
-            "title": ch.title,
-            "synopsis": ch.synopsis,
-            "chapter_uid": ch.uid,
-            "chapter_idx": ch.chapter_idx,
-            "created_at": ch.created_at,
-            "updated_at": ch.updated_at,
-        }
+        {"chapter_uid": ch.uid, **{f: getattr(ch, f) for f in fields if f != "uid"}}
         for ch in paged
     ]
 
@@ -151,5 +167,6 @@ async def list_chapter_endpoint(payload: ChapterListRequest):
             "total": total,
             "page": payload.page,
             "size": payload.size,
+            "next_cursor": next_cursor,
         },
     )
\ No newline at end of file
@@ -1,7 +1,7 @@
 # routers/character/character.py
 import logging
 from dataclasses import asdict
-from typing import Optional, Dict, List
+from typing import Optional, Dict, List, Literal
 
 from fastapi import APIRouter
 from pydantic import BaseModel, Field
@@ -10,15 +10,21 @@ from db.CRUD.character_crud import (
     create_character,
     get_character,
     update_character,
-    delete_character,
-    list_characters,
+    delete_characters,
+    list_characters_page,
+    count_characters,
 )
+from db.query import encode_cursor, decode_cursor, project_fields
 from utils.enum import ResponseCode
 from utils.error import ManuScriptValidationMsg
 
 router = APIRouter()
 logger = logging.getLogger("character_router")
 
+# 可通过 fields 选择返回的列
+CharacterField = Literal["uid", "novel_uid", "name", "description", "is_main", "created_at", "updated_at"]
+LIST_DEFAULT_FIELDS: List[str] = ["name", "description", "is_main", "created_at", "updated_at"]
+
 
 class CharacterResponse(BaseModel):
     code: int
@@ -48,17 +54,18 @@ async def create_character_endpoint(payload: CharacterCreateRequest):
 
 class GetCharacterRequest(BaseModel):
     uid: str
+    fields: Optional[List[CharacterField]] = None  # 不传返回全部字段
 
 
 @router.post("/get", response_model=CharacterResponse)
 async def get_character_endpoint(payload: GetCharacterRequest):
-    ch = await get_character(payload.uid)
+    ch = await get_character(payload.uid, fields=payload.fields)
     if not ch:
         raise ManuScriptValidationMsg(msg="Character not found", code=ResponseCode.CLIENT_ERROR.value)
     return CharacterResponse(
         code=ResponseCode.SUCCESS.value,
         msg="Get character successfully",
-        data=asdict(ch),
+        data=project_fields(asdict(ch), payload.fields),
     )
 
 
@@ -103,13 +110,16 @@ class DeleteCharacterRequest(BaseModel):
     uids: List[str]
 @router.post("/delete", response_model=CharacterResponse)
 async def delete_character_endpoint(payload: DeleteCharacterRequest):
-    for uid in payload.uids:
-        deleted = await delete_character(uid)
-        if not deleted:
-            raise ManuScriptValidationMsg(msg="Failed to delete character", code=ResponseCode.SERVER_ERROR.value)
+    # 单事务批量删除，返回每个 uid 的删除结果
+    results = await delete_characters(payload.uids)
+    if results and not any(results.values()):
+        raise ManuScriptValidationMsg(msg="Character not found", code=ResponseCode.CLIENT_ERROR.value)
+    # 部分 uid 不存在时其余照常删除，以 PARTIAL_SUCCESS 区分，not_found 列出未找到的 uid
+    not_found = [uid for uid, ok in results.items() if not ok]
     return CharacterResponse(
-        code=ResponseCode.SUCCESS.value,
-        msg="Character deleted successfully",
+        code=ResponseCode.PARTIAL_SUCCESS.value if not_found else ResponseCode.SUCCESS.value,
+        msg="Some characters were not found" if not_found else "Character deleted successfully",
+        data={"results": results, "deleted": sum(results.values()), "not_found": not_found},
     )
 
 
@@ -117,24 +127,29 @@ class CharacterListRequest(BaseModel):
     novel_uid: str
     page: int = Field(default=1, ge=1)
     size: int = Field(default=100, ge=1, le=1000)
+    cursor: Optional[str] = None  # 上一页返回的 next_cursor；传入时忽略 page，按写入顺序续读
+    fields: Optional[List[CharacterField]] = None  # 默认 name/description/is_main/时间戳
 
 
 @router.post("/list", response_model=CharacterResponse)
 async def list_character_endpoint(payload: CharacterListRequest):
-    items = await list_characters(payload.novel_uid)
-    total = len(items)
-    start = (payload.page - 1) * payload.size
-    end = start + payload.size
-    paged = items[start:end]
+    after = None
+    if payload.cursor:
+        try:
+            after = decode_cursor(payload.cursor, (int,))[0]
+        except ValueError:
+            raise ManuScriptValidationMsg(msg="Invalid cursor", code=ResponseCode.CLIENT_ERROR.value)
+    offset = 0 if after is not None else (payload.page - 1) * payload.size
+    fields = payload.fields if payload.fields is not None else LIST_DEFAULT_FIELDS
+    rows = await list_characters_page(payload.novel_uid, limit=payload.size + 1, offset=offset, after=after, fields=fields)
+    paged = [c for _, c in rows[:payload.size]]
+    next_cursor = encode_cursor(rows[payload.size - 1][0]) if len(rows) > payload.size else None
+    total = await count_characters(payload.novel_uid)
 
     simplified: List[Dict] = [
         {
-            "name": c.name,
             "character_uid": c.uid,
-            "description": c.description,
-            "is_main": bool(c.is_main),
-            "created_at": c.created_at,
-            "updated_at": c.updated_at,
+            **{f: (bool(c.is_main) if f == "is_main" else getattr(c, f)) for f in fields if f != "uid"},
         }
         for c in paged
     ]
@@ -147,5 +162,6 @@ async def list_character_endpoint(payload: CharacterListRequest):
             "total": total,
             "page": payload.page,
             "size": payload.size,
+            "next_cursor": next_cursor,
         },
     )
\ No newline at end of file
@@ -1,7 +1,15 @@
 from fastapi import APIRouter
 from pydantic import BaseModel
+from typing import Dict, Optional
 import logging
 
+from db.pool import get_pool
+from db.sqlite import last_init_stats
+from db.cache import get_cache
+from utils import metrics as app_metrics
+from tools import http_transport, admission, hedging
+from utils.enum import ResponseCode
+
 router = APIRouter()
 logger = logging.getLogger("app")
 
@@ -11,4 +19,25 @@ class TestResponse(BaseModel):
 @router.post("/test", response_model=TestResponse)
 def test():
     logger.info("Demo /test called")
-    return {"message": "Hello Manuscript!"}
\ No newline at end of file
+    return {"message": "Hello Manuscript!"}
+
+class MetricsResponse(BaseModel):
+    code: int
+    msg: str
+    data: Optional[Dict] = None
+
+@router.post("/metrics", response_model=MetricsResponse)
+async def metrics():
+    return MetricsResponse(
+        code=ResponseCode.SUCCESS.value,
+        msg="Get metrics successfully",
+        data={
+            "db_pool": get_pool().stats(),
+            "db_init": dict(last_init_stats),
+            "entity_cache": get_cache().stats(),
+            "generation": app_metrics.snapshot(),
+            "http_transport": http_transport.stats(),
+            "admission": admission.stats(),
+            "ttft": hedging.stats(),
+        },
+    )
@@ -14,6 +14,7 @@ from pydantic import BaseModel
 from utils.config import Model_Providers
 from utils.enum import ResponseCode
 from utils.error import ManuScriptValidationMsg
+from tools import provider_registry
 
 router = APIRouter()
 logger = logging.getLogger("model_providers_router")
@@ -122,6 +123,8 @@ async def update_provider_config_endpoint(payload: UpdateProviderConfigRequest):
     before = await _load_yaml(path)
     after = {**before, **payload.values}
     await _save_yaml(path, after)
+    # 丢弃已缓存的客户端，下一次生成按新配置重建（mtime 精度不足时也能立即生效）
+    provider_registry.invalidate(payload.provider)
     logger.info("Provider config updated: %s, keys=%s", payload.provider, list(payload.values.keys()))
     cfg = await _load_yaml(path)
     return ProviderResponse(
@@ -1,6 +1,6 @@
 import logging
 from dataclasses import asdict
-from typing import Optional, Dict, List
+from typing import Optional, Dict, List, Literal
 
 from fastapi import APIRouter
 from pydantic import BaseModel, Field
@@ -9,15 +9,20 @@ from db.CRUD.novel_crud import (
     create_novel,
     get_novel,
     update_novel,
-    delete_novel,
+    delete_novels,
     list_novels,
+    count_novels,
 )
+from db.query import encode_cursor, decode_cursor, project_fields
 from utils.enum import ResponseCode
 from utils.error import ManuScriptValidationMsg
 
 router = APIRouter()
 logger = logging.getLogger("novel_router")
 
+# 可通过 fields 选择返回的列
+NovelField = Literal["uid", "title", "genre", "description", "latest_chapter_uid", "created_at", "updated_at"]
+
 class NovelResponse(BaseModel):
     code: int
     msg: str
@@ -43,16 +48,17 @@ async def create_novel_endpoint(payload: NovelCreate):
 
 class GetNovelRequest(BaseModel):
     uid: str
+    fields: Optional[List[NovelField]] = None  # 不传返回全部字段
 
 @router.post("/get", response_model=NovelResponse)
 async def get_novel_endpoint(payload: GetNovelRequest):
-    novel = await get_novel(payload.uid)
+    novel = await get_novel(payload.uid, fields=payload.fields)
     if not novel:
         raise ManuScriptValidationMsg(msg="Novel not found", code=ResponseCode.CLIENT_ERROR.value)
     return NovelResponse(
         code=ResponseCode.SUCCESS.value,
         msg="Get novel successfully",
-        data=asdict(novel),
+        data=project_fields(asdict(novel), payload.fields),
     )
 
 class NovelUpdateRequest(BaseModel):
@@ -79,34 +85,46 @@ class DeleteNovelRequest(BaseModel):
     uids: List[str]
 @router.post("/delete", response_model=NovelResponse)
 async def delete_novel_endpoint(payload: DeleteNovelRequest):
-    for uid in payload.uids:
-        deleted = await delete_novel(uid)
-        if not deleted:
-            raise ManuScriptValidationMsg(msg="Failed to delete novel", code=ResponseCode.SERVER_ERROR.value)
+    # 单事务批量删除，返回每个 uid 的删除结果
+    results = await delete_novels(payload.uids)
+    if results and not any(results.values()):
+        raise ManuScriptValidationMsg(msg="Novel not found", code=ResponseCode.CLIENT_ERROR.value)
+    # 部分 uid 不存在时其余照常删除，以 PARTIAL_SUCCESS 区分，not_found 列出未找到的 uid
+    not_found = [uid for uid, ok in results.items() if not ok]
     return NovelResponse(
-        code=ResponseCode.SUCCESS.value,
-        msg="Novel deleted successfully",
+        code=ResponseCode.PARTIAL_SUCCESS.value if not_found else ResponseCode.SUCCESS.value,
+        msg="Some novels were not found" if not_found else "Novel deleted successfully",
+        data={"results": results, "deleted": sum(results.values()), "not_found": not_found},
     )
 
 class NovelListRequest(BaseModel):
     page: int = Field(default=1, ge=1)
     size: int = Field(default=100, ge=1, le=1000)
+    cursor: Optional[str] = None  # 上一页返回的 next_cursor；传入时忽略 page，按 (updated_at, uid) 续读
+    fields: Optional[List[NovelField]] = None  # 不传返回全部字段
 
 @router.post("/list", response_model=NovelResponse)
 async def list_novel_endpoint(payload: Optional[NovelListRequest] = None):
     req = payload or NovelListRequest()
-    items = await list_novels()
-    total = len(items)
-    start = (req.page - 1) * req.size
-    end = start + req.size
-    paged = items[start:end]
+    after = None
+    if req.cursor:
+        try:
+            after = decode_cursor(req.cursor, (str, str))
+        except ValueError:
+            raise ManuScriptValidationMsg(msg="Invalid cursor", code=ResponseCode.CLIENT_ERROR.value)
+    offset = 0 if after is not None else (req.page - 1) * req.size
+    items = await list_novels(limit=req.size + 1, offset=offset, after=after, fields=req.fields)
+    paged = items[:req.size]
+    next_cursor = encode_cursor(paged[-1].updated_at, paged[-1].uid) if len(items) > req.size else None
+    total = await count_novels()
     return NovelResponse(
         code=ResponseCode.SUCCESS.value,
         msg="List novels successfully",
         data={
-            "items": [asdict(n) for n in paged],
+            "items": [project_fields(asdict(n), req.fields) for n in paged],
             "total": total,
             "page": req.page,
             "size": req.size,
+            "next_cursor": next_cursor,
         },
     )
\ No newline at end of file
@@ -1,30 +1,107 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request
 from pydantic import BaseModel, Field
 import logging
-from typing import List, Optional, Set
+from typing import Any, Dict, List, Optional, Set
 import json
+import time
 from starlette.responses import StreamingResponse
 import asyncio
+import uuid
 
 from db.CRUD.novel_crud import get_novel, update_latest_chapter_uid
-from db.CRUD.character_crud import create_character, list_characters
-from db.CRUD.chapter_crud import create_chapter, get_chapter, update_chapter
+from db.CRUD.character_crud import create_characters_bulk, list_characters
+from db.CRUD.chapter_crud import (
+    create_chapters_bulk,
+    get_chapter,
+    reset_chapter_content_chunks,
+    append_chapter_content,
+    compact_chapter_content,
+)
+from db.models.chapter import CHAPTER_META_COLUMNS
 from agents.character_agent import CharacterAgent
 from agents.chapter_agent import ChapterAgent, ChapterOutlineItem
+from tools.admission import INTERACTIVE
 
 from utils.enum import ResponseCode
 from utils.error import ManuScriptValidationMsg
+from utils import metrics
+from utils.streaming import StreamChannel, BLOCK, COALESCE, merge_text, merge_token_events
 
 router = APIRouter()
 logger = logging.getLogger("working_flow_router")
 
+# 流式生成的条目（角色 / 章节大纲）先攒批再批量入库：满 BULK_FLUSH_COUNT 条或距首条超过 BULK_FLUSH_INTERVAL_SEC 秒即落库
+BULK_FLUSH_COUNT = 20
+BULK_FLUSH_INTERVAL_SEC = 0.5
+# 生产者 -> SSE 消费循环的事件通道容量：客户端读得慢时，条目（角色 / 大纲）阻塞生产者，正文 token 与队尾合并
+STREAM_QUEUE_SIZE = 256
+# 正文流式生成时，主循环交给持久化任务的 token 通道容量（满时与队尾合并，主循环不因写库慢而停顿）
+PERSIST_CHANNEL_SIZE = 256
+
+# 生成任务结束（正常/异常/取消）后投递到事件队列的结束标记：消费循环收到即退出，无需定时轮询 gen_task.done()
+END_OF_STREAM = object()
+
+
+def close_queue_when_done(task: "asyncio.Task", queue: StreamChannel) -> None:
+    """
+    任务完成回调：回调之前放入的条目都排在结束标记之前，消费者处理完它们再收到结束标记。
+    结束标记走 put_control，不受通道容量限制（回调中无法等待）；生产者结束即视为该次生成结束，同时移除深度 gauge
+    （客户端断开时 StreamingResponse 可能不再驱动事件生成器，不能依赖其 finally 清理）。
+    """
+    def _on_done(_t: "asyncio.Task") -> None:
+        queue.put_control(END_OF_STREAM)
+        queue.close()
+
+    task.add_done_callback(_on_done)
+
+
+# 脱离请求生命周期运行的收尾任务（如客户端断开后的最终持久化）；保留强引用，避免任务在完成前被回收
+_background_tasks: Set["asyncio.Task"] = set()
+
+
+def spawn_background(coro: Any) -> "asyncio.Task":
+    """启动不随事件生成器一起被取消的后台任务，结束后自动移除引用；异常只记录日志。"""
+    task = asyncio.create_task(coro)
+    _background_tasks.add(task)
+
+    def _on_done(t: "asyncio.Task") -> None:
+        _background_tasks.discard(t)
+        if not t.cancelled() and t.exception() is not None:
+            logger.error("Background task failed", exc_info=t.exception())
+
+    task.add_done_callback(_on_done)
+    return task
+
+
+def stream_gauge(endpoint: str, ident: str) -> str:
+    """每个进行中的生成一个队列深度 gauge：<endpoint>.<uid>.<随机后缀>（同一 uid 并发生成时互不覆盖）。"""
+    return f"{endpoint}.{ident}.{uuid.uuid4().hex[:8]}"
+
+
+async def cancel_on_disconnect(request: Request, endpoint: str, *tasks: "asyncio.Task") -> None:
+    """
+    监听 ASGI receive 通道：客户端断开（http.disconnect）时立即取消仍在运行的生成任务，
+    上游模型流随之关闭，不再继续消耗 token（StreamingResponse 只有在下一次写入失败时才会发现断开）。
+    """
+    while True:
+        message = await request.receive()
+        if message["type"] == "http.disconnect":
+            break
+    running = [t for t in tasks if not t.done()]
+    if not running:
+        return
+    logger.info("Client disconnected from %s, cancelling %d generation task(s)", endpoint, len(running))
+    metrics.incr("generation_cancelled")
+    metrics.incr(f"generation_cancelled.{endpoint}")
+    for t in running:
+        t.cancel()
 
 
 class GenerateCharactersRequest(BaseModel):
     novel_uid: str
     provider: str  
 @router.post("/create_characters")
-async def create_characters(payload: GenerateCharactersRequest):
+async def create_characters(payload: GenerateCharactersRequest, request: Request):
     """
     SSE 接口：根据小说 uid 读取小说信息，使用 CharacterAgent 流式生成角色。
     每当流中完整拼凑出一个角色字典并持久化后，向前端推送一个 SSE 事件（单条 JSON data）。
@@ -37,61 +114,101 @@ async def create_characters(payload: GenerateCharactersRequest):
 
     async def event_generator():
         created_uids: List[str] = []
+        pending: List[Dict[str, Any]] = []
+        first_pending_at = 0.0
         try:
-            agent = CharacterAgent(provider=payload.provider)
+            agent = CharacterAgent(provider=payload.provider, priority=INTERACTIVE)
         except Exception as e:
             logger.exception("Failed to init CharacterAgent for novel %s", payload.novel_uid)
             err = {"type": "error", "message": "Agent init failed"}
             yield f"data: {json.dumps(err, ensure_ascii=False)}\n\n"
             return
 
+        async def flush_pending() -> List[str]:
+            """批量持久化已攒的角色，并返回逐条的 SSE 事件。"""
+            batch = list(pending)
+            pending.clear()
+            if not batch:
+                return []
+            try:
+                uids = await create_characters_bulk(payload.novel_uid, batch)
+            except Exception:
+                logger.exception("Failed to persist %d characters for novel %s", len(batch), payload.novel_uid)
+                err = {"type": "error", "message": "persist failed for a character"}
+                return [f"data: {json.dumps(err, ensure_ascii=False)}\n\n" for _ in batch]
+            events: List[str] = []
+            for uid, c in zip(uids, batch):
+                created_uids.append(uid)
+                payload_event = {
+                    "type": "character",
+                    "character": {"uid": uid, "novel_uid": payload.novel_uid, **c},
+                    "created_count": len(created_uids),
+                }
+                events.append(f"data: {json.dumps(payload_event, ensure_ascii=False)}\n\n")
+            return events
+
+        # 生成放在独立任务中（生产者），客户端断开时可直接取消并关闭上游模型流
+        queue = StreamChannel(STREAM_QUEUE_SIZE, BLOCK, gauge=stream_gauge("create_characters", payload.novel_uid))
+
+        async def produce():
+            stream = agent.generate_characters_stream(novel)
+            try:
+                async for char in stream:
+                    await queue.put(char)
+            finally:
+                await stream.aclose()
+
+        gen_task = asyncio.create_task(produce())
+        close_queue_when_done(gen_task, queue)
+        watcher = asyncio.create_task(cancel_on_disconnect(request, "create_characters", gen_task))
+
         try:
             start = {"type": "start", "character_uids": created_uids}
             yield f"data: {json.dumps(start, ensure_ascii=False)}\n\n"
-            async for char in agent.generate_characters_stream(novel):
-                try:
-                    # char 可能是 dataclass Character 类型或类字典类型；进行标准化处理
-                    if hasattr(char, "__dict__"):
-                        novel_uid = getattr(char, "novel_uid", payload.novel_uid)
-                        name = getattr(char, "name", "")
-                        description = getattr(char, "description", "")
-                        is_main = bool(getattr(char, "is_main", False))
-                    elif isinstance(char, dict):
-                        novel_uid = char.get("novel_uid") or payload.novel_uid
-                        name = char.get("name", "")
-                        description = char.get("description", "")
-                        is_main = bool(char.get("is_main", False))
-                    else:
-                        # 不支持的条目，跳过
+            while True:
+                if pending:
+                    remaining = BULK_FLUSH_INTERVAL_SEC - (time.monotonic() - first_pending_at)
+                    try:
+                        char = await asyncio.wait_for(queue.get(), timeout=max(0.0, remaining))
+                    except asyncio.TimeoutError:
+                        for ev in await flush_pending():
+                            yield ev
                         continue
-
-                    uid = await create_character(novel_uid, name, description, is_main)
-                    created_uids.append(uid)
-
-                    payload_event = {
-                        "type": "character",
-                        "character": {
-                            "uid": uid,
-                            "novel_uid": novel_uid,
-                            "name": name,
-                            "description": description,
-                            "is_main": is_main,
-                        },
-                        "created_count": len(created_uids),
-                    }
-                    yield f"data: {json.dumps(payload_event, ensure_ascii=False)}\n\n"
-                except Exception:
-                    logger.exception("Failed to persist or send character for novel %s", payload.novel_uid)
-                    # 为此角色发送一个错误事件，然后继续
-                    err = {"type": "error", "message": "persist failed for a character"}
-                    yield f"data: {json.dumps(err, ensure_ascii=False)}\n\n"
+                else:
+                    char = await queue.get()
+                if char is END_OF_STREAM:
+                    break
+
+                # char 可能是 dataclass Character 类型或类字典类型；进行标准化处理
+                if hasattr(char, "__dict__"):
+                    name = getattr(char, "name", "")
+                    description = getattr(char, "description", "")
+                    is_main = bool(getattr(char, "is_main", False))
+                elif isinstance(char, dict):
+                    name = char.get("name", "")
+                    description = char.get("description", "")
+                    is_main = bool(char.get("is_main", False))
+                else:
+                    # 不支持的条目，跳过
                     continue
 
-        except Exception:
-            logger.exception("Character generation stream failed for novel %s", payload.novel_uid)
-            err = {"type": "error", "message": "character generation stream failed"}
-            yield f"data: {json.dumps(err, ensure_ascii=False)}\n\n"
+                if not pending:
+                    first_pending_at = time.monotonic()
+                pending.append({"name": name, "description": description, "is_main": is_main})
+                if len(pending) >= BULK_FLUSH_COUNT:
+                    for ev in await flush_pending():
+                        yield ev
+
+            if not gen_task.cancelled() and gen_task.exception() is not None:
+                logger.error("Character generation stream failed for novel %s", payload.novel_uid, exc_info=gen_task.exception())
+                err = {"type": "error", "message": "character generation stream failed"}
+                yield f"data: {json.dumps(err, ensure_ascii=False)}\n\n"
         finally:
+            watcher.cancel()
+            if not gen_task.done():
+                gen_task.cancel()
+            for ev in await flush_pending():
+                yield ev
             done = {"type": "done", "character_uids": created_uids}
             yield f"data: {json.dumps(done, ensure_ascii=False)}\n\n"
 
@@ -104,7 +221,7 @@ class GenerateOutlineRequest(BaseModel):
     target_chapters: Optional[int] = None
 
 @router.post("/create_chapter_outline")
-async def create_chapter_outline(payload: GenerateOutlineRequest):
+async def create_chapter_outline(payload: GenerateOutlineRequest, request: Request):
     logger.info("Create chapter outline (SSE) for novel uid=%s", payload.novel_uid)
     novel = await get_novel(payload.novel_uid)
     if not novel:
@@ -115,10 +232,10 @@ async def create_chapter_outline(payload: GenerateOutlineRequest):
     async def event_generator():
         created_uids: List[str] = []
         created_indices: Set[int] = set()
-        queue: asyncio.Queue = asyncio.Queue()
+        queue = StreamChannel(STREAM_QUEUE_SIZE, BLOCK, gauge=stream_gauge("create_chapter_outline", payload.novel_uid))
 
         try:
-            agent = ChapterAgent(provider=payload.provider)
+            agent = ChapterAgent(provider=payload.provider, priority=INTERACTIVE)
         except Exception:
             logger.exception("Failed to init ChapterAgent for novel %s", payload.novel_uid)
             err = {"type": "error", "message": "Agent init failed"}
@@ -143,89 +260,102 @@ async def create_chapter_outline(payload: GenerateOutlineRequest):
             )
         )
 
+        close_queue_when_done(gen_task, queue)
+        watcher = asyncio.create_task(cancel_on_disconnect(request, "create_chapter_outline", gen_task))
+
         # 发送 start 事件
         start = {"type": "start", "chapter_uids": created_uids}
         yield f"data: {json.dumps(start, ensure_ascii=False)}\n\n"
 
+        pending: List[ChapterOutlineItem] = []
+        first_pending_at = 0.0
+
+        async def flush_pending() -> List[str]:
+            """批量持久化已攒的章节大纲，并返回逐条的 SSE 事件。"""
+            # 按 index 去重：既跳过已入库的章节，也跳过同一批内重复的条目（保留先出现的一条），
+            # 后备解析结果或同一批流式条目中可能出现重复 index
+            batch: List[ChapterOutlineItem] = []
+            batch_indices: Set[int] = set()
+            for it in pending:
+                if it.index in created_indices or it.index in batch_indices:
+                    continue
+                batch_indices.add(it.index)
+                batch.append(it)
+            pending.clear()
+            if not batch:
+                return []
+            try:
+                uids = await create_chapters_bulk(
+                    payload.novel_uid,
+                    [{"chapter_idx": it.index, "title": it.title, "synopsis": it.synopsis} for it in batch],
+                )
+            except Exception:
+                logger.exception("Failed to persist %d chapters for novel %s", len(batch), payload.novel_uid)
+                err = {"type": "error", "message": "persist failed for a chapter"}
+                return [f"data: {json.dumps(err, ensure_ascii=False)}\n\n" for _ in batch]
+            events: List[str] = []
+            for chapter_uid, it in zip(uids, batch):
+                created_uids.append(chapter_uid)
+                created_indices.add(it.index)
+                payload_event = {
+                    "type": "chapter",
+                    "chapter": {
+                        "uid": chapter_uid,
+                        "novel_uid": payload.novel_uid,
+                        "index": it.index,
+                        "title": it.title,
+                        "synopsis": it.synopsis,
+                    },
+                    "created_count": len(created_uids),
+                }
+                events.append(f"data: {json.dumps(payload_event, ensure_ascii=False)}\n\n")
+            return events
+
         try:
-            # 持续消费队列并持久化每个章节，直到生成任务结束且队列为空
+            # 持续消费队列并攒批持久化章节，直到收到结束标记；
+            # 只有存在未落库条目时才按剩余的 BULK_FLUSH_INTERVAL_SEC 设置超时，空闲时不会定时唤醒
             while True:
-                try:
-                    item: ChapterOutlineItem = await asyncio.wait_for(queue.get(), timeout=0.2)
-                except asyncio.TimeoutError:
-                    if gen_task.done():
-                        break
-                    continue
+                if pending:
+                    remaining = BULK_FLUSH_INTERVAL_SEC - (time.monotonic() - first_pending_at)
+                    try:
+                        item = await asyncio.wait_for(queue.get(), timeout=max(0.0, remaining))
+                    except asyncio.TimeoutError:
+                        for ev in await flush_pending():
+                            yield ev
+                        continue
+                else:
+                    item = await queue.get()
+                if item is END_OF_STREAM:
+                    break
 
-                try:
-                    # 持久化章节到 DB
-                    chapter_uid = await create_chapter(
-                        novel_uid=payload.novel_uid, 
-                        chapter_idx=item.index, 
-                        title=item.title, 
-                        synopsis=item.synopsis
-                    )
-                    created_uids.append(chapter_uid)
-                    created_indices.add(item.index)
-
-                    payload_event = {
-                        "type": "chapter",
-                        "chapter": {
-                            "uid": chapter_uid,
-                            "novel_uid": payload.novel_uid,
-                            "index": item.index,
-                            "title": item.title,
-                            "synopsis": item.synopsis,
-                        },
-                        "created_count": len(created_uids),
-                    }
-                    yield f"data: {json.dumps(payload_event, ensure_ascii=False)}\n\n"
-                except Exception:
-                    logger.exception("Failed to persist or send chapter for novel %s", payload.novel_uid)
-                    err = {"type": "error", "message": "persist failed for a chapter"}
-                    yield f"data: {json.dumps(err, ensure_ascii=False)}\n\n"
-                    continue
+                if not pending:
+                    first_pending_at = time.monotonic()
+                pending.append(item)
+                if len(pending) >= BULK_FLUSH_COUNT or time.monotonic() - first_pending_at >= BULK_FLUSH_INTERVAL_SEC:
+                    for ev in await flush_pending():
+                        yield ev
+
+            for ev in await flush_pending():
+                yield ev
 
             # 等待生成任务完成以收集可能的后备解析结果（stream_generate_directory 会返回完整列表）
             try:
-                final_items = await gen_task
+                final_items = [] if gen_task.cancelled() else gen_task.result()
             except Exception:
                 logger.exception("Chapter generation task failed for novel %s", payload.novel_uid)
                 err = {"type": "error", "message": "chapter generation failed"}
                 yield f"data: {json.dumps(err, ensure_ascii=False)}\n\n"
                 final_items = []
 
-            # final_items 可能为 List[ChapterOutlineItem]
-            for it in final_items:
-                if it.index in created_indices:
-                    continue
-                # 尝试持久化补充项（若数据库已有该 index，可在 create_chapter 内处理冲突）
-                try:
-                    chapter_uid = await create_chapter(
-                        novel_uid=payload.novel_uid, 
-                        chapter_idx=item.index, 
-                        title=item.title, 
-                        synopsis=item.synopsis
-                    )
-                    created_uids.append(chapter_uid)
-                    created_indices.add(it.index)
-                    payload_event = {
-                        "type": "chapter",
-                        "chapter": {
-                            "uid": chapter_uid,
-                            "novel_uid": payload.novel_uid,
-                            "index": it.index,
-                            "title": it.title,
-                            "synopsis": it.synopsis,
-                        },
-                        "created_count": len(created_uids),
-                    }
-                    yield f"data: {json.dumps(payload_event, ensure_ascii=False)}\n\n"
-                except Exception:
-                    # 忽略重复或持久化失败
-                    continue
+            # final_items 可能为 List[ChapterOutlineItem]；未流式入库的补充项一次性批量写入
+            pending.extend(it for it in final_items if it.index not in created_indices)
+            for ev in await flush_pending():
+                yield ev
         finally:
-            done = {"type": "done", "chapter_uids": created_uids}
+            watcher.cancel()
+            if not gen_task.done():
+                gen_task.cancel()
+            done = {"type": "done", "chapter_uids": created_uids, "usage": agent.adapter.last_usage}
             yield f"data: {json.dumps(done, ensure_ascii=False)}\n\n"
 
     return StreamingResponse(event_generator(), media_type="text/event-stream")
@@ -235,18 +365,24 @@ class GenerateChapterContentRequest(BaseModel):
     provider: str
     conversation_messages: Optional[List[dict]] = None  # 可选的多轮 messages（list of {"role","content"}）
     language: Optional[str] = None
-    save_threshold: Optional[int] = 200  # 达到多少字符后持久化一次（可调）
-    save_timeout_sec: Optional[float] = 1.0  # 没有新 token 时最终持久化前等待的超时时间
+    save_threshold: Optional[int] = 200  # 未保存的内容达到多少字符即持久化一次（可调）
+    save_timeout_sec: Optional[float] = 1.0  # 未保存内容最多滞留的秒数，超时即使不足 save_threshold 也持久化
+    coalesce_ms: Optional[int] = 50  # token 合并窗口（毫秒）：窗口内的 token 合并为一个 token 事件，0 表示逐 token 推送
+    coalesce_chars: Optional[int] = 64  # 合并中的 token 达到多少字符立即推送，不等窗口结束
+    hedge: Optional[bool] = None  # 首 token 对冲：主供应商超过 TTFT 阈值仍无输出时并发请求备用供应商，None 表示按 Hedge_Policy.enabled
 
 @router.post("/create_chapter_content")
-async def create_chapter_content(payload: GenerateChapterContentRequest):
+async def create_chapter_content(payload: GenerateChapterContentRequest, request: Request):
     """
     SSE 接口：对指定 chapter_uid 发起多轮/单轮流式生成正文。
     - 支持传入 conversation_messages 以做多轮上下文；
-    - 在流式 token 到达时逐步回传 token（event type=token），并在累计达到 save_threshold 字符时将当前已生成内容写回 DB；
-    - 最终在生成完成后写入最终 content，并返回 done 事件包含 chapter_uid 与最终长度。
+    - 在流式 token 到达时逐步回传 token（event type=token），coalesce_ms / coalesce_chars 窗口内的 token 合并为一个事件；
+    - 单个持久化任务通过有界通道接收 token，未保存内容达到 save_threshold 字符或滞留超过 save_timeout_sec 秒时追加入库，并推送 persist 事件；
+    - 最终在生成完成后写入最终 content，并返回 done 事件包含 chapter_uid 与最终长度；
+      重试/切换供应商用尽仍失败时先推送 error 事件，已生成的部分照常保存，done 事件中 complete=false。
     """
-    chapter = await get_chapter(payload.chapter_uid)
+    # 生成正文只需要章节元数据，不读取已有正文
+    chapter = await get_chapter(payload.chapter_uid, fields=CHAPTER_META_COLUMNS)
     if not chapter:
         raise ManuScriptValidationMsg(msg="Chapter not found", code=ResponseCode.CLIENT_ERROR.value)
 
@@ -257,14 +393,22 @@ async def create_chapter_content(payload: GenerateChapterContentRequest):
     characters = await list_characters(novel_uid)
 
     async def event_generator():
-        token_queue: asyncio.Queue = asyncio.Queue()
+        # 推送给客户端的事件：("token", piece) 来自生成回调，满时与队尾 token 合并；
+        # ("persist", ev) 来自持久化任务，走 put_control，持久化任务不会因客户端读得慢而停顿
+        event_queue = StreamChannel(
+            STREAM_QUEUE_SIZE, COALESCE, merge=merge_token_events,
+            gauge=stream_gauge("create_chapter_content", payload.chapter_uid),
+        )
+        # 主循环 -> 持久化任务的有界通道，满时合并为更长的片段；None 表示生成结束
+        persist_channel = StreamChannel(PERSIST_CHANNEL_SIZE, COALESCE, merge=merge_text)
         buffer_parts: List[str] = []
-        last_saved_len = 0
         save_threshold = payload.save_threshold or 200
-        save_lock = asyncio.Lock()
+        save_timeout_sec = payload.save_timeout_sec or 1.0
+        coalesce_sec = max(0, payload.coalesce_ms or 0) / 1000
+        coalesce_chars = max(1, payload.coalesce_chars or 1)
 
         try:
-            agent = ChapterAgent(provider=payload.provider)
+            agent = ChapterAgent(provider=payload.provider, priority=INTERACTIVE)
         except Exception:
             logger.exception("Failed to init ChapterAgent for chapter %s", payload.chapter_uid)
             err = {"type": "error", "message": "Agent init failed"}
@@ -273,7 +417,7 @@ async def create_chapter_content(payload: GenerateChapterContentRequest):
 
         # 回调：把 token 放入队列（不直接 yield，避免回调内 yield 问题）
         async def on_token(piece: str):
-            await token_queue.put(piece)
+            await event_queue.put(("token", piece))
 
         # # 启动生成任务（并行消费 token 队列）
         # 为兼容 ChapterAgent 要求，构造单个 outline_item 来表示当前 chapter
@@ -301,86 +445,207 @@ async def create_chapter_content(payload: GenerateChapterContentRequest):
                 next_synopsis=None,
                 language=payload.language,
                 on_token=on_token,
-                conversation_messages=payload.conversation_messages
+                conversation_messages=payload.conversation_messages,
+                hedge=payload.hedge
             )
         )
 
+        # 清掉上一次中断遗留的流式片段，本次生成从空白开始追加
+        try:
+            await reset_chapter_content_chunks(payload.chapter_uid)
+        except Exception:
+            logger.exception("Failed to reset content chunks for chapter %s", payload.chapter_uid)
+
         # 发送 start 事件
         start = {"type": "start", "chapter_uid": payload.chapter_uid}
         yield f"data: {json.dumps(start, ensure_ascii=False)}\n\n"
 
-        async def try_persist_if_needed():
-            nonlocal last_saved_len
-            async with save_lock:
-                cur_content = "".join(buffer_parts)
-                cur_len = len(cur_content)
-                if cur_len - last_saved_len >= save_threshold:
-                    # 保持 title/synopsis 不变，仅更新 content
+        async def persister():
+            """
+            每次生成只有这一个持久化任务：累积未保存的片段，
+            达到 save_threshold 字符或最早的未保存片段滞留超过 save_timeout_sec 时，追加写入 ChapterContentChunk。
+            收到 None 即退出（剩余内容由结束时的 compact_chapter_content 一并写入）。
+            """
+            pending: List[str] = []
+            pending_len = 0
+            saved_len = 0
+            deadline = 0.0
+            loop = asyncio.get_running_loop()
+            while True:
+                if pending:
+                    try:
+                        piece = await asyncio.wait_for(persist_channel.get(), timeout=max(0.0, deadline - loop.time()))
+                    except asyncio.TimeoutError:
+                        piece = ""
+                else:
+                    piece = await persist_channel.get()
+                if piece is None:
+                    return
+                if piece:
+                    if not pending:
+                        deadline = loop.time() + save_timeout_sec
+                    pending.append(piece)
+                    pending_len += len(piece)
+                if pending and (pending_len >= save_threshold or loop.time() >= deadline):
+                    delta = "".join(pending)
+                    pending.clear()
+                    pending_len = 0
                     try:
-                        await update_chapter(payload.chapter_uid, chapter.title, cur_content, synopsis=getattr(chapter, "synopsis", None))
-                        last_saved_len = cur_len
-                        ev = {"type": "persist", "chapter_uid": payload.chapter_uid, "saved_len": cur_len}
-                        await token_queue.put(json.dumps({"__persist_event__": ev}, ensure_ascii=False))
+                        await append_chapter_content(payload.chapter_uid, delta)
+                        saved_len += len(delta)
+                        ev = {"type": "persist", "chapter_uid": payload.chapter_uid, "saved_len": saved_len}
+                        event_queue.put_control(("persist", ev))
                     except Exception:
                         logger.exception("Failed to persist interim content for chapter %s", payload.chapter_uid)
 
-        # 消费 token 队列并向客户端推送事件，同时进行增量持久化
-        finished = False
+        persist_task = asyncio.create_task(persister())
+        close_queue_when_done(gen_task, event_queue)
+        finalized = False
+
+        async def persist_final(text: str) -> None:
+            """
+            整段正文写入 ChapterContent 一次，并删除流式片段。
+            本次没有生成任何内容（如首个 token 前就失败或断开）时只清理流式片段，保留章节原有正文。
+            """
+            if text:
+                await compact_chapter_content(payload.chapter_uid, text)
+            else:
+                await reset_chapter_content_chunks(payload.chapter_uid)
+
+        async def save_partial(parts: List[str]) -> None:
+            """
+            客户端断开时 StreamingResponse 会直接取消事件生成器，正常路径上的最终持久化不会执行：
+            等生成与持久化任务停下后，把已生成的部分整段写入 ChapterContent 并清掉流式片段。
+            """
+            for task in (gen_task, persist_task):
+                task.cancel()
+            await asyncio.gather(gen_task, persist_task, return_exceptions=True)
+            # 已交给本生成器但尚未推送的 token 也是已生成的内容
+            while not event_queue.empty():
+                ev_item = event_queue.get_nowait()
+                if ev_item is not END_OF_STREAM and ev_item[0] == "token":
+                    parts.append(ev_item[1])
+            final_text = "".join(parts)
+            await persist_final(final_text)
+            logger.info("Saved %d chars of chapter %s after client disconnect", len(final_text), payload.chapter_uid)
+        watcher = asyncio.create_task(cancel_on_disconnect(request, "create_chapter_content", gen_task))
+
+        # 合并中的 token：满 coalesce_chars 字符或首个 token 等待超过 coalesce_ms 即作为一个事件推送
+        batch: List[str] = []
+        batch_len = 0
+        batch_started = 0.0
+        loop = asyncio.get_running_loop()
+
+        async def flush_batch() -> Optional[str]:
+            """取出合并中的 token，交给持久化任务，并返回对应的 SSE 帧。"""
+            nonlocal batch_len
+            if not batch:
+                return None
+            text = "".join(batch)
+            batch.clear()
+            batch_len = 0
+            buffer_parts.append(text)
+            # 通道有界：持久化跟不上时片段在通道内合并，而不是无限堆积
+            await persist_channel.put(text)
+            return f"data: {json.dumps({'type': 'token', 'token': text}, ensure_ascii=False)}\n\n"
+
+        # 消费事件队列并向客户端推送；token 同时交给持久化任务
         try:
             while True:
-                try:
-                    piece = await asyncio.wait_for(token_queue.get(), timeout=0.5)
-                except asyncio.TimeoutError:
-                    # 若生成任务已完成且队列空，则退出
-                    if gen_task.done():
-                        break
-                    continue
-
-                # special persist marker
-                if isinstance(piece, str) and piece.startswith('{"__persist_event__"'):
-                    # 从 queue 中接收到持久化内部事件标记，直接把它转为 SSE 事件
+                if batch:
+                    remaining = coalesce_sec - (loop.time() - batch_started)
                     try:
-                        obj = json.loads(piece)
-                        ev = obj.get("__persist_event__")
-                        if ev:
-                            yield f"data: {json.dumps(ev, ensure_ascii=False)}\n\n"
+                        ev_item = await asyncio.wait_for(event_queue.get(), timeout=max(0.0, remaining))
+                    except asyncio.TimeoutError:
+                        frame = await flush_batch()
+                        if frame:
+                            yield frame
                         continue
-                    except Exception:
-                        pass
-
-                # 普通 token：回传并追加缓存
-                buffer_parts.append(piece)
-                # 逐 token 返回（前端可实时拼接）
-                token_ev = {"type": "token", "token": piece}
-                yield f"data: {json.dumps(token_ev, ensure_ascii=False)}\n\n"
-
-                # 异步检查是否需要持久化（不阻塞 token 返回）
-                # 这里直接创建任务，实际持久化通过 save_lock 序列化
-                asyncio.create_task(try_persist_if_needed())
+                else:
+                    ev_item = await event_queue.get()
+                if ev_item is END_OF_STREAM:
+                    break
+                kind, data = ev_item
+                if kind == "persist":
+                    yield f"data: {json.dumps(data, ensure_ascii=False)}\n\n"
+                    continue
 
-            # 等待生成任务完成并获取最终内容
+                # 普通 token：并入当前批次（前端按到达顺序拼接 token 字段即可）
+                if not batch:
+                    batch_started = loop.time()
+                batch.append(data)
+                batch_len += len(data)
+                if batch_len >= coalesce_chars or loop.time() - batch_started >= coalesce_sec:
+                    frame = await flush_batch()
+                    if frame:
+                        yield frame
+
+            # 断开监听先于 StreamingResponse 发现断开时，生成任务被取消、循环正常结束：
+            # 不再写出事件，照常进入最终持久化，保留已生成的部分
+            disconnected = gen_task.cancelled()
+            frame = await flush_batch()
+            if frame and not disconnected:
+                yield frame
+
+            # 通知持久化任务结束，并推送其尚未送出的 persist 事件
+            persist_channel.put_control(None)
+            await persist_task
+            while not event_queue.empty():
+                ev_item = event_queue.get_nowait()
+                if ev_item is not END_OF_STREAM and ev_item[0] == "persist" and not disconnected:
+                    yield f"data: {json.dumps(ev_item[1], ensure_ascii=False)}\n\n"
+
+            # 收到结束标记时生成任务已经完成，直接取结果；被取消（客户端断开）时保留已生成的部分
+            generation_error: Optional[str] = None
             try:
-                final_content = await asyncio.wait_for(gen_task, timeout=10)
-            except Exception:
-                # 若任务出错，记录并继续用现有缓冲作为 final_content
+                final_content = "" if gen_task.cancelled() else gen_task.result()
+            except Exception as exc:
+                # 重试与切换供应商都用尽：保存已生成的部分，并告知前端正文不完整（可续写）
                 logger.exception("Generation task failed for chapter %s", payload.chapter_uid)
                 final_content = "".join(buffer_parts)
+                generation_error = str(exc) or type(exc).__name__
 
             # 如果 final_content 非空且与缓冲一致则使用，否则以 final_content 为准
             if final_content:
                 buffer_parts = [final_content]
             final_text = "".join(buffer_parts)
 
-            # 最终持久化（确保写入 DB）
+            # 最终持久化：整段正文写入 ChapterContent 一次，并删除流式片段
+            finalized = True
             try:
-                await update_chapter(payload.chapter_uid, chapter.title, final_text, synopsis=getattr(chapter, "synopsis", None))
+                await persist_final(final_text)
             except Exception:
                 logger.exception("Failed to persist final content for chapter %s", payload.chapter_uid)
 
-            done = {"type": "done", "chapter_uid": payload.chapter_uid, "final_length": len(final_text)}
+            if generation_error and not disconnected:
+                err = {
+                    "type": "error",
+                    "chapter_uid": payload.chapter_uid,
+                    "message": "chapter generation failed",
+                    "detail": generation_error,
+                    "saved_len": len(final_text),
+                }
+                yield f"data: {json.dumps(err, ensure_ascii=False)}\n\n"
+
+            # complete=false：生成中途失败，已保存的只是部分正文
+            # usage：prompt/cached/completion tokens 与首 token 耗时（ttft_ms），用于观察前缀缓存命中
+            done = {
+                "type": "done",
+                "chapter_uid": payload.chapter_uid,
+                "final_length": len(final_text),
+                "complete": generation_error is None and not disconnected,
+                "usage": agent.adapter.last_usage,
+            }
             yield f"data: {json.dumps(done, ensure_ascii=False)}\n\n"
         finally:
-            # 清理：若生成任务还未结束，取消它
-            if not gen_task.done():
-                gen_task.cancel()
+            # 清理：若生成/持久化任务还未结束，取消它
+            watcher.cancel()
+            if not finalized:
+                # 本生成器被取消（客户端断开）时在独立任务中收尾，不受本生成器的取消影响
+                spawn_background(save_partial(buffer_parts + batch))
+            else:
+                if not gen_task.done():
+                    gen_task.cancel()
+                if not persist_task.done():
+                    persist_task.cancel()
     return StreamingResponse(event_generator(), media_type="text/event-stream")
\ No newline at end of file
@@ -5,7 +5,7 @@ a = Analysis(
     ['main.py'],
     pathex=[],
     binaries=[],
-    datas=[],
+    datas=[('db/migrations', 'db/migrations')],
     hiddenimports=[],
     hookspath=[],
     hooksconfig={},
@@ -0,0 +1,235 @@
+# 模型调用的准入控制：按 provider 限制并发数、每分钟请求数与每分钟 token 数，交互式请求优先于批量任务
+import time
+import heapq
+import asyncio
+import logging
+import itertools
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, asdict, fields
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from utils import metrics
+
+logger = logging.getLogger("admission")
+
+# 优先级：数值越小越先放行
+INTERACTIVE = 0  # 前端正在等待的 SSE 生成
+BATCH = 1  # 摘要、一次性生成等后台任务
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BATCH: "batch"}
+
+
+@dataclass(frozen=True)
+class LimitSettings:
+    """
+    provider config.yaml 的 limits 段（0 表示不限制）：
+        limits:
+          max_in_flight: 4
+          rpm: 60
+          tpm: 200000
+          completion_reserve_tokens: 1000
+    """
+    max_in_flight: int = 0
+    rpm: int = 0
+    tpm: int = 0
+    completion_reserve_tokens: int = 1000  # 申请 tpm 额度时为输出预留的 token 数，完成后按实际用量多退少补
+
+
+def limit_settings(config: Optional[Dict[str, Any]]) -> LimitSettings:
+    section = (config or {}).get("limits") or {}
+    if not isinstance(section, dict):
+        logger.warning("Ignoring limits config: expect a mapping, got %r", section)
+        return LimitSettings()
+    values = {}
+    for f in fields(LimitSettings):
+        if f.name not in section:
+            continue
+        try:
+            values[f.name] = max(0, int(section[f.name]))
+        except (TypeError, ValueError):
+            logger.warning("Ignoring limits.%s=%r", f.name, section[f.name])
+    return LimitSettings(**values)
+
+
+def estimate_tokens(messages: List[Dict[str, Any]]) -> int:
+    """粗略估算 prompt token 数：中文约 1 字 1 token，英文约 4 字符 1 token，取折中的 2 字符 1 token。"""
+    chars = sum(len(str(m.get("content") or "")) for m in messages)
+    return max(1, chars // 2)
+
+
+class _Bucket:
+    """令牌桶：容量为每分钟额度，按秒匀速补充；允许短暂为负（实际用量超出预估时记账）。"""
+
+    def __init__(self, per_minute: int):
+        self.per_minute = per_minute
+        self.level = float(per_minute)
+        self.updated = time.monotonic()
+
+    def refill(self) -> None:
+        now = time.monotonic()
+        self.level = min(float(self.per_minute), self.level + (now - self.updated) * self.per_minute / 60)
+        self.updated = now
+
+    def wait_for(self, amount: float) -> float:
+        """还需等待多少秒才够 amount（申请量超过容量时按容量计，避免永远等不到）。"""
+        amount = min(amount, self.per_minute)
+        return max(0.0, (amount - self.level) * 60 / self.per_minute)
+
+
+@dataclass
+class Ticket:
+    priority: int
+    tokens: int  # 申请时预扣的 token 数
+    wait_ms: float = 0.0
+    tokens_used: Optional[int] = None  # 调用方在结束前填入实际用量，用于校正 tpm 额度
+
+
+@dataclass
+class LimiterStats:
+    admitted: int = 0
+    wait_ms_total: float = 0.0
+    wait_ms_max: float = 0.0
+
+
+class ProviderLimiter:
+    """
+    单个 provider 的准入队列：等待者按 (priority, 到达顺序) 排队，只有队首满足
+    并发数、rpm、tpm 三项限制时才放行；额度不足时定时器在补足时重新调度。
+    """
+
+    def __init__(self, provider: str, settings: LimitSettings):
+        self.provider = provider
+        self.in_flight = 0
+        self.stats = LimiterStats()
+        self._waiters: List[Tuple[int, int, asyncio.Future, Ticket]] = []
+        self._seq = itertools.count()
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self.settings = LimitSettings()
+        self._requests: Optional[_Bucket] = None
+        self._tokens: Optional[_Bucket] = None
+        self.configure(settings)
+
+    def configure(self, settings: LimitSettings) -> None:
+        """配置变化时原地更新限制（保留进行中的计数），并尝试放行排队者。"""
+        if settings == self.settings:
+            return
+        self.settings = settings
+        self._requests = _Bucket(settings.rpm) if settings.rpm else None
+        self._tokens = _Bucket(settings.tpm) if settings.tpm else None
+        if self._waiters:
+            self._dispatch()
+
+    def _admissible(self, ticket: Ticket) -> float:
+        """返回 0 表示可以立即放行；大于 0 为需等待额度补充的秒数；-1 表示在等并发名额。"""
+        if self.settings.max_in_flight and self.in_flight >= self.settings.max_in_flight:
+            return -1
+        wait = 0.0
+        if self._requests:
+            self._requests.refill()
+            wait = max(wait, self._requests.wait_for(1))
+        if self._tokens:
+            self._tokens.refill()
+            wait = max(wait, self._tokens.wait_for(ticket.tokens))
+        return wait
+
+    def _dispatch(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        while self._waiters:
+            _, _, fut, ticket = self._waiters[0]
+            if fut.done():  # 排队期间被取消（如客户端断开）
+                heapq.heappop(self._waiters)
+                continue
+            wait = self._admissible(ticket)
+            if wait < 0:
+                break  # 等 release() 再调度
+            if wait > 0:
+                self._timer = asyncio.get_running_loop().call_later(wait, self._dispatch)
+                break
+            heapq.heappop(self._waiters)
+            self._take(ticket)
+            fut.set_result(None)
+        self._report()
+
+    def _take(self, ticket: Ticket) -> None:
+        self.in_flight += 1
+        if self._requests:
+            self._requests.level -= 1
+        if self._tokens:
+            self._tokens.level -= ticket.tokens
+
+    async def acquire(self, priority: int, tokens: int) -> Ticket:
+        reserve = self.settings.completion_reserve_tokens if self._tokens else 0
+        ticket = Ticket(priority=priority, tokens=tokens + reserve)
+        started = time.perf_counter()
+        if not self._waiters and self._admissible(ticket) == 0:
+            self._take(ticket)
+        else:
+            fut = asyncio.get_running_loop().create_future()
+            heapq.heappush(self._waiters, (priority, next(self._seq), fut, ticket))
+            self._dispatch()
+            try:
+                await fut
+            except asyncio.CancelledError:
+                if fut.done() and not fut.cancelled():
+                    # 放行与取消同时发生：名额已占用，交还
+                    self.release(ticket)
+                else:
+                    fut.cancel()
+                    self._dispatch()
+                raise
+        ticket.wait_ms = (time.perf_counter() - started) * 1000
+        self.stats.admitted += 1
+        self.stats.wait_ms_total += ticket.wait_ms
+        self.stats.wait_ms_max = max(self.stats.wait_ms_max, ticket.wait_ms)
+        metrics.incr(f"admission_admitted.{self.provider}.{PRIORITY_NAMES.get(priority, priority)}")
+        self._report()
+        return ticket
+
+    def release(self, ticket: Ticket) -> None:
+        self.in_flight = max(0, self.in_flight - 1)
+        if self._tokens and ticket.tokens_used is not None:
+            # 按实际用量校正预扣额度（多退少补）
+            self._tokens.level = min(float(self._tokens.per_minute), self._tokens.level + ticket.tokens - ticket.tokens_used)
+        self._dispatch()
+
+    def _report(self) -> None:
+        metrics.set_gauge(f"admission_in_flight.{self.provider}", self.in_flight)
+        metrics.set_gauge(f"admission_queued.{self.provider}", sum(1 for w in self._waiters if not w[2].done()))
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "settings": asdict(self.settings),
+            "in_flight": self.in_flight,
+            "queued": sum(1 for w in self._waiters if not w[2].done()),
+            **asdict(self.stats),
+        }
+
+
+_limiters: Dict[str, ProviderLimiter] = {}
+
+
+def get_limiter(provider: str, settings: LimitSettings) -> ProviderLimiter:
+    """每个 provider 一个进程级限流器；settings 变化（配置热更新）时原地生效。"""
+    limiter = _limiters.get(provider)
+    if limiter is None:
+        limiter = _limiters[provider] = ProviderLimiter(provider, settings)
+    else:
+        limiter.configure(settings)
+    return limiter
+
+
+@asynccontextmanager
+async def admit(limiter: ProviderLimiter, priority: int, tokens: int) -> AsyncIterator[Ticket]:
+    """async with admit(...) as ticket：排队直到放行，退出时归还名额（调用方可设置 ticket.tokens_used）。"""
+    ticket = await limiter.acquire(priority, tokens)
+    if ticket.wait_ms >= 1:
+        logger.info("Admission wait %.0f ms (%s, %s)", ticket.wait_ms, limiter.provider, PRIORITY_NAMES.get(priority, priority))
+    try:
+        yield ticket
+    finally:
+        limiter.release(ticket)
+
+
+def stats() -> Dict[str, Any]:
+    return {provider: limiter.snapshot() for provider, limiter in _limiters.items()}
@@ -10,14 +10,21 @@ from typing import Optional, Dict, Type, AsyncIterable, Any, List
 import requests
 import base64
 from utils.config import Model_Providers
+from tools.http_transport import get_http_client, transport_settings
+from tools import llm_cache
 
 class DeepSeekClient:
     """OpenAI/DeepSeek API 客户端工具类，支持多轮 messages 参数"""
 
+    # 其他 OpenAI 兼容的供应商（如本地 mock）可继承本类并覆盖以下默认值
+    provider = "deepseek"
+    default_model = "deepseek-chat"
+    default_base_url = "https://api.deepseek.com"
+
     def __init__(self, config_path: Optional[str] = None):
         # Determine config path: prefer explicit, else use mapping from utils.config
         if not config_path:
-            rel = Model_Providers.get("deepseek", "config/deepseek/config.yaml")
+            rel = Model_Providers.get(self.provider, f"config/{self.provider}/config.yaml")
             config_path = rel
 
         # resolve relative path to project root (handle PyInstaller frozen exe)
@@ -37,22 +44,25 @@ class DeepSeekClient:
             # create placeholder file with required DeepSeek defaults
             placeholder = {
                 "api_key": "xxxxxx",
-                "model": "deepseek-chat",
-                "base_url": "https://api.deepseek.com",
+                "model": self.default_model,
+                "base_url": self.default_base_url,
             }
             with open(config_path, "w", encoding="utf-8") as f:
                 yaml.safe_dump(placeholder, f, allow_unicode=True, sort_keys=False)
 
+        self.config_path = config_path
         self.config_info = self._load_config(config_path)
         self.api_key = self.config_info.get("api_key")
-        self.model = self.config_info.get("model", "deepseek-chat")
-        self.base_url = self.config_info.get("base_url", "https://api.deepseek.com")
+        self.model = self.config_info.get("model", self.default_model)
+        self.base_url = self.config_info.get("base_url", self.default_base_url)
         # Ensure OpenAI/DeepSeek client sees API key via env if required
         if self.api_key:
             os.environ['OPENAI_API_KEY'] = str(self.api_key)
+        # 使用共享的 httpx 连接池（config.yaml 的 transport 段可调整连接数/keep-alive/超时/http2）
         self.async_client = AsyncOpenAI(
             api_key=self.api_key,
-            base_url=self.base_url
+            base_url=self.base_url,
+            http_client=get_http_client(transport_settings(self.config_info)),
         )
 
     def _load_config(self, config_path: str) -> Dict[str, Any]:
@@ -88,10 +98,12 @@ class DeepSeekClient:
         prompt: Optional[str] = None,
         instructions: Optional[str] = None,
         is_structured: bool = False,
-        messages: Optional[List[Dict[str, str]]] = None
+        messages: Optional[List[Dict[str, str]]] = None,
+        use_cache: bool = True
     ):
         """
         非流式返回，支持结构化和多轮 messages。
+        use_cache=True 时先查响应缓存（tools/llm_cache），命中则不请求模型。
         """
         if messages is None:
             messages_payload = [
@@ -107,19 +119,31 @@ class DeepSeekClient:
             messages_payload = self._ensure_json_hint(messages_payload)
             extra_args["response_format"] = {"type": "json_object"}
 
-        resp = await self.async_client.chat.completions.create(
-            model=self.model,
-            messages=messages_payload,
-            **extra_args,
+        cache_key = (
+            llm_cache.cache_key(self.provider, self.model, messages_payload, extra_args.get("response_format"), self.base_url)
+            if use_cache else None
         )
+        content = await llm_cache.get(cache_key) if cache_key else None
+        cached = content is not None
+        if not cached:
+            resp = await self.async_client.chat.completions.create(
+                model=self.model,
+                messages=messages_payload,
+                **extra_args,
+            )
+            content = resp.choices[0].message.content
 
+        result = content
         if is_structured:
             try:
-                return json.loads(resp.choices[0].message.content)
+                result = json.loads(content)
             except Exception as e:
-                raise RuntimeError(f"解析 JSON 失败: {resp.choices[0].message.content}") from e
+                raise RuntimeError(f"解析 JSON 失败: {content}") from e
 
-        return resp.choices[0].message.content
+        # 解析成功后才写入缓存，避免反复命中一个无法解析的响应
+        if cache_key and not cached:
+            await llm_cache.put(cache_key, self.provider, self.model, content)
+        return result
 
     async def async_stream_response(
         self,
@@ -139,7 +163,8 @@ class DeepSeekClient:
         else:
             messages_payload = list(messages)
 
-        extra_args = {}
+        # include_usage：最后一个 chunk 带回用量（含 prompt_cache_hit_tokens）
+        extra_args = {"stream_options": {"include_usage": True}}
         if is_structured:
             messages_payload = self._ensure_json_hint(messages_payload)
             extra_args["response_format"] = {"type": "json_object"}
@@ -0,0 +1,62 @@
+# 首 token 耗时（TTFT）统计与对冲阈值：每个 provider 保留最近若干次样本，按分位数给出对冲等待时间
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+
+from utils.config import Hedge_Policy
+
+_samples: Dict[str, Deque[float]] = {}
+
+# 可对冲的主供应商及未配置 Hedge_Policy.provider 时的默认对冲对象；不在表中的供应商（如本地 mock）不做对冲，避免把压测请求发到付费供应商
+_DEFAULT_PARTNERS = {"deepseek": "openai", "openai": "deepseek"}
+
+
+def record_ttft(provider: str, ttft_ms: float) -> None:
+    window = _samples.get(provider)
+    if window is None:
+        window = _samples[provider] = deque(maxlen=int(Hedge_Policy["window"]))
+    window.append(ttft_ms)
+
+
+def percentile(provider: str, pct: float) -> Optional[float]:
+    """最近样本的 pct 分位数（最近秩法）；没有样本时返回 None。"""
+    window = _samples.get(provider)
+    if not window:
+        return None
+    ordered = sorted(window)
+    rank = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[rank]
+
+
+def hedge_threshold_ms(provider: str) -> float:
+    """对冲等待时间：样本足够时取 TTFT 分位数，否则用固定阈值；结果限制在配置的上下限内。"""
+    threshold = float(Hedge_Policy["threshold_ms"])
+    window = _samples.get(provider)
+    if window is not None and len(window) >= int(Hedge_Policy["min_samples"]):
+        threshold = percentile(provider, float(Hedge_Policy["percentile"]))
+    return min(float(Hedge_Policy["max_threshold_ms"]), max(float(Hedge_Policy["min_threshold_ms"]), threshold))
+
+
+def hedge_partner(primary: str) -> Optional[str]:
+    """
+    对冲用的第二个供应商：Hedge_Policy.provider，未配置时取另一家；没有可用的对冲对象时返回 None。
+    主供应商不是真实供应商（不在 _DEFAULT_PARTNERS 中，如 mock）时一律不对冲，配置了 provider 也一样。
+    """
+    if primary not in _DEFAULT_PARTNERS:
+        return None
+    partner = Hedge_Policy.get("provider")
+    if partner and partner != primary:
+        return partner
+    return _DEFAULT_PARTNERS[primary]
+
+
+def stats() -> Dict[str, Any]:
+    out = {}
+    for provider, window in _samples.items():
+        out[provider] = {
+            "samples": len(window),
+            "p50_ms": round(percentile(provider, 50), 1),
+            "p90_ms": round(percentile(provider, 90), 1),
+            "p99_ms": round(percentile(provider, 99), 1),
+            "hedge_threshold_ms": round(hedge_threshold_ms(provider), 1),
+        }
+    return out
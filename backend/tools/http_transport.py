@@ -0,0 +1,139 @@
+# 模型供应商调用共用的 httpx.AsyncClient：连接池/keep-alive/超时/HTTP2 由各 provider config.yaml 的 transport 段配置
+import logging
+from dataclasses import dataclass, fields, asdict
+from typing import Any, Dict, Optional
+
+import httpx
+
+logger = logging.getLogger("http_transport")
+
+
+@dataclass(frozen=True)
+class TransportSettings:
+    """
+    config.yaml 示例：
+        transport:
+          max_connections: 20
+          max_keepalive_connections: 10
+          keepalive_expiry: 60
+          connect_timeout: 10
+          read_timeout: 120
+          http2: false
+    """
+    max_connections: int = 20
+    max_keepalive_connections: int = 10
+    keepalive_expiry: float = 60.0  # 空闲连接保留秒数
+    connect_timeout: float = 10.0
+    read_timeout: float = 120.0  # 两个流式分片之间的最长等待
+    write_timeout: float = 30.0
+    pool_timeout: float = 10.0  # 等待连接池空闲连接的最长时间
+    http2: bool = False  # 需要安装 h2（pip install httpx[http2]），未安装时退回 HTTP/1.1
+
+
+def transport_settings(config: Optional[Dict[str, Any]]) -> TransportSettings:
+    """从 provider 配置的 transport 段读取设置；缺省/非法的项使用默认值。"""
+    section = (config or {}).get("transport") or {}
+    if not isinstance(section, dict):
+        logger.warning("Ignoring transport config: expect a mapping, got %r", section)
+        return TransportSettings()
+    values = {}
+    for f in fields(TransportSettings):
+        if f.name not in section:
+            continue
+        try:
+            values[f.name] = f.type(section[f.name]) if f.type is not bool else bool(section[f.name])
+        except (TypeError, ValueError):
+            logger.warning("Ignoring transport.%s=%r", f.name, section[f.name])
+    return TransportSettings(**values)
+
+
+@dataclass
+class OriginStats:
+    requests: int = 0
+    new_connections: int = 0
+    tls_handshakes: int = 0
+    http2_requests: int = 0
+
+
+# 以设置为键共享客户端：相同设置的 provider 共用一个连接池（连接本身按 origin 复用）
+_clients: Dict[TransportSettings, httpx.AsyncClient] = {}
+_stats: Dict[str, OriginStats] = {}
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+async def _on_request(request: httpx.Request) -> None:
+    """请求钩子：记录请求数，并通过 httpcore 的 trace 扩展统计新建连接与 TLS 握手（其余请求即复用了已有连接）。"""
+    port = f":{request.url.port}" if request.url.port else ""
+    origin = f"{request.url.scheme}://{request.url.host}{port}"
+    stats = _stats.setdefault(origin, OriginStats())
+    stats.requests += 1
+
+    async def trace(event: str, info: Dict[str, Any]) -> None:
+        if event == "connection.connect_tcp.complete":
+            stats.new_connections += 1
+        elif event == "connection.start_tls.complete":
+            stats.tls_handshakes += 1
+        elif event == "http2.send_request_headers.started":
+            stats.http2_requests += 1
+
+    request.extensions["trace"] = trace
+
+
+def get_http_client(settings: Optional[TransportSettings] = None) -> httpx.AsyncClient:
+    """返回（必要时创建）与 settings 对应的共享 AsyncClient，供 AsyncOpenAI(http_client=...) 使用。"""
+    settings = settings or TransportSettings()
+    client = _clients.get(settings)
+    if client is not None and not client.is_closed:
+        return client
+
+    http2 = settings.http2
+    if http2 and not _http2_available():
+        logger.warning("transport.http2 is enabled but the 'h2' package is not installed, falling back to HTTP/1.1")
+        http2 = False
+
+    client = httpx.AsyncClient(
+        http2=http2,
+        limits=httpx.Limits(
+            max_connections=settings.max_connections,
+            max_keepalive_connections=settings.max_keepalive_connections,
+            keepalive_expiry=settings.keepalive_expiry,
+        ),
+        timeout=httpx.Timeout(
+            connect=settings.connect_timeout,
+            read=settings.read_timeout,
+            write=settings.write_timeout,
+            pool=settings.pool_timeout,
+        ),
+        follow_redirects=True,
+        event_hooks={"request": [_on_request]},
+    )
+    _clients[settings] = client
+    logger.info("Shared HTTP client created: %s (http2=%s)", asdict(settings), http2)
+    return client
+
+
+async def close_http_clients() -> None:
+    """应用关闭时释放全部共享连接池。"""
+    for client in list(_clients.values()):
+        await client.aclose()
+    _clients.clear()
+
+
+def stats() -> Dict[str, Any]:
+    """按 origin 汇总的连接复用统计：reused = 请求数 - 新建连接数。"""
+    origins = {}
+    for origin, s in _stats.items():
+        reused = max(0, s.requests - s.new_connections)
+        origins[origin] = {
+            **asdict(s),
+            "reused": reused,
+            "reuse_rate": round(reused / s.requests, 4) if s.requests else 0.0,
+        }
+    return {"clients": len(_clients), "origins": origins}
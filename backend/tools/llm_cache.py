@@ -0,0 +1,193 @@
+# 非流式模型调用的持久化响应缓存（按内容寻址）：同一 provider/model/messages/response_format 的请求直接返回上次的结果
+import os
+import json
+import time
+import hashlib
+import logging
+from typing import Any, Dict, List, Optional
+
+import aiosqlite
+from pydantic import BaseModel
+
+from db.sqlite import BASE_DIR
+from utils import metrics
+
+logger = logging.getLogger("llm_cache")
+
+# LLM_CACHE_FILE 可覆盖缓存库位置；与业务库分开，删除即清空缓存
+LLM_CACHE_FILE = os.getenv("LLM_CACHE_FILE") or os.path.join(BASE_DIR, "db", "llm_cache.db")
+
+DEFAULT_LLM_CACHE_MAX_BYTES = 64 * 1024 * 1024  # 64MB，按响应文本字节数计
+DEFAULT_LLM_CACHE_TTL_SEC = 7 * 24 * 3600
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+# LLM_CACHE_MAX_BYTES / LLM_CACHE_TTL_SEC 任一为 0 即关闭缓存
+LLM_CACHE_MAX_BYTES = _env_int("LLM_CACHE_MAX_BYTES", DEFAULT_LLM_CACHE_MAX_BYTES)
+LLM_CACHE_TTL_SEC = _env_int("LLM_CACHE_TTL_SEC", DEFAULT_LLM_CACHE_TTL_SEC)
+
+# 超出上限时淘汰到上限的 EVICT_TO_RATIO，避免缓存写满后每次写入都触发一次淘汰扫描
+EVICT_TO_RATIO = 0.9
+# 每写入 SWEEP_EVERY_PUTS 次清理一次过期条目（读取时已按 TTL 过滤，过期条目只占空间）
+SWEEP_EVERY_PUTS = 200
+
+_conn: Optional[aiosqlite.Connection] = None
+# 缓存总字节数：打开连接时统计一次，之后随写入/清理增量维护
+_total_bytes = 0
+_puts_since_sweep = 0
+
+
+def enabled() -> bool:
+    return LLM_CACHE_MAX_BYTES > 0 and LLM_CACHE_TTL_SEC > 0
+
+
+def _normalize_messages(messages: List[Dict[str, Any]]) -> List[Dict[str, str]]:
+    """只保留 role/content，统一换行并去掉首尾空白，避免无关差异导致未命中。"""
+    return [
+        {
+            "role": str(m.get("role", "")),
+            "content": str(m.get("content") or "").replace("\r\n", "\n").strip(),
+        }
+        for m in messages
+    ]
+
+
+def _normalize_format(response_format: Any) -> Any:
+    if response_format is None:
+        return None
+    if isinstance(response_format, type) and issubclass(response_format, BaseModel):
+        return response_format.model_json_schema()
+    return response_format
+
+
+def cache_key(
+    provider: str,
+    model: str,
+    messages: List[Dict[str, Any]],
+    response_format: Any = None,
+    base_url: Optional[str] = None,
+) -> str:
+    """sha256(provider, base_url, model, 规范化后的 messages, response_format)。"""
+    material = {
+        "provider": provider,
+        "base_url": base_url or "",
+        "model": model,
+        "messages": _normalize_messages(messages),
+        "response_format": _normalize_format(response_format),
+    }
+    raw = json.dumps(material, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+async def _get_conn() -> aiosqlite.Connection:
+    global _conn, _total_bytes
+    if _conn is None:
+        os.makedirs(os.path.dirname(LLM_CACHE_FILE), exist_ok=True)
+        conn = await aiosqlite.connect(LLM_CACHE_FILE)
+        await conn.execute("PRAGMA journal_mode = WAL")
+        await conn.execute("PRAGMA synchronous = NORMAL")
+        await conn.execute("""
+        CREATE TABLE IF NOT EXISTS LLMResponseCache (
+            key TEXT PRIMARY KEY,
+            provider TEXT NOT NULL,
+            model TEXT NOT NULL,
+            response TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            created_at REAL NOT NULL,
+            accessed_at REAL NOT NULL
+        )
+        """)
+        await conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_LLMResponseCache_accessed ON LLMResponseCache(accessed_at)"
+        )
+        await conn.commit()
+        async with conn.execute("SELECT COALESCE(SUM(size), 0) FROM LLMResponseCache") as cur:
+            _total_bytes = (await cur.fetchone())[0]
+        _conn = conn
+    return _conn
+
+
+async def get(key: str) -> Optional[str]:
+    """命中且未过期时返回缓存的响应文本并刷新访问时间；出错时按未命中处理，不影响正常调用。"""
+    if not enabled():
+        return None
+    now = time.time()
+    try:
+        conn = await _get_conn()
+        async with conn.execute(
+            "SELECT response FROM LLMResponseCache WHERE key = ? AND created_at > ?",
+            (key, now - LLM_CACHE_TTL_SEC),
+        ) as cur:
+            row = await cur.fetchone()
+        if row is None:
+            metrics.incr("llm_cache_misses")
+            return None
+        await conn.execute("UPDATE LLMResponseCache SET accessed_at = ? WHERE key = ?", (now, key))
+        await conn.commit()
+    except Exception:
+        logger.exception("LLM cache lookup failed")
+        return None
+    metrics.incr("llm_cache_hits")
+    return row[0]
+
+
+async def _sweep(conn: aiosqlite.Connection, now: float) -> None:
+    """清理过期条目；总大小超过上限时按最近访问时间淘汰最旧的条目，降到上限的 EVICT_TO_RATIO 以下。"""
+    global _total_bytes, _puts_since_sweep
+    await conn.execute("DELETE FROM LLMResponseCache WHERE created_at <= ?", (now - LLM_CACHE_TTL_SEC,))
+    if _total_bytes > LLM_CACHE_MAX_BYTES:
+        # 按访问时间从新到旧累计大小，超出保留量的部分全部淘汰
+        cur = await conn.execute("""
+        DELETE FROM LLMResponseCache WHERE key IN (
+            SELECT key FROM (
+                SELECT key, SUM(size) OVER (ORDER BY accessed_at DESC, key) AS running FROM LLMResponseCache
+            ) WHERE running > ?
+        )
+        """, (int(LLM_CACHE_MAX_BYTES * EVICT_TO_RATIO),))
+        if cur.rowcount and cur.rowcount > 0:
+            metrics.incr("llm_cache_evictions", cur.rowcount)
+    async with conn.execute("SELECT COALESCE(SUM(size), 0) FROM LLMResponseCache") as cur:
+        _total_bytes = (await cur.fetchone())[0]
+    _puts_since_sweep = 0
+
+
+async def put(key: str, provider: str, model: str, response: str) -> None:
+    """写入响应；只有总大小超过上限或写入次数达到 SWEEP_EVERY_PUTS 时才清理过期条目、淘汰旧条目。"""
+    global _total_bytes, _puts_since_sweep
+    if not enabled() or not response:
+        return
+    now = time.time()
+    size = len(response.encode("utf-8"))
+    if size > LLM_CACHE_MAX_BYTES:
+        return
+    try:
+        conn = await _get_conn()
+        async with conn.execute("SELECT size FROM LLMResponseCache WHERE key = ?", (key,)) as cur:
+            row = await cur.fetchone()
+        await conn.execute(
+            "INSERT OR REPLACE INTO LLMResponseCache (key, provider, model, response, size, created_at, accessed_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (key, provider, model, response, size, now, now),
+        )
+        _total_bytes += size - (row[0] if row else 0)
+        _puts_since_sweep += 1
+        if _total_bytes > LLM_CACHE_MAX_BYTES or _puts_since_sweep >= SWEEP_EVERY_PUTS:
+            await _sweep(conn, now)
+        await conn.commit()
+    except Exception:
+        logger.exception("LLM cache store failed")
+        return
+    metrics.incr("llm_cache_stores")
+
+
+async def close() -> None:
+    global _conn
+    if _conn is not None:
+        await _conn.close()
+        _conn = None
@@ -0,0 +1,12 @@
+from tools.deepseek.create_model_response import DeepSeekClient
+
+
+class MockClient(DeepSeekClient):
+    """
+    本地模拟服务（tools/mock/server.py）的客户端：协议与 DeepSeek 相同（chat.completions + json_object），
+    仅默认配置不同；config/mock/config.yaml 的 base_url 需与 mock 服务的监听地址一致。
+    """
+
+    provider = "mock"
+    default_model = "mock-chat"
+    default_base_url = "http://127.0.0.1:8900/v1"
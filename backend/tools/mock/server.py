@@ -0,0 +1,320 @@
+# 本地 OpenAI 兼容的模拟模型服务（/v1/chat/completions，流式与非流式）：无需 API Key 与网络即可跑通全部生成链路，
+# 用于压测、性能分析与离线调试。首 token 耗时、输出速率、分片大小、错误注入与预设输出均可配置。
+# 用法（在 backend 目录下）：python -m tools.mock.server [--port 8900] [--ttft-ms 300] [--tokens-per-sec 50] [--config mock.yaml]
+# 运行中可通过 POST /mock/settings 修改设置，GET /mock/stats 查看请求统计。
+import os
+import re
+import sys
+import json
+import time
+import uuid
+import random
+import asyncio
+import hashlib
+import logging
+import argparse
+from dataclasses import dataclass, asdict, fields, replace
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+import yaml
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from tools.admission import estimate_tokens
+from tools.resilience import CONTINUE_INSTRUCTION
+
+logger = logging.getLogger("mock_llm")
+
+DEFAULT_CANNED_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "canned.yaml")
+
+
+@dataclass(frozen=True)
+class MockSettings:
+    """
+    配置文件（--config）示例，命令行参数优先：
+        ttft_ms: 300
+        tokens_per_sec: 50
+        chunk_chars: 2
+        error_rate: 0.05
+        error_status: 429
+        retry_after_sec: 1
+    """
+    ttft_ms: float = 300.0  # 首个分片前的等待
+    ttft_jitter_ms: float = 0.0  # 首 token 耗时在 [ttft_ms, ttft_ms + jitter] 内均匀分布
+    tokens_per_sec: float = 50.0  # 每秒输出的分片数（每个分片视为一个 token），0 表示不限速
+    chunk_chars: int = 2  # 每个分片的字符数
+    chunk_chars_max: int = 0  # 大于 chunk_chars 时分片字符数在 [chunk_chars, chunk_chars_max] 内随机
+    error_rate: float = 0.0  # 请求直接返回 error_status 的概率
+    error_status: int = 503
+    retry_after_sec: float = 0.0  # 大于 0 时错误响应带 Retry-After 头
+    stream_error_rate: float = 0.0  # 流式输出中途返回 error 事件的概率
+    drop_rate: float = 0.0  # 流式输出中途直接断开连接的概率
+    canned: str = DEFAULT_CANNED_FILE  # 预设输出文件
+    seed: int = -1  # 随机种子，负数表示不固定
+
+
+def mock_settings(section: Optional[Dict[str, Any]], base: Optional[MockSettings] = None) -> MockSettings:
+    """用 section 中的项覆盖 base（默认 MockSettings()）；非法的项忽略。"""
+    base = base or MockSettings()
+    values = {}
+    for f in fields(MockSettings):
+        if f.name not in (section or {}) or section[f.name] is None:
+            continue
+        try:
+            values[f.name] = f.type(section[f.name])
+        except (TypeError, ValueError):
+            logger.warning("Ignoring mock setting %s=%r", f.name, section[f.name])
+    return replace(base, **values)
+
+
+@dataclass
+class CannedRule:
+    name: str
+    pattern: Optional[re.Pattern]
+    content: str
+
+
+def load_canned(path: str) -> List[CannedRule]:
+    """读取预设输出，json / ndjson / text 统一渲染为响应文本。"""
+    with open(path, "r", encoding="utf-8") as f:
+        data = yaml.safe_load(f) or {}
+    rules = []
+    for i, item in enumerate(data.get("responses") or []):
+        if "json" in item:
+            content = json.dumps(item["json"], ensure_ascii=False)
+        elif "ndjson" in item:
+            content = "\n".join(json.dumps(obj, ensure_ascii=False) for obj in item["ndjson"])
+        else:
+            content = str(item.get("text") or "")
+            min_chars = int(item.get("min_chars") or 0)
+            if content and min_chars > len(content):
+                content = content * -(-min_chars // len(content))
+        match = item.get("match")
+        rules.append(CannedRule(
+            name=str(item.get("name") or f"rule{i}"),
+            pattern=re.compile(match) if match else None,
+            content=content,
+        ))
+    return rules
+
+
+@dataclass
+class MockStats:
+    requests: int = 0
+    streams: int = 0
+    active_streams: int = 0
+    injected_errors: int = 0
+    stream_errors: int = 0
+    drops: int = 0
+    completion_chunks: int = 0
+
+
+class _InjectedDrop(Exception):
+    """模拟连接中途断开：在流式响应中抛出，服务端直接关闭连接。"""
+
+
+class _QuietDrops(logging.Filter):
+    """注入的断开是预期行为，不让 uvicorn 为每次断开打印异常堆栈。"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        exc = record.exc_info[1] if record.exc_info else None
+        inner = getattr(exc, "exceptions", None) or [exc]  # 可能被 anyio 包装为 ExceptionGroup
+        return not any(isinstance(e, _InjectedDrop) for e in inner)
+
+
+class MockLLM:
+    def __init__(self, settings: MockSettings):
+        self.stats = MockStats()
+        self._seen_prefixes: set = set()
+        self.configure(settings)
+
+    def configure(self, settings: MockSettings) -> None:
+        self.settings = settings
+        self.rules = load_canned(settings.canned)
+        self.rng = random.Random(settings.seed if settings.seed >= 0 else None)
+        logger.info("Mock settings: %s (%d canned rules)", asdict(settings), len(self.rules))
+
+    def render(self, messages: List[Dict[str, Any]]) -> Tuple[str, str]:
+        """返回 (命中的规则名, 响应文本)；续写请求只返回已输出部分之后的内容。"""
+        joined = "\n".join(str(m.get("content") or "") for m in messages)
+        name, content = "empty", ""
+        for rule in self.rules:
+            if rule.pattern is None or rule.pattern.search(joined):
+                name, content = rule.name, rule.content
+                break
+        if (
+            len(messages) >= 2
+            and messages[-1].get("content") == CONTINUE_INSTRUCTION
+            and messages[-2].get("role") == "assistant"
+        ):
+            partial = str(messages[-2].get("content") or "")
+            if content.startswith(partial):
+                content = content[len(partial):]
+        return name, content
+
+    def chunks(self, content: str) -> List[str]:
+        low = max(1, self.settings.chunk_chars)
+        high = max(low, self.settings.chunk_chars_max)
+        out, i = [], 0
+        while i < len(content):
+            n = self.rng.randint(low, high) if high > low else low
+            out.append(content[i:i + n])
+            i += n
+        return out
+
+    def usage(self, messages: List[Dict[str, Any]], completion_tokens: int) -> Dict[str, Any]:
+        """prompt token 数按字符估算；首条消息（稳定前缀）出现过时计为缓存命中，模拟供应商的前缀缓存。"""
+        prefix = str(messages[0].get("content") or "") if messages else ""
+        digest = hashlib.sha256(prefix.encode("utf-8")).hexdigest()
+        cached = estimate_tokens(messages[:1]) if prefix and digest in self._seen_prefixes else 0
+        self._seen_prefixes.add(digest)
+        prompt_tokens = estimate_tokens(messages)
+        return {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+            "prompt_tokens_details": {"cached_tokens": cached},
+        }
+
+    def injected_error(self) -> Optional[JSONResponse]:
+        if not (self.settings.error_rate and self.rng.random() < self.settings.error_rate):
+            return None
+        self.stats.injected_errors += 1
+        headers = {"Retry-After": f"{self.settings.retry_after_sec:g}"} if self.settings.retry_after_sec > 0 else None
+        return JSONResponse(
+            {"error": {"message": "Injected error from mock server", "type": "mock_error", "code": self.settings.error_status}},
+            status_code=self.settings.error_status,
+            headers=headers,
+        )
+
+    async def wait_first_token(self) -> None:
+        delay = self.settings.ttft_ms + self.rng.uniform(0, self.settings.ttft_jitter_ms)
+        if delay > 0:
+            await asyncio.sleep(delay / 1000)
+
+    async def stream(self, model: str, messages: List[Dict[str, Any]], include_usage: bool) -> AsyncIterator[str]:
+        completion_id = f"chatcmpl-mock-{uuid.uuid4().hex[:12]}"
+        created = int(time.time())
+
+        def event(choices: List[Dict[str, Any]], **extra: Any) -> str:
+            body = {"id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model, "choices": choices, **extra}
+            return f"data: {json.dumps(body, ensure_ascii=False)}\n\n"
+
+        _, content = self.render(messages)
+        pieces = self.chunks(content)
+        # 中途出错/断开的位置在输出的前 80% 内随机
+        fail_at = None
+        if self.settings.stream_error_rate and self.rng.random() < self.settings.stream_error_rate:
+            fail_at = ("error", int(len(pieces) * self.rng.uniform(0, 0.8)))
+        elif self.settings.drop_rate and self.rng.random() < self.settings.drop_rate:
+            fail_at = ("drop", int(len(pieces) * self.rng.uniform(0, 0.8)))
+
+        self.stats.active_streams += 1
+        try:
+            await self.wait_first_token()
+            yield event([{"index": 0, "delta": {"role": "assistant", "content": ""}, "finish_reason": None}])
+            interval = 1 / self.settings.tokens_per_sec if self.settings.tokens_per_sec > 0 else 0
+            started = time.perf_counter()
+            for i, piece in enumerate(pieces):
+                if fail_at and i == fail_at[1]:
+                    if fail_at[0] == "drop":
+                        self.stats.drops += 1
+                        logger.info("Injected connection drop after %d/%d chunks", i, len(pieces))
+                        raise _InjectedDrop(f"dropped after {i} chunks")
+                    self.stats.stream_errors += 1
+                    yield f"data: {json.dumps({'error': {'message': 'Injected stream error from mock server', 'type': 'mock_error'}})}\n\n"
+                    return
+                if interval:
+                    # 按绝对时间排程，避免逐片 sleep 的误差累积
+                    delay = started + i * interval - time.perf_counter()
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                self.stats.completion_chunks += 1
+                yield event([{"index": 0, "delta": {"content": piece}, "finish_reason": None}])
+            yield event([{"index": 0, "delta": {}, "finish_reason": "stop"}])
+            if include_usage:
+                yield event([], usage=self.usage(messages, len(pieces)))
+            yield "data: [DONE]\n\n"
+        finally:
+            self.stats.active_streams -= 1
+
+    async def complete(self, model: str, messages: List[Dict[str, Any]]) -> Dict[str, Any]:
+        _, content = self.render(messages)
+        pieces = self.chunks(content)
+        # 非流式：等待首 token 耗时 + 按输出速率生成全部分片的时间
+        await self.wait_first_token()
+        if self.settings.tokens_per_sec > 0:
+            await asyncio.sleep(len(pieces) / self.settings.tokens_per_sec)
+        self.stats.completion_chunks += len(pieces)
+        return {
+            "id": f"chatcmpl-mock-{uuid.uuid4().hex[:12]}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": self.usage(messages, len(pieces)),
+        }
+
+
+def create_mock_app(settings: Optional[MockSettings] = None) -> FastAPI:
+    app = FastAPI(title="Manuscript mock LLM", docs_url=None, redoc_url=None)
+    mock = MockLLM(settings or MockSettings())
+    app.state.mock = mock
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(body: Dict[str, Any]):
+        mock.stats.requests += 1
+        error = mock.injected_error()
+        if error is not None:
+            return error
+        model = str(body.get("model") or "mock-chat")
+        messages = body.get("messages") or []
+        if body.get("stream"):
+            mock.stats.streams += 1
+            include_usage = bool((body.get("stream_options") or {}).get("include_usage"))
+            return StreamingResponse(mock.stream(model, messages, include_usage), media_type="text/event-stream")
+        return await mock.complete(model, messages)
+
+    @app.get("/v1/models")
+    async def list_models():
+        return {"object": "list", "data": [{"id": "mock-chat", "object": "model", "created": 0, "owned_by": "mock"}]}
+
+    @app.get("/mock/stats")
+    async def get_stats():
+        return {"settings": asdict(mock.settings), **asdict(mock.stats)}
+
+    @app.post("/mock/settings")
+    async def update_settings(request: Request):
+        mock.configure(mock_settings(await request.json(), base=mock.settings))
+        return asdict(mock.settings)
+
+    return app
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Local OpenAI-compatible mock LLM server")
+    parser.add_argument("-p", "--port", type=int, default=8900, help="监听端口（与 config/mock/config.yaml 的 base_url 一致）")
+    parser.add_argument("-H", "--host", type=str, default="127.0.0.1", help="绑定地址")
+    parser.add_argument("--config", type=str, default=None, help="YAML 设置文件，字段见 MockSettings")
+    for f in fields(MockSettings):
+        parser.add_argument(f"--{f.name.replace('_', '-')}", type=f.type, default=None)
+    args = parser.parse_args()
+
+    section: Dict[str, Any] = {}
+    if args.config:
+        with open(args.config, "r", encoding="utf-8") as fh:
+            section = yaml.safe_load(fh) or {}
+    settings = mock_settings({f.name: getattr(args, f.name) for f in fields(MockSettings)}, base=mock_settings(section))
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(name)s - %(message)s")
+    logging.getLogger("uvicorn.error").addFilter(_QuietDrops())
+    uvicorn.run(create_mock_app(settings), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
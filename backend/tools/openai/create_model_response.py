@@ -11,6 +11,8 @@ from typing import Optional, Dict, Type, AsyncIterable, Any, List
 import requests
 import base64
 from utils.config import Model_Providers
+from tools.http_transport import get_http_client, transport_settings
+from tools import llm_cache
 
 class GPTClient:
     """OpenAI / DeepSeek  API 客户端工具类（支持结构化 / 非结构化 / 流式，支持多轮 messages 参数）"""
@@ -46,6 +48,7 @@ class GPTClient:
             print(f"OpenAI: failed to load config from {config_path}: {e}")
             raise
         print(f"OpenAI: using config_path={config_path}")
+        self.config_path = config_path
         print(f"OpenAI: loaded api_key={(cfg.get('api_key'))}")
         self.config_info = cfg
         self.api_key = self.config_info.get('api_key')
@@ -57,7 +60,12 @@ class GPTClient:
         if self.api_key:
             os.environ['OPENAI_API_KEY'] = str(self.api_key)
         self.client = OpenAI(api_key=self.api_key, base_url=self.base_url)
-        self.async_client = AsyncOpenAI(api_key=self.api_key, base_url=self.base_url)
+        # 异步客户端使用共享的 httpx 连接池（config.yaml 的 transport 段可调整连接数/keep-alive/超时/http2）
+        self.async_client = AsyncOpenAI(
+            api_key=self.api_key,
+            base_url=self.base_url,
+            http_client=get_http_client(transport_settings(self.config_info)),
+        )
 
     def _load_config(self, config_path: str) -> Dict[str, Any]:
         """从 YAML 配置文件加载 API Key 等配置"""
@@ -75,13 +83,15 @@ class GPTClient:
         prompt: Optional[str] = None,
         instructions: Optional[str] = None,
         text_format: Optional[Type[BaseModel]] = None,
-        messages: Optional[List[Dict[str, str]]] = None
+        messages: Optional[List[Dict[str, str]]] = None,
+        use_cache: bool = True
     ) -> Any:
         """
         非流式调用：
         - 若传入 messages（多轮），则直接使用 messages；
         - 否则按 instructions + prompt 构建单轮 messages；
-        - 如果传入 text_format 则尝试解析 JSON 为 pydantic。
+        - 如果传入 text_format 则尝试解析 JSON 为 pydantic；
+        - use_cache=True 时先查响应缓存（tools/llm_cache），命中则不请求模型。
         """
         if messages is None:
             messages_payload = [
@@ -95,24 +105,32 @@ class GPTClient:
         if text_format:
             extra_args["response_format"] = text_format
 
-        # 创建请求（使用 parse 以便返回可解析的 content）
-        resp = await self.async_client.chat.completions.parse(
-            model=self.model,
-            messages=messages_payload,
-            **extra_args,
-        )
-
-        content = resp.choices[0].message.content
+        cache_key = llm_cache.cache_key("openai", self.model, messages_payload, text_format, self.base_url) if use_cache else None
+        content = await llm_cache.get(cache_key) if cache_key else None
+        cached = content is not None
+        if not cached:
+            # 创建请求（使用 parse 以便返回可解析的 content）
+            resp = await self.async_client.chat.completions.parse(
+                model=self.model,
+                messages=messages_payload,
+                **extra_args,
+            )
+            content = resp.choices[0].message.content
 
         if text_format:
             try:
                 json_dict = json.loads(content)
             except Exception as e:
                 raise RuntimeError(f"解析 JSON 失败: {content}") from e
-            return text_format.model_validate(json_dict)
+            result = text_format.model_validate(json_dict)
+        else:
+            # 普通文本输出
+            result = content
 
-        # 普通文本输出
-        return content
+        # 解析成功后才写入缓存，避免反复命中一个无法解析的响应
+        if cache_key and not cached:
+            await llm_cache.put(cache_key, "openai", self.model, content)
+        return result
 
     async def async_stream_response(
         self,
@@ -133,7 +151,8 @@ class GPTClient:
         else:
             messages_payload = messages
 
-        kwargs = {}
+        # include_usage：最后一个 chunk 带回用量（含 prompt 缓存命中的 cached_tokens）
+        kwargs = {"stream_options": {"include_usage": True}}
         if text_format:
             kwargs["response_format"] = text_format
         async with self.async_client.chat.completions.stream(
@@ -0,0 +1,71 @@
+# 进程级的模型客户端注册表：每个 (provider, config_path) 只构建一次客户端，配置文件变化后才重建
+import os
+import logging
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from tools.deepseek.create_model_response import DeepSeekClient
+from tools.openai.create_model_response import GPTClient
+from tools.mock.create_model_response import MockClient
+from utils.config import Model_Providers
+from utils import metrics
+
+logger = logging.getLogger("provider_registry")
+
+CLIENT_FACTORIES: Dict[str, Callable[..., Any]] = {
+    "openai": GPTClient,
+    "deepseek": DeepSeekClient,
+    "mock": MockClient,
+}
+
+
+@dataclass
+class _Entry:
+    client: Any
+    fingerprint: Optional[Tuple[int, int]]
+
+
+_clients: Dict[Tuple[str, str], _Entry] = {}
+
+
+def _fingerprint(path: str) -> Optional[Tuple[int, int]]:
+    """配置文件的 (mtime_ns, size)；文件不存在时返回 None（下次获取会重建并重新生成占位配置）。"""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+def get_client(provider: str, config_path: Optional[str] = None) -> Any:
+    """
+    返回 provider 对应的客户端（GPTClient / DeepSeekClient / MockClient），复用其 AsyncOpenAI 连接池。
+    仅在首次获取、配置文件 mtime/大小变化或 invalidate() 之后才重新读取 YAML 并构建。
+    """
+    provider = provider.lower()
+    factory = CLIENT_FACTORIES.get(provider)
+    if factory is None:
+        raise ValueError(f"Unsupported provider: {provider}")
+    config_path = config_path or Model_Providers[provider]
+    key = (provider, config_path)
+
+    entry = _clients.get(key)
+    if entry is not None and entry.fingerprint is not None \
+            and _fingerprint(entry.client.config_path) == entry.fingerprint:
+        metrics.incr("provider_client_hits")
+        return entry.client
+
+    client = factory(config_path=config_path)
+    # 构建时可能刚写入占位配置，构建之后再取指纹
+    _clients[key] = _Entry(client=client, fingerprint=_fingerprint(client.config_path))
+    metrics.incr("provider_client_builds")
+    if entry is not None:
+        # 旧客户端可能仍有进行中的流式请求，不主动关闭，交给 GC 回收其连接池
+        logger.info("Provider client reloaded: %s (%s)", provider, client.config_path)
+    return client
+
+
+def invalidate(provider: Optional[str] = None) -> None:
+    """丢弃已缓存的客户端（provider 为空时全部丢弃），下次获取时按最新配置重建。"""
+    for key in [k for k in _clients if provider is None or k[0] == provider.lower()]:
+        del _clients[key]
@@ -0,0 +1,111 @@
+# 模型调用的重试与供应商切换策略：错误分类、抖动退避与备用供应商顺序
+import random
+import asyncio
+import logging
+from typing import List, Optional, Tuple
+
+import httpx
+import openai
+
+from utils.config import Model_Providers, Provider_Fallbacks, Retry_Policy
+from utils import metrics
+
+logger = logging.getLogger("resilience")
+
+# 可重试的 HTTP 状态码：超时、冲突、限流与服务端错误
+RETRIABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+# 续写请求末尾追加的指令（本地 mock 服务据此识别续写请求）
+CONTINUE_INSTRUCTION = "输出在上文处中断了。请从中断处紧接着继续，不要重复已输出的内容，也不要添加任何说明。"
+
+
+def classify_error(exc: BaseException) -> Tuple[bool, str]:
+    """返回 (是否可重试, 原因描述)；原因用于日志与切换决策。"""
+    if isinstance(exc, openai.APIStatusError):
+        status = exc.status_code
+        return status in RETRIABLE_STATUS or status >= 500, f"HTTP {status}"
+    if isinstance(exc, openai.APITimeoutError):
+        return True, "timeout"
+    if isinstance(exc, openai.APIConnectionError):
+        return True, "connection error"
+    if isinstance(exc, (httpx.TransportError, asyncio.TimeoutError)):
+        # 流式读取过程中连接被重置 / 读超时（SDK 不会包装成 APIError）
+        return True, f"transport error ({type(exc).__name__})"
+    if isinstance(exc, openai.APIError):
+        # 流中返回的 error 事件（无状态码），多为上游过载
+        return True, f"stream error ({exc.message})"
+    return False, f"{type(exc).__name__}: {exc}"
+
+
+def retry_after_sec(exc: BaseException) -> Optional[float]:
+    """429/503 响应中的 Retry-After（秒）；没有或无法解析时返回 None。"""
+    response = getattr(exc, "response", None)
+    value = response.headers.get("retry-after") if response is not None else None
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+def backoff_delay(attempt: int, exc: Optional[BaseException] = None) -> float:
+    """第 attempt 次重试（从 0 开始）前的等待秒数：full jitter 指数退避，服务端给出 Retry-After 时取两者较大值。"""
+    ceiling = min(Retry_Policy["max_delay_sec"], Retry_Policy["base_delay_sec"] * (2 ** attempt))
+    delay = random.uniform(0, ceiling)
+    hinted = retry_after_sec(exc) if exc is not None else None
+    if hinted is not None:
+        delay = max(delay, min(hinted, Retry_Policy["max_delay_sec"]))
+    return delay
+
+
+def max_retries() -> int:
+    return int(Retry_Policy["max_retries"])
+
+
+def provider_chain(primary: str) -> List[str]:
+    """主供应商在前，其后为 Provider_Fallbacks 中受支持且不重复的备用供应商。"""
+    chain = [primary]
+    for provider in Provider_Fallbacks:
+        provider = provider.lower()
+        if provider in Model_Providers and provider not in chain:
+            chain.append(provider)
+    return chain
+
+
+def continuation_messages(messages: List[dict], partial: str) -> List[dict]:
+    """
+    已输出部分内容后断开时的续写请求：原 messages + 已生成的 assistant 片段 + 续写指令，
+    新的输出直接接在已推送给客户端的内容之后。
+    """
+    if not partial:
+        return messages
+    return [
+        *messages,
+        {"role": "assistant", "content": partial},
+        {"role": "user", "content": CONTINUE_INSTRUCTION},
+    ]
+
+
+async def retry_or_failover(exc: Exception, provider: str, next_provider: Optional[str], retries: int, received: int) -> bool:
+    """
+    失败处理策略：可重试且未超过次数时退避等待并返回 True（在同一供应商上重试）；
+    否则记录切换原因并返回 False（调用方换下一个供应商，没有则抛出）。
+    """
+    retriable, reason = classify_error(exc)
+    if retriable and retries < max_retries():
+        delay = backoff_delay(retries, exc)
+        logger.warning(
+            "LLM call to %s failed (%s) after %d chars, retry %d/%d in %.2fs",
+            provider, reason, received, retries + 1, max_retries(), delay,
+        )
+        metrics.incr(f"llm_retries.{provider}")
+        await asyncio.sleep(delay)
+        return True
+    if next_provider:
+        logger.warning(
+            "Failing over from %s to %s: %s (%s, %d chars kept)",
+            provider, next_provider, reason, "retries exhausted" if retriable else "not retriable", received,
+        )
+        metrics.incr(f"llm_failovers.{provider}")
+    else:
+        logger.error("LLM call to %s failed: %s, no fallback provider left", provider, reason)
+    return False
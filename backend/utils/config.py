@@ -2,7 +2,36 @@
 Model_Providers = {
     # Relative paths (relative to project root 'backend')
     "openai": "config/openai/config.yaml",
-    "deepseek": "config/deepseek/config.yaml"
+    "deepseek": "config/deepseek/config.yaml",
+    # 本地 OpenAI 兼容的模拟服务（python -m tools.mock.server），用于压测与离线调试
+    "mock": "config/mock/config.yaml"
 }
 
 
+# 主供应商请求失败（重试用尽或不可重试的错误）时按顺序尝试的备用供应商，如 ["deepseek", "openai"]；
+# 为空则不切换。备用供应商使用 Model_Providers 中的默认配置文件。
+Provider_Fallbacks = []
+
+# 流式调用的重试策略（在 SDK 自带的连接重试之外，覆盖流式过程中断开、429/5xx 等错误）：
+# 指数退避 base_delay_sec * 2^n，上限 max_delay_sec，并在 [0, 退避值] 内随机抖动
+Retry_Policy = {
+    "max_retries": 2,
+    "base_delay_sec": 0.5,
+    "max_delay_sec": 8.0,
+}
+
+# 首 token 对冲（hedging，默认关闭，可在请求中单独开启）：主供应商超过阈值仍未返回首个 token 时，
+# 用相同 messages 请求 provider（为空则取 deepseek/openai 中的另一家），先出 token 的一方胜出，另一方立即取消；
+# 主供应商为 mock 时无论是否配置 provider 都不对冲。
+# 阈值取主供应商最近 window 次首 token 耗时的 percentile 分位数（样本少于 min_samples 时用 threshold_ms），
+# 并限制在 [min_threshold_ms, max_threshold_ms] 之间。
+Hedge_Policy = {
+    "enabled": False,
+    "provider": None,
+    "threshold_ms": 3000,
+    "percentile": 90,
+    "min_samples": 20,
+    "window": 200,
+    "min_threshold_ms": 500,
+    "max_threshold_ms": 10000,
+}
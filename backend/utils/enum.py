@@ -6,6 +6,7 @@ class ResponseCode(Enum):
     项目接口返回状态码管理
     """
     SUCCESS = 200  # 接口正常返回
+    PARTIAL_SUCCESS = 207  # 批量操作部分成功（如批量删除时部分 uid 不存在），明细见 data
     CLIENT_ERROR = 400  # 客户端错误
     SERVER_ERROR = 500  # 服务端错误
     
@@ -0,0 +1,22 @@
+# 进程内的简单指标：计数器（只增不减）与仪表（当前值），由 /api/health/metrics 输出
+from collections import defaultdict
+from typing import Dict
+
+_counters: Dict[str, int] = defaultdict(int)
+_gauges: Dict[str, float] = {}
+
+
+def incr(name: str, value: int = 1) -> None:
+    _counters[name] += value
+
+
+def set_gauge(name: str, value: float) -> None:
+    _gauges[name] = value
+
+
+def remove_gauge(name: str) -> None:
+    _gauges.pop(name, None)
+
+
+def snapshot() -> Dict[str, Dict]:
+    return {"counters": dict(_counters), "gauges": dict(_gauges)}
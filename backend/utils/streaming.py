@@ -0,0 +1,106 @@
+# 生产者（模型流回调 / 持久化任务）与 SSE 消费循环之间的有界通道
+import asyncio
+from collections import deque
+from typing import Any, Callable, Deque, Optional
+
+from utils import metrics
+
+# 通道已满时的处理策略
+BLOCK = "block"  # 生产者等待，直到消费者取走条目
+COALESCE = "coalesce"  # 与队尾条目合并（如相邻 token 拼接），合并不了时退化为等待
+
+
+class StreamChannel:
+    """
+    单消费者的有界通道：
+        - put()：容量已满时按 policy 阻塞生产者或与队尾合并，内存占用与读取速度无关；
+        - put_control()：结束标记、persist 事件等少量控制消息不受容量限制，避免生产者与消费者互相等待；
+        - gauge 不为空时，以 "stream_queue_depth.<gauge>" 上报当前深度，直到 close()。
+    """
+
+    def __init__(
+        self,
+        maxsize: int,
+        policy: str = BLOCK,
+        merge: Optional[Callable[[Any, Any], Optional[Any]]] = None,
+        gauge: Optional[str] = None,
+    ):
+        if policy not in (BLOCK, COALESCE):
+            raise ValueError(f"Unknown overflow policy: {policy}")
+        self.maxsize = max(1, int(maxsize))
+        self.policy = policy
+        self._merge = merge
+        self._gauge = f"stream_queue_depth.{gauge}" if gauge else None
+        self._items: Deque[Any] = deque()
+        self._not_empty = asyncio.Event()
+        self._not_full = asyncio.Event()
+        self._not_full.set()
+
+    def qsize(self) -> int:
+        return len(self._items)
+
+    def empty(self) -> bool:
+        return not self._items
+
+    async def put(self, item: Any) -> None:
+        while len(self._items) >= self.maxsize:
+            if self.policy == COALESCE and self._merge is not None:
+                merged = self._merge(self._items[-1], item)
+                if merged is not None:
+                    self._items[-1] = merged
+                    metrics.incr("stream_queue_coalesced")
+                    return
+            metrics.incr("stream_queue_blocked")
+            self._not_full.clear()
+            await self._not_full.wait()
+        self._append(item)
+
+    def put_control(self, item: Any) -> None:
+        self._append(item)
+
+    async def get(self) -> Any:
+        while not self._items:
+            self._not_empty.clear()
+            await self._not_empty.wait()
+        return self.get_nowait()
+
+    def get_nowait(self) -> Any:
+        if not self._items:
+            raise asyncio.QueueEmpty
+        item = self._items.popleft()
+        if len(self._items) < self.maxsize:
+            self._not_full.set()
+        self._report()
+        return item
+
+    def close(self) -> None:
+        """移除深度 gauge（之后的 put/get 不再上报）；通道本身仍可继续读取剩余条目。"""
+        if self._gauge:
+            metrics.remove_gauge(self._gauge)
+            self._gauge = None
+
+    def _append(self, item: Any) -> None:
+        self._items.append(item)
+        self._not_empty.set()
+        self._report()
+
+    def _report(self) -> None:
+        if self._gauge:
+            metrics.set_gauge(self._gauge, len(self._items))
+
+
+def merge_text(last: Any, item: Any) -> Optional[Any]:
+    """COALESCE 合并函数：两个字符串直接拼接。"""
+    if isinstance(last, str) and isinstance(item, str):
+        return last + item
+    return None
+
+
+def merge_token_events(last: Any, item: Any) -> Optional[Any]:
+    """COALESCE 合并函数：相邻的 ("token", text) 事件拼接为一个。"""
+    if (
+        isinstance(last, tuple) and isinstance(item, tuple)
+        and last[0] == "token" and item[0] == "token"
+    ):
+        return ("token", last[1] + item[1])
+    return None